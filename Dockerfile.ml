@@ -15,8 +15,8 @@ COPY scripts/ml/requirements.txt .
 # Install Python dependencies
 RUN pip install --no-cache-dir -r requirements.txt
 
-# Copy model and inference script
-COPY scripts/ml/inference_api.py .
+# Copy model and inference modules
+COPY scripts/ml/*.py ./
 COPY models/ ./models/
 
 # Expose port
@@ -31,5 +31,5 @@ ENV PYTHONUNBUFFERED=1
 HEALTHCHECK --interval=30s --timeout=3s --start-period=5s --retries=3 \
     CMD python -c "import requests; requests.get('http://localhost:5000/health')"
 
-# Run the inference API
-CMD ["python", "inference_api.py"]
+# Run the inference API under gunicorn (see gunicorn.conf.py for tuning)
+CMD ["gunicorn", "-c", "gunicorn.conf.py", "inference_api:create_app()"]
@@ -0,0 +1,55 @@
+"""
+Benchmark: per-vendor /batch-predict loop vs the batched predict path
+
+Usage:
+    python benchmarks/bench_batch_predict.py [--sizes 10 1000 50000] [--loop-sample 2000]
+
+The per-vendor loop is timed on at most --loop-sample vendors and
+extrapolated linearly for larger batches; such rows are marked "est".
+"""
+
+import argparse
+
+import common  # noqa: F401  (sets up sys.path)
+import inference_api
+from common import load_or_make_api_model, make_vendor_payloads, time_call
+from model_registry import ModelHandle
+
+def per_vendor_loop(vendors, model):
+    """The original /batch-predict implementation: one predict call per vendor"""
+    results = []
+    for vendor in vendors:
+        try:
+            features = inference_api.extract_features(vendor.get('data'))
+            prediction = model.predict(features)[0]
+            results.append({'vendorId': vendor.get('id'), 'totalScore': round(float(prediction), 2), 'success': True})
+        except Exception as e:
+            results.append({'vendorId': vendor.get('id'), 'error': str(e), 'success': False})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 50000])
+    parser.add_argument('--loop-sample', type=int, default=2000)
+    parser.add_argument('--chunk-size', type=int, default=inference_api.BATCH_CHUNK_SIZE)
+    args = parser.parse_args()
+    
+    model = load_or_make_api_model()
+    handle = ModelHandle(model, 'benchmark')
+    # Measure model cost, not cache hits on repeated runs
+    inference_api.prediction_cache.max_entries = 0
+    
+    print(f"{'vendors':>10} {'loop (s)':>12} {'batched (s)':>12} {'speedup':>9}")
+    for n in args.sizes:
+        vendors = make_vendor_payloads(n)
+        
+        loop_n = min(n, args.loop_sample)
+        loop_time = time_call(per_vendor_loop, vendors[:loop_n], model, repeat=1) * n / loop_n
+        batch_time = time_call(inference_api.predict_batch, vendors, handle, chunk_size=args.chunk_size,
+                               repeat=3 if n <= 1000 else 1)
+        
+        loop_str = f"{loop_time:.3f}" + (' est' if loop_n < n else '')
+        print(f"{n:>10} {loop_str:>12} {batch_time:>12.3f} {loop_time / batch_time:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: JSON decode and encode on the inference request path
+
+Usage:
+    python benchmarks/bench_codec.py [--sizes-kb 1 100 10000]
+
+For each payload size (a /predict body for the smallest, /batch-predict
+bodies otherwise) times decoding with the json module and with the
+codec, feature extraction, encoding the response with Flask's jsonify
+and with the codec, and the whole request through the Flask test
+client. Set JSON_CODEC=json to run the request column on the fallback.
+"""
+
+import argparse
+import json
+
+import common  # noqa: F401  (sets up sys.path)
+import codec
+import inference_api
+from common import load_or_make_api_model, make_vendor_payloads, time_call
+from flask import jsonify
+from model_registry import ModelHandle
+from tree_engine import compile_model
+
+def make_body(size_kb):
+    """A request path and JSON body of roughly `size_kb` kilobytes"""
+    if size_kb < 4:
+        vendor = make_vendor_payloads(1, max_records=8, seed=3)[0]
+        return '/predict', json.dumps({'vendorData': vendor['data']}).encode()
+    sample = make_vendor_payloads(500)
+    per_vendor = len(json.dumps({'vendors': sample})) / len(sample)
+    vendors = make_vendor_payloads(max(1, round(size_kb * 1024 / per_vendor)))
+    return '/batch-predict', json.dumps({'vendors': vendors}).encode()
+
+def response_for(path, data, handle):
+    """The response object the endpoint builds for a decoded body"""
+    if path == '/predict':
+        features = inference_api.extract_features(data['vendorData'])
+        return {'totalScore': round(float(handle.predict(features)[0]), 2), 'confidence': 0.85}
+    return {'results': inference_api.predict_batch(data['vendors'], handle)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-kb', type=float, nargs='+', default=[1, 100, 10000])
+    args = parser.parse_args()
+    
+    model = load_or_make_api_model()
+    handle = ModelHandle(model, 'benchmark', engine=compile_model(model))
+    inference_api.registry.active = handle
+    inference_api.prediction_cache.max_entries = 0
+    client = inference_api.app.test_client()
+    
+    print(f"codec backend: {codec.BACKEND}")
+    print(f"{'payload':>10} {'decode json':>12} {'decode codec':>13} {'extract':>9} "
+          f"{'jsonify':>9} {'encode codec':>13} {'request':>9}   (ms)")
+    for size_kb in args.sizes_kb:
+        path, body = make_body(size_kb)
+        repeat = 20 if len(body) < 1 << 20 else 3
+        
+        data = codec.loads(body)
+        assert data == json.loads(body), 'codec decoded a different object'
+        if path == '/predict':
+            extract_time = time_call(inference_api.extract_features, data['vendorData'], repeat=repeat)
+        else:
+            extract_time = time_call(inference_api.extract_feature_matrix, data['vendors'], repeat=repeat)
+        
+        response = response_for(path, data, handle)
+        with inference_api.app.app_context():
+            jsonify_time = time_call(jsonify, response, repeat=repeat)
+            assert json.loads(jsonify(response).get_data()) == codec.loads(codec.dumps(response))
+        
+        times = [
+            time_call(json.loads, body, repeat=repeat),
+            time_call(codec.loads, body, repeat=repeat),
+            extract_time,
+            jsonify_time,
+            time_call(codec.dumps, response, repeat=repeat),
+            time_call(client.post, path, data=body, content_type='application/json', repeat=repeat),
+        ]
+        label = f'{len(body) / 1024:.1f} KB'
+        print(f"{label:>10} " + ' '.join(f'{t * 1000:>{w}.3f}' for t, w in zip(times, (12, 13, 9, 9, 13, 9))))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: compact, quantized ensembles vs the compiled engine
+
+Usage:
+    python benchmarks/bench_compact_model.py [--sizes 1 100 1000 10000] [--trees 200] [--outputs 1]
+
+Compacts an API-layout RandomForest to each mode (float32 thresholds,
+uint16 and uint8 bin indices), then reports node-array size, accuracy
+drift on rows drawn around the split thresholds (max |diff| and how many
+scores change at the 2 decimals the API serves), the time to bin a
+batch, and predict latency next to the compiled engine's.
+"""
+
+import argparse
+
+import numpy as np
+
+import common  # noqa: F401  (sets up sys.path)
+from common import make_api_model, time_call
+from compact_model import COMPACT_MODES, compact, compaction_report, probe_rows
+from tree_engine import CompiledEnsemble
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000, 10000])
+    parser.add_argument('--trees', type=int, default=200)
+    parser.add_argument('--outputs', type=int, default=1)
+    args = parser.parse_args()
+
+    model = make_api_model(n_estimators=args.trees, n_outputs=args.outputs)
+    ensemble = CompiledEnsemble.from_sklearn(model)
+    X_probe = probe_rows(ensemble, 20_000)
+    compacted = {mode: compact(ensemble, mode) for mode in COMPACT_MODES}
+
+    print(f"\n{ensemble.n_trees} trees, {len(ensemble.feature):,} nodes, {ensemble.n_outputs} output(s)")
+    print(f"{'mode':>9} {'MB':>7} {'max |diff|':>11} {'mean |diff|':>12} {'changed':>8}")
+    original_mb = sum(a.nbytes for a in ensemble.to_state()[1].values()) / 1e6
+    print(f"{'compiled':>9} {original_mb:>7.1f}")
+    for mode, engine in compacted.items():
+        report = compaction_report(ensemble, engine, X_probe, batch_sizes=())
+        print(f"{mode:>9} {report['compact_bytes'] / 1e6:>7.1f} {report['max_abs_drift']:>11.2e} "
+              f"{report['mean_abs_drift']:>12.2e} {report['rows_changed'] / report['rows']:>7.2%}")
+
+    print(f"\n{'rows':>8} {'compiled (ms)':>14} " + ' '.join(f'{mode + " (ms)":>13}' for mode in COMPACT_MODES)
+          + f" {'uint16 bin (ms)':>16}")
+    rng = np.random.default_rng(0)
+    for n in args.sizes:
+        X = X_probe[rng.integers(0, len(X_probe), n)]
+        repeat = max(3, min(200, 2000 // n))
+        times = [time_call(ensemble.predict, X, repeat=repeat)]
+        times += [time_call(compacted[mode].predict, X, repeat=repeat) for mode in COMPACT_MODES]
+        bin_time = time_call(compacted['uint16'].prepare, X, repeat=repeat)
+        print(f"{n:>8} {times[0] * 1e3:>14.3f} " + ' '.join(f'{t * 1e3:>13.3f}' for t in times[1:])
+              + f" {bin_time * 1e3:>16.3f}")
+
+if __name__ == '__main__':
+    main()
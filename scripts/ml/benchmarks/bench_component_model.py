@@ -0,0 +1,120 @@
+"""
+Benchmark: multi-output component-score model vs the single-output model
+
+Usage:
+    python benchmarks/bench_component_model.py [--sizes 1 100 1000] [--requests 500]
+
+Fits a single-output RandomForest and one predicting the overall score
+plus the six component scores, with the same parameters, on the
+inference_api feature layout. Reports:
+
+  engine   compiled predict latency per call for each batch size, for
+           the single-output model, the multi-output one, and seven
+           single-output models (one per score) run back to back
+  /predict median request latency through the Flask test client with
+           each model served from its own directory, prediction cache off
+
+The multi-output model traverses each tree once for all seven scores,
+so its cost should stay close to the single-output model's.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+
+import common
+from common import N_API_FEATURES, make_api_model, make_vendor_payloads, time_call
+from feature_store import TARGET_COLUMNS
+from model_artifact import save_artifact
+from tree_engine import CompiledEnsemble
+
+API_CLIENT = r'''
+import json, sys, time
+import numpy as np
+import inference_api
+app = inference_api.create_app()
+client = app.test_client()
+payloads = json.load(open(sys.argv[1]))
+for body in payloads[:20]:
+    client.post('/predict', json=body)
+seconds = []
+for body in payloads:
+    start = time.perf_counter()
+    response = client.post('/predict', json=body)
+    seconds.append(time.perf_counter() - start)
+    assert response.status_code == 200, response.get_json()
+print(json.dumps({'median_ms': float(np.median(seconds)) * 1000, 'example': response.get_json()}))
+'''
+
+def save_api_model(model, model_dir, outputs=None):
+    os.makedirs(model_dir)
+    joblib.dump(model, os.path.join(model_dir, 'vendor_score_model.pkl'))
+    artifact = save_artifact(CompiledEnsemble.from_sklearn(model), os.path.join(model_dir, 'vendor_score_model.bin'), 'benchmark')
+    metadata = {'version': 'benchmark', 'artifact': artifact}
+    if outputs:
+        metadata['outputs'] = list(outputs)
+    with open(os.path.join(model_dir, 'model_metadata.json'), 'w') as f:
+        json.dump(metadata, f)
+
+def serve_requests(model_dir, payload_path):
+    env = dict(
+        os.environ,
+        MODEL_PATH=os.path.join(model_dir, 'vendor_score_model.pkl'),
+        PYTHONPATH=common.ML_DIR,
+        PREDICTION_CACHE_SIZE='0',
+        MODEL_RELOAD_INTERVAL='0',
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', API_CLIENT, payload_path], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--trees', type=int, default=200)
+    args = parser.parse_args()
+
+    single = make_api_model(n_estimators=args.trees)
+    multi = make_api_model(n_estimators=args.trees, n_outputs=len(TARGET_COLUMNS))
+    engines = {name: CompiledEnsemble.from_sklearn(model) for name, model in (('single', single), ('multi', multi))}
+    print(f"single-output: {len(engines['single'].feature)} nodes, "
+          f"{len(TARGET_COLUMNS)}-output: {len(engines['multi'].feature)} nodes")
+
+    rng = np.random.default_rng(0)
+    X_check = rng.uniform(0, 100, size=(2000, N_API_FEATURES))
+    if not np.allclose(engines['multi'].predict(X_check), multi.predict(X_check), rtol=0, atol=1e-9):
+        print('✗ Compiled multi-output predictions differ from sklearn')
+        sys.exit(1)
+
+    print(f"\n{'rows':>6} {'single (ms)':>12} {'multi (ms)':>11} {'ratio':>6} {'7 singles (ms)':>15}")
+    for n in args.sizes:
+        X = rng.uniform(0, 100, size=(n, N_API_FEATURES))
+        repeat = max(5, 2000 // n)
+        single_ms = time_call(lambda: [engines['single'].predict(X) for _ in range(repeat)]) / repeat * 1000
+        multi_ms = time_call(lambda: [engines['multi'].predict(X) for _ in range(repeat)]) / repeat * 1000
+        print(f"{n:>6} {single_ms:>12.3f} {multi_ms:>11.3f} {multi_ms / single_ms:>6.2f} "
+              f"{single_ms * len(TARGET_COLUMNS):>15.3f}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        payload_path = os.path.join(work_dir, 'payloads.json')
+        with open(payload_path, 'w') as f:
+            json.dump([{'vendorData': vendor['data']} for vendor in make_vendor_payloads(args.requests)], f)
+        save_api_model(single, os.path.join(work_dir, 'single'))
+        save_api_model(multi, os.path.join(work_dir, 'multi'), outputs=TARGET_COLUMNS)
+
+        print(f"\n/predict, {args.requests} requests, prediction cache off")
+        results = {name: serve_requests(os.path.join(work_dir, name), payload_path) for name in ('single', 'multi')}
+        for name, result in results.items():
+            print(f"  {name:<7} median {result['median_ms']:.3f}ms")
+        print(f"  multi-output response: {json.dumps(results['multi']['example'], sort_keys=True)}")
+
+if __name__ == '__main__':
+    main()
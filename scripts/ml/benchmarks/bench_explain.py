@@ -0,0 +1,71 @@
+"""
+Benchmark: per-prediction TreeSHAP explanations
+
+Usage:
+    python benchmarks/bench_explain.py [--sizes 1 10 100] [--trees 200]
+
+For an API-layout RandomForest (--trees trees of depth 15) and a
+GradientBoosting model of the train_model.py configuration, reports the
+one-off TreeExplainer set-up time, then per batch size the predict time,
+the explain time and explain ms per row, and the largest gap between
+base value + contributions and the prediction. Finally times /predict
+through the Flask test client with and without "explain": true.
+"""
+
+import argparse
+import time
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor
+
+import common  # noqa: F401  (sets up sys.path)
+import inference_api
+from common import N_API_FEATURES, make_api_model, make_vendor_payloads, time_call
+from model_registry import ModelHandle
+from tree_engine import CompiledEnsemble
+from tree_explainer import TreeExplainer
+
+def gradient_boosting(seed=42):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 100, size=(5000, N_API_FEATURES))
+    y = X[:, 0] * 0.35 + X[:, 1] * 0.25 + X[:, 2] * 0.2 + X[:, 3] * 0.1 + rng.normal(0, 2, 5000)
+    return GradientBoostingRegressor(n_estimators=150, max_depth=5, learning_rate=0.1, random_state=42).fit(X, y)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--trees', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    models = {'RandomForest': make_api_model(n_estimators=args.trees), 'GradientBoosting': gradient_boosting()}
+    for name, model in models.items():
+        ensemble = CompiledEnsemble.from_sklearn(model)
+        start = time.perf_counter()
+        explainer = TreeExplainer(ensemble)
+        setup = time.perf_counter() - start
+        print(f"\n{name}: {ensemble.n_trees} trees, {len(ensemble.feature):,} nodes, "
+              f"{len(explainer.t)} quadrature points, set-up {setup * 1000:.0f} ms")
+        print(f"{'rows':>6} {'predict (ms)':>13} {'explain (ms)':>13} {'ms/row':>8} {'max additivity gap':>19}")
+        for n in args.sizes:
+            X = rng.uniform(0, 100, size=(n, N_API_FEATURES))
+            repeat = 3 if n <= 10 else 1
+            predict_time = time_call(ensemble.predict, X, repeat=repeat)
+            explain_time = time_call(explainer.shap_values, X, repeat=repeat)
+            gap = np.abs(explainer.shap_values(X).sum(axis=1) + explainer.expected_value - ensemble.predict(X)).max()
+            print(f"{n:>6} {predict_time * 1e3:>13.3f} {explain_time * 1e3:>13.1f} "
+                  f"{explain_time * 1e3 / n:>8.1f} {gap:>19.1e}")
+
+    model = models['RandomForest']
+    inference_api.registry.active = ModelHandle(model, 'benchmark', engine=CompiledEnsemble.from_sklearn(model))
+    inference_api.prediction_cache.max_entries = 0
+    client = inference_api.app.test_client()
+    vendor = make_vendor_payloads(1, seed=3)[0]['data']
+    client.post('/predict', json={'vendorData': vendor, 'explain': True})
+    print(f"\n/predict, RandomForest:")
+    for explain in (False, True):
+        request_time = time_call(client.post, '/predict', json={'vendorData': vendor, 'explain': explain}, repeat=5)
+        print(f"  explain={str(explain).lower():<5} {request_time * 1e3:>8.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark and golden check: columnar extract_feature_matrix vs the per-dict extractor
+
+Usage:
+    python benchmarks/bench_feature_extraction.py [--vendors 5000] [--records 20 2000]
+
+Before timing, the columnar output is compared bit for bit against
+extract_vendor_features on a golden set of generated payloads plus
+hand-written edge cases (missing keys, empty lists, None values, strings).
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+import common  # noqa: F401  (sets up sys.path)
+from common import make_vendor_payloads, time_call
+from feature_extraction import extract_feature_matrix, extract_vendor_features
+
+EDGE_CASES = [
+    {},
+    {'internalRecords': [], 'externalReviews': [], 'features': [], 'risks': []},
+    {'internalRecords': None, 'externalReviews': None, 'features': None, 'risks': None},
+    {'internalRecords': [{}], 'externalReviews': [{}], 'features': [{}], 'risks': [{}]},
+    {'internalRecords': [{'deliverySuccessRate': 95, 'qualityScore': 90}, {'deliverySuccessRate': 87.5}]},
+    {'internalRecords': [{'deliverySuccessRate': True, 'qualityScore': False}]},
+    {'internalRecords': [{'deliverySuccessRate': None}]},
+    {'internalRecords': [{'deliverySuccessRate': '95'}]},
+    {'externalReviews': [{'rating': 4.5, 'sentiment': 'positive'}, {'rating': 3, 'sentiment': ''}]},
+    {'externalReviews': [{'rating': 4, 'sentiment': None}, {'rating': 2, 'sentiment': 'negative'}]},
+    {'features': [{'certifications': None}]},
+    {'features': [{'yearsInBusiness': None, 'teamSize': None, 'certifications': ['a', 'b']}]},
+    {'features': [{'yearsInBusiness': 'ten'}]},
+    {'features': [{'yearsInBusiness': 2.5, 'teamSize': 12}]},
+    {'risks': [{'riskLevel': 'UNKNOWN', 'status': 'ACTIVE'}, {'riskLevel': None}, {'status': 'ACTIVE'}]},
+    {'risks': ['not a dict']},
+    None,
+    'not a dict',
+]
+
+def reference_matrix(vendor_datas):
+    """Run the per-dict reference extractor over every vendor"""
+    rows = {}
+    errors = {}
+    for i, vendor_data in enumerate(vendor_datas):
+        try:
+            rows[i] = extract_vendor_features(vendor_data)[0].astype(np.float64)
+        except Exception as e:
+            errors[i] = str(e)
+    return rows, errors
+
+def verify(vendor_datas):
+    """Return a list of mismatches between the columnar and reference extractors"""
+    matrix, row_index, errors = extract_feature_matrix(vendor_datas)
+    expected_rows, expected_errors = reference_matrix(vendor_datas)
+    
+    mismatches = []
+    if row_index != sorted(expected_rows):
+        mismatches.append(f'row index {row_index} != {sorted(expected_rows)}')
+    if errors != expected_errors:
+        mismatches.append(f'errors {errors} != {expected_errors}')
+    for row, i in zip(matrix, row_index):
+        expected = expected_rows.get(i)
+        if expected is None or row.tobytes() != expected.tobytes():
+            mismatches.append(f'vendor {i}: {row.tolist()} != {None if expected is None else expected.tolist()}')
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vendors', type=int, default=5000)
+    parser.add_argument('--records', type=int, nargs='+', default=[20, 2000])
+    args = parser.parse_args()
+    
+    golden = [v['data'] for v in make_vendor_payloads(2000, seed=7, max_records=300)]
+    golden += [v['data'] for v in make_vendor_payloads(20, seed=8, max_records=20000)]
+    golden += EDGE_CASES
+    mismatches = verify(golden) + verify(EDGE_CASES)
+    if mismatches:
+        print(f'✗ Golden check failed with {len(mismatches)} mismatches:')
+        for line in mismatches[:20]:
+            print(f'  {line}')
+        sys.exit(1)
+    print(f'✓ Golden check passed: {len(golden)} vendors bit-identical to the reference extractor')
+    
+    print(f"\n{'vendors':>8} {'records':>8} {'per-dict (s)':>13} {'columnar (s)':>13} {'speedup':>8}")
+    for max_records in args.records:
+        n = max(1, args.vendors * 20 // max_records)
+        vendor_datas = [v['data'] for v in make_vendor_payloads(n, max_records=max_records)]
+        reference_time = time_call(reference_matrix, vendor_datas)
+        columnar_time = time_call(extract_feature_matrix, vendor_datas)
+        print(f"{n:>8} {max_records:>8} {reference_time:>13.3f} {columnar_time:>13.3f} {reference_time / columnar_time:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
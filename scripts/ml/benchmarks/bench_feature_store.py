@@ -0,0 +1,95 @@
+"""
+Benchmark and equivalence check: incremental feature store vs a full pass over the CSV
+
+Usage:
+    python benchmarks/bench_feature_store.py [--history 1000000] [--delta 10000] [--vendors 5000]
+
+Writes `--history` rows to a training CSV and builds a store from it with
+update_from_csv(), then appends `--delta` rows to the CSV and times
+update_from_csv() plus feature_frame() on it, the daily training path,
+against streaming the whole CSV through aggregate_training_csv(). The
+store's feature frame is checked against engineer_features() first; means
+may differ in the last bits because they are accumulated in a different
+order, so the check uses a relative tolerance.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import common  # noqa: F401  (sets up sys.path)
+from common import make_training_frame, time_call
+from feature_store import VendorAggregateStore, aggregate_training_csv, update_from_csv
+from train_model import engineer_features
+
+def verify(df, n_batches=5):
+    """Return a list of mismatches between the store and engineer_features()"""
+    expected_X, expected_y = engineer_features(df)
+    store = VendorAggregateStore()
+    for rows in np.array_split(np.arange(len(df)), n_batches):
+        store.update(df.iloc[rows])
+    X, y = store.feature_frame()
+    
+    mismatches = []
+    if list(X.columns) != list(expected_X.columns):
+        mismatches.append(f'columns {list(X.columns)} != {list(expected_X.columns)}')
+        return mismatches
+    for column in X.columns:
+        if X[column].dtype != expected_X[column].dtype:
+            mismatches.append(f'{column}: dtype {X[column].dtype} != {expected_X[column].dtype}')
+        if not np.allclose(X[column], expected_X[column], rtol=1e-12, atol=0, equal_nan=True):
+            mismatches.append(f'{column}: values differ')
+    if not np.array_equal(y.to_numpy(), expected_y.to_numpy(), equal_nan=True):
+        mismatches.append('target differs')
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history', type=int, default=1_000_000)
+    parser.add_argument('--delta', type=int, default=10_000)
+    parser.add_argument('--vendors', type=int, default=5000)
+    args = parser.parse_args()
+    
+    golden = make_training_frame(50_000, n_vendors=500, seed=7)
+    golden.loc[3, 'quality_score'] = np.nan
+    mismatches = verify(golden)
+    if mismatches:
+        print(f'✗ Equivalence check failed with {len(mismatches)} mismatches:')
+        for mismatch in mismatches:
+            print(f'  {mismatch}')
+        sys.exit(1)
+    print('✓ Feature store matches engineer_features()')
+    
+    workdir = tempfile.mkdtemp()
+    csv_path = os.path.join(workdir, 'vendor_training_data.csv')
+    history_store = os.path.join(workdir, 'history_store.npz')
+    store_path = os.path.join(workdir, 'feature_store.npz')
+    make_training_frame(args.history, n_vendors=args.vendors, seed=1).to_csv(csv_path, index=False)
+    update_from_csv(history_store, csv_path)
+    make_training_frame(args.delta, n_vendors=args.vendors, seed=2).to_csv(csv_path, mode='a', header=False, index=False)
+    
+    def incremental(repeat=3):
+        # The daily path: fold the appended rows into the saved store, rebuild the frame.
+        # Each run starts from a copy of the history store, outside the timing
+        best = float('inf')
+        for _ in range(repeat):
+            shutil.copyfile(history_store, store_path)
+            start = time.perf_counter()
+            update_from_csv(store_path, csv_path).feature_frame()
+            best = min(best, time.perf_counter() - start)
+        return best
+    
+    full_time = time_call(lambda: aggregate_training_csv(csv_path).feature_frame())
+    update_time = incremental()
+    print(f'\n{args.history:,} history rows + {args.delta:,} appended rows, {args.vendors:,} vendors')
+    print(f'{"aggregate whole CSV + frame":>28}: {full_time * 1000:9.1f} ms')
+    print(f'{"update_from_csv + frame":>28}: {update_time * 1000:9.1f} ms  ({full_time / update_time:.1f}x)')
+    shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: concurrent single-row predictions with and without micro-batching
+
+Usage:
+    python benchmarks/bench_micro_batching.py [--clients 100] [--requests 20] [--max-wait-ms 2]
+
+Each client thread sends --requests single-row predictions back to back.
+Reports throughput and per-request latency for direct model calls and for
+the MicroBatcher, plus the batcher's batch-size and queue-wait histograms.
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+import common  # noqa: F401  (sets up sys.path)
+import inference_api
+from common import N_API_FEATURES, load_or_make_api_model
+from micro_batching import MicroBatcher
+from model_registry import ModelHandle
+from serving import PredictionExecutor
+from tree_engine import compile_model
+
+def run_clients(predict_one, n_clients, n_requests):
+    """Return (wall seconds, per-request latencies) for all clients"""
+    rng = np.random.default_rng(0)
+    rows = rng.uniform(0, 100, size=(n_clients, n_requests, N_API_FEATURES))
+    latencies = [[] for _ in range(n_clients)]
+    
+    def client(c):
+        for r in range(n_requests):
+            start = time.perf_counter()
+            predict_one(rows[c, r:r + 1])
+            latencies[c].append(time.perf_counter() - start)
+    
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(n_clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, np.concatenate(latencies)
+
+def report(name, wall, latencies):
+    print(f"{name:>12} {len(latencies) / wall:>10.0f} {np.percentile(latencies, 50) * 1e3:>9.2f} "
+          f"{np.percentile(latencies, 99) * 1e3:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+    
+    model = load_or_make_api_model()
+    handle = ModelHandle(model, 'benchmark', engine=compile_model(model))
+    # Enough queue room that no client is rejected
+    inference_api.predict_executor = PredictionExecutor(max_workers=4, max_queue=args.clients)
+    batcher = MicroBatcher(
+        inference_api.submit_predict,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_queue=args.clients * 2
+    )
+    
+    print(f"{args.clients} clients x {args.requests} single-row requests\n")
+    print(f"{'mode':>12} {'req/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    report('direct', *run_clients(lambda rows: inference_api.model_predict(rows, handle),
+                                  args.clients, args.requests))
+    report('microbatch', *run_clients(lambda rows: batcher.predict(rows, key=handle),
+                                      args.clients, args.requests))
+    
+    stats = batcher.stats()
+    print('\nbatch size histogram (cumulative):')
+    print('  ' + ', '.join(f'<={k}: {v}' for k, v in stats['batch_size']['buckets'].items()))
+    print('queue wait histogram in seconds (cumulative):')
+    print('  ' + ', '.join(f'<={k}: {v}' for k, v in stats['queue_wait_seconds']['buckets'].items()))
+
+if __name__ == '__main__':
+    main()
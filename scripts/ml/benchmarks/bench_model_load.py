@@ -0,0 +1,116 @@
+"""
+Benchmark: cold start of a joblib pickle vs the memory-mapped artifact
+
+Usage:
+    python benchmarks/bench_model_load.py [--workers 4] [--model-dir models]
+
+Starts --workers fresh Python processes per format, all loading the same
+model at the same time like gunicorn workers would. Each reports its
+time-to-first-prediction (imports + load + one predict), then its memory
+from /proc/self/smaps_rollup while every worker is still alive: RSS counts
+shared page-cache pages in full, PSS splits them across the processes
+sharing them, and Private is what the worker alone holds.
+
+Without --model-dir a 200-tree RandomForest is fitted and saved to a
+temporary directory first.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import common
+from common import make_api_model
+
+WORKER = r'''
+import json, sys, time
+start = time.perf_counter()
+mode, path, metadata_path, n_features = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+sys.path.insert(0, sys.argv[5])
+import numpy as np
+if mode == 'joblib':
+    import joblib
+    model = joblib.load(path)
+else:
+    from model_artifact import load_artifact
+    model = load_artifact(path, metadata_path=metadata_path)
+model.predict(np.zeros((1, n_features)))
+print(json.dumps({'ttfp': time.perf_counter() - start}), flush=True)
+
+sys.stdin.readline()
+memory = {}
+with open('/proc/self/smaps_rollup') as f:
+    for line in f:
+        parts = line.split()
+        if parts[0] in ('Rss:', 'Pss:', 'Private_Clean:', 'Private_Dirty:'):
+            memory[parts[0].rstrip(':')] = int(parts[1]) / 1024
+print(json.dumps(memory), flush=True)
+'''
+
+def run_workers(mode, path, metadata_path, n_features, n_workers):
+    """Start the workers together and collect their timings and memory"""
+    procs = [
+        subprocess.Popen(
+            [sys.executable, '-c', WORKER, mode, path, metadata_path, str(n_features), common.ML_DIR],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        for _ in range(n_workers)
+    ]
+    timings = [json.loads(p.stdout.readline()) for p in procs]
+    for p in procs:
+        p.stdin.write('\n')
+        p.stdin.flush()
+    memory = [json.loads(p.stdout.readline()) for p in procs]
+    for p in procs:
+        p.wait()
+    return timings, memory
+
+def prepare_models(directory):
+    """Fit a RandomForest and save it in both formats the way save_model() does"""
+    import joblib
+    from model_artifact import save_artifact
+    from tree_engine import CompiledEnsemble
+    
+    model = make_api_model()
+    pickle_path = os.path.join(directory, 'vendor_scoring_model.pkl')
+    artifact_path = os.path.join(directory, 'vendor_scoring_model.bin')
+    metadata_path = os.path.join(directory, 'model_metadata.json')
+    
+    joblib.dump(model, pickle_path)
+    artifact = save_artifact(CompiledEnsemble.from_sklearn(model), artifact_path, 'benchmark')
+    with open(metadata_path, 'w') as f:
+        json.dump({'version': 'benchmark', 'artifact': artifact}, f)
+    return pickle_path, artifact_path, metadata_path, model.n_features_in_
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--model-dir', help='directory with vendor_scoring_model.pkl/.bin and model_metadata.json')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.model_dir:
+            from model_artifact import read_header
+            pickle_path = os.path.join(args.model_dir, 'vendor_scoring_model.pkl')
+            artifact_path = os.path.join(args.model_dir, 'vendor_scoring_model.bin')
+            metadata_path = os.path.join(args.model_dir, 'model_metadata.json')
+            n_features = read_header(artifact_path)['params']['n_features']
+        else:
+            pickle_path, artifact_path, metadata_path, n_features = prepare_models(tmp)
+        
+        print(f"pickle {os.path.getsize(pickle_path) / 2**20:.1f} MB, "
+              f"artifact {os.path.getsize(artifact_path) / 2**20:.1f} MB, {args.workers} workers\n")
+        print(f"{'format':>8} {'ttfp (ms)':>10} {'RSS (MB)':>9} {'PSS (MB)':>9} {'private (MB)':>13}")
+        for mode, path in (('joblib', pickle_path), ('memmap', artifact_path)):
+            timings, memory = run_workers(mode, path, metadata_path, n_features, args.workers)
+            mean = lambda values: sum(values) / len(values)
+            print(f"{mode:>8} {mean([t['ttfp'] for t in timings]) * 1e3:>10.1f} "
+                  f"{mean([m['Rss'] for m in memory]):>9.1f} "
+                  f"{mean([m['Pss'] for m in memory]):>9.1f} "
+                  f"{mean([m['Private_Clean'] + m['Private_Dirty'] for m in memory]):>13.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: A/B and shadow scoring with shared feature extraction
+
+Usage:
+    python benchmarks/bench_model_variants.py [--sizes 100 1000 10000] [--shadows 2]
+
+Times predict_batch for one batch of vendors in three setups:
+
+  primary    the primary model only
+  variants   a 20% A/B variant plus --shadows shadow models on 100% of
+             vendors; features are extracted once and the shadows run on
+             their own pool after the response is built
+  separate   every model scored with its own predict_batch call, i.e.
+             what sending each request once per model would cost
+
+"shadow done" is the time until the shadow log has every record.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import common  # noqa: F401  (sets up sys.path)
+import inference_api
+from common import make_api_model, make_vendor_payloads, time_call
+from model_registry import ModelHandle
+from model_variants import ShadowLog, ShadowScorer, Variant, VariantRouter
+from tree_engine import compile_model
+
+def make_handle(name, seed):
+    model = make_api_model(n_estimators=100, max_depth=12, seed=seed)
+    return ModelHandle(model, name, engine=compile_model(model))
+
+def score_separately(vendors, handles):
+    for handle in handles:
+        inference_api.predict_batch(vendors, handle)
+
+def wait_for_shadows(scorer):
+    while scorer.executor.in_flight:
+        time.sleep(0.001)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--shadows', type=int, default=2)
+    args = parser.parse_args()
+    
+    inference_api.prediction_cache.max_entries = 0
+    primary = make_handle('primary', 42)
+    variants = [Variant('candidate', make_handle('candidate', 1), 'ab', 0.2)]
+    variants += [Variant(f'shadow-{k}', make_handle(f'shadow-{k}', 10 + k), 'shadow', 1.0) for k in range(args.shadows)]
+    router = VariantRouter(variants)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        scorer = ShadowScorer(router.shadows, ShadowLog(os.path.join(tmp, 'shadow.ndjson')), max_queue=1024)
+        print(f"{'vendors':>10} {'primary (ms)':>13} {'variants (ms)':>14} {'shadow done (ms)':>17} {'separate (ms)':>14}")
+        for n in args.sizes:
+            vendors = make_vendor_payloads(n)
+            repeat = 5 if n <= 1000 else 2
+            
+            inference_api.variant_router, inference_api.shadow_scorer = VariantRouter([]), None
+            primary_time = time_call(inference_api.predict_batch, vendors, primary, repeat=repeat)
+            separate_time = time_call(score_separately, vendors, [primary] + [v.handle for v in variants], repeat=repeat)
+            
+            inference_api.variant_router, inference_api.shadow_scorer = router, scorer
+            request_times = []
+            done_times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                inference_api.predict_batch(vendors, primary)
+                request_times.append(time.perf_counter() - start)
+                wait_for_shadows(scorer)
+                done_times.append(time.perf_counter() - start)
+            assert scorer.dropped == 0 and scorer.failed == 0
+            
+            print(f"{n:>10} {primary_time * 1000:>13.2f} {min(request_times) * 1000:>14.2f} "
+                  f"{min(done_times) * 1000:>17.2f} {separate_time * 1000:>14.2f}")
+        inference_api.variant_router, inference_api.shadow_scorer = VariantRouter([]), None
+        scorer.log.close()
+
+if __name__ == '__main__':
+    main()
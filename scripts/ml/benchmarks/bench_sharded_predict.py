@@ -0,0 +1,82 @@
+"""
+Benchmark: row-sharded batch prediction across worker processes
+
+Usage:
+    python benchmarks/bench_sharded_predict.py [--sizes 10000 100000] [--max-workers N] [--trees 200]
+
+Saves an API-layout RandomForest (scored by the compiled engine) and a
+GradientBoosting model left to sklearn's own predict, then scores each
+batch size in-process and through a ShardPool of 1 to --max-workers
+workers (default: one per CPU beyond this process), reporting the best
+time, rows/s and the speedup over in-process. Each pool is warmed with
+one batch first, so process start and model loading are not timed. On a
+machine with fewer CPUs than workers + 1 the speedup drops below 1: the
+shards only add hand-off cost.
+"""
+
+import argparse
+import os
+import tempfile
+
+import joblib
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor
+
+import common  # noqa: F401  (sets up sys.path)
+from common import N_API_FEATURES, make_api_model, time_call
+from model_registry import ModelHandle
+from sharded_predict import MIN_SHARD_ROWS, ShardPool, default_workers
+from tree_engine import compile_model
+
+def load_handle(model_path, compiled):
+    """Loader the workers run: the pickled model, compiled or left to sklearn"""
+    model = joblib.load(model_path)
+    return ModelHandle(model, 'benchmark', engine=compile_model(model) if compiled else None,
+                       loader=(load_handle, (model_path, compiled)))
+
+def gradient_boosting(seed=42):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 100, size=(5000, N_API_FEATURES))
+    y = X[:, 0] * 0.35 + X[:, 1] * 0.25 + X[:, 2] * 0.2 + X[:, 3] * 0.1 + rng.normal(0, 2, 5000)
+    return GradientBoostingRegressor(n_estimators=150, max_depth=5, learning_rate=0.1, random_state=42).fit(X, y)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--max-workers', type=int, default=max(1, default_workers()))
+    parser.add_argument('--trees', type=int, default=200)
+    parser.add_argument('--min-shard-rows', type=int, default=MIN_SHARD_ROWS)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"\n{os.cpu_count()} CPU(s), shards of at least {args.min_shard_rows} rows")
+    with tempfile.TemporaryDirectory() as work_dir:
+        models = [
+            ('RandomForest (compiled)', make_api_model(n_estimators=args.trees), True),
+            ('GradientBoosting (sklearn)', gradient_boosting(), False),
+        ]
+        for i, (name, model, compiled) in enumerate(models):
+            model_path = os.path.join(work_dir, f'model-{i}.pkl')
+            joblib.dump(model, model_path)
+            handle = load_handle(model_path, compiled)
+            print(f"\n{name}")
+            print(f"{'rows':>8} {'workers':>8} {'ms':>10} {'rows/s':>11} {'speedup':>8}")
+            for n in args.sizes:
+                X = rng.uniform(0, 100, size=(n, N_API_FEATURES))
+                expected = handle.predict(X)
+                repeat = max(1, min(5, 200_000 // n))
+                baseline = time_call(handle.predict, X, repeat=repeat)
+                print(f"{n:>8} {'in-proc':>8} {baseline * 1e3:>10.1f} {n / baseline:>11,.0f} {1.0:>7.2f}x")
+                for workers in range(1, args.max_workers + 1):
+                    pool = ShardPool(workers, min_shard_rows=args.min_shard_rows, preload=[handle.spec])
+                    try:
+                        if not np.array_equal(pool.predict(handle.spec, X, handle.predict), expected):
+                            raise AssertionError(f'{workers} workers changed the predictions')
+                        seconds = time_call(pool.predict, handle.spec, X, handle.predict, repeat=repeat)
+                    finally:
+                        pool.shutdown()
+                    print(f"{n:>8} {workers:>8} {seconds * 1e3:>10.1f} {n / seconds:>11,.0f} "
+                          f"{baseline / seconds:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
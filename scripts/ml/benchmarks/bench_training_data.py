@@ -0,0 +1,107 @@
+"""
+Benchmark: streaming typed loader vs read_csv + engineer_features()
+
+Usage:
+    python benchmarks/bench_training_data.py [--rows 2000000] [--vendors 5000] [--chunk-rows 250000]
+
+Writes a synthetic vendor_training_data.csv, then runs each loading path in
+a fresh process and reports wall time and peak RSS (VmHWM) for
+producing the per-vendor aggregates:
+
+  read_csv      pd.read_csv with default dtypes + engineer_vendor_features()
+  stream        typed chunks from the CSV into VendorAggregateStore
+  stream+cache  the same, building the columnar .npy cache on the way
+  cache         a repeat run that reads the cache instead of the CSV
+
+The streamed aggregates are checked against the read_csv ones first
+(float32 parsing moves means by up to ~1e-6 relative).
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import common  # noqa: F401  (sets up sys.path)
+from common import make_training_frame
+from feature_store import aggregate_training_csv
+from train_model import engineer_vendor_features
+
+MODES = ('read_csv', 'stream', 'stream+cache', 'cache')
+
+def run_mode(mode, csv_path, cache_dir, chunk_rows):
+    """Produce the per-vendor aggregates the way `mode` does"""
+    if mode == 'read_csv':
+        table, _ = engineer_vendor_features(pd.read_csv(csv_path))
+        return table
+    store = aggregate_training_csv(
+        csv_path, chunksize=chunk_rows, cache_dir=cache_dir if mode != 'stream' else None
+    )
+    return store.vendor_frame()
+
+def child(args):
+    start = time.perf_counter()
+    run_mode(args.child, args.csv, args.cache_dir, args.chunk_rows)
+    seconds = time.perf_counter() - start
+    # ru_maxrss would include the parent's peak from before exec; VmHWM is this process only
+    with open('/proc/self/status') as f:
+        peak_kib = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+    print(f'{seconds} {peak_kib}')
+
+def verify(csv_path, cache_dir, chunk_rows):
+    expected = run_mode('read_csv', csv_path, cache_dir, chunk_rows).sort_index()
+    mismatches = []
+    for mode in ('stream', 'stream+cache', 'cache'):
+        table = run_mode(mode, csv_path, cache_dir, chunk_rows).sort_index()
+        if list(table.columns) != list(expected.columns) or not table.index.equals(expected.index):
+            mismatches.append(f'{mode}: layout differs')
+            continue
+        if not np.allclose(table.to_numpy(float), expected.to_numpy(float), rtol=1e-6, atol=0):
+            mismatches.append(f'{mode}: values differ')
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--vendors', type=int, default=5000)
+    parser.add_argument('--chunk-rows', type=int, default=250_000)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    parser.add_argument('--cache-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+    
+    work_dir = tempfile.mkdtemp()
+    golden_csv = os.path.join(work_dir, 'golden.csv')
+    make_training_frame(20_000, n_vendors=300, seed=7).to_csv(golden_csv, index=False)
+    mismatches = verify(golden_csv, os.path.join(work_dir, 'golden_cache'), 3000)
+    if mismatches:
+        print(f'✗ Equivalence check failed with {len(mismatches)} mismatches:')
+        for mismatch in mismatches:
+            print(f'  {mismatch}')
+        sys.exit(1)
+    print('✓ Streamed aggregates match read_csv + engineer_vendor_features()')
+    
+    csv_path = os.path.join(work_dir, 'vendor_training_data.csv')
+    make_training_frame(args.rows, n_vendors=args.vendors, seed=1).to_csv(csv_path, index=False)
+    cache_dir = os.path.join(work_dir, 'cache')
+    print(f'\n{args.rows:,} rows ({os.path.getsize(csv_path) / 2**20:.0f} MiB CSV), {args.vendors:,} vendors')
+    print(f'{"mode":>14} {"time s":>8} {"peak RSS MiB":>13}')
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', mode, '--csv', csv_path, '--cache-dir', cache_dir,
+             '--chunk-rows', str(args.chunk_rows)],
+            check=True, capture_output=True, text=True
+        ).stdout.split('\n')[-2]
+        seconds, peak_kib = output.split()
+        print(f'{mode:>14} {float(seconds):8.2f} {int(peak_kib) / 1024:13.1f}')
+
+if __name__ == '__main__':
+    main()
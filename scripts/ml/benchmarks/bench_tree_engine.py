@@ -0,0 +1,67 @@
+"""
+Benchmark: compiled tree engine vs sklearn predict
+
+Usage:
+    python benchmarks/bench_tree_engine.py [--sizes 1 10 100 1000 10000]
+
+Fits the two model configurations used by train_model.py on synthetic
+data, checks the compiled predictions against sklearn, then reports the
+mean latency per predict call for each batch size.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+import common  # noqa: F401  (sets up sys.path)
+from common import time_call
+from tree_engine import CompiledEnsemble
+
+N_FEATURES = 15
+
+def training_models():
+    """The RandomForest and GradientBoosting configurations from train_model.py"""
+    return {
+        'RandomForest': RandomForestRegressor(
+            n_estimators=200, max_depth=15, min_samples_split=5,
+            min_samples_leaf=2, random_state=42, n_jobs=-1
+        ),
+        'GradientBoosting': GradientBoostingRegressor(
+            n_estimators=150, max_depth=5, learning_rate=0.1, random_state=42
+        ),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--train-rows', type=int, default=5000)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(42)
+    X = rng.normal(size=(args.train_rows, N_FEATURES))
+    y = X[:, 0] * 3 + X[:, 1] ** 2 + np.sin(X[:, 2]) + rng.normal(0, 0.5, args.train_rows)
+    
+    for name, model in training_models().items():
+        model.fit(X, y)
+        ensemble = CompiledEnsemble.from_sklearn(model)
+        
+        X_check = rng.normal(size=(5000, N_FEATURES))
+        max_diff = np.abs(model.predict(X_check) - ensemble.predict(X_check)).max()
+        print(f"\n{name}: {ensemble.n_trees} trees, {len(ensemble.feature)} nodes, "
+              f"max depth {ensemble.max_depth}, max |diff| vs sklearn {max_diff:.2e}")
+        if max_diff > 1e-9:
+            print('✗ Compiled predictions differ from sklearn')
+            sys.exit(1)
+        
+        print(f"{'rows':>8} {'sklearn (ms)':>13} {'compiled (ms)':>14} {'speedup':>8}")
+        for n in args.sizes:
+            X_batch = rng.normal(size=(n, N_FEATURES))
+            repeat = max(3, min(200, 2000 // n))
+            sklearn_time = time_call(model.predict, X_batch, repeat=repeat)
+            compiled_time = time_call(ensemble.predict, X_batch, repeat=repeat)
+            print(f"{n:>8} {sklearn_time * 1e3:>13.3f} {compiled_time * 1e3:>14.3f} {sklearn_time / compiled_time:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark and equivalence check: VendorScorer fast path vs the previous score_vendor()
+
+Usage:
+    python benchmarks/bench_vendor_scorer.py [--calls 2000] [--batch 1000] [--trees 200]
+
+Fits a StandardScaler + RandomForest on synthetic training rows, saves it
+as a memory-mapped artifact and loads it with VendorScorer. The previous
+score_vendor() (array from dict.get calls, scaler.transform, predict,
+importance dict rebuilt per call) is kept below as legacy_score_vendor.
+Reported: single-vendor latency percentiles for both, score_many()
+throughput against a legacy loop, and the one-off cost of folding the
+scaler into the thresholds. Every result is checked for equality.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+import common  # noqa: F401  (sets up sys.path)
+from common import make_training_frame
+from inference import FEATURE_DEFAULTS, IMPORTANCE_NAMES, VendorScorer, feature_matrix, recommendation
+from model_artifact import save_artifact
+from train_model import engineer_features
+from tree_engine import CompiledEnsemble
+
+def legacy_score_vendor(scorer, features):
+    """score_vendor() as it was before the fast path"""
+    feature_array = np.array([features.get(name, default) for name, default in FEATURE_DEFAULTS]).reshape(1, -1)
+    score = scorer.predict(scorer.scaler.transform(feature_array))[0]
+    try:
+        importance = dict(zip(IMPORTANCE_NAMES, scorer.feature_importances))
+    except Exception:
+        importance = {}
+    return {'score': float(score), 'feature_importance': importance, 'recommendation': recommendation(score)}
+
+def build_scorer(model_dir, n_trees):
+    X, y = engineer_features(make_training_frame(200_000))
+    # Fitted on a plain array, as score_vendor() passes one to the scaler
+    scaler = StandardScaler().fit(X.to_numpy())
+    model = RandomForestRegressor(
+        n_estimators=n_trees, max_depth=15, min_samples_split=5, min_samples_leaf=2,
+        random_state=42, n_jobs=-1
+    ).fit(scaler.transform(X.to_numpy()), y)
+
+    paths = {name: os.path.join(model_dir, name) for name in
+             ('vendor_scoring_model.pkl', 'feature_scaler.pkl', 'vendor_scoring_model.bin', 'model_metadata.json')}
+    joblib.dump(model, paths['vendor_scoring_model.pkl'])
+    joblib.dump(scaler, paths['feature_scaler.pkl'])
+    artifact = save_artifact(CompiledEnsemble.from_sklearn(model), paths['vendor_scoring_model.bin'], 'benchmark')
+    with open(paths['model_metadata.json'], 'w') as f:
+        json.dump({'version': 'benchmark', 'artifact': artifact}, f)
+
+    rows = [{name: float(value) for name, value in row.items()} for row in X.drop_duplicates().to_dict('records')]
+    return VendorScorer(*paths.values()), rows
+
+def percentiles(seconds):
+    ms = np.asarray(seconds) * 1000
+    return '  '.join(f'p{q}={np.percentile(ms, q):.3f}ms' for q in (50, 90, 99))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--trees', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        scorer, rows = build_scorer(model_dir, args.trees)
+        start = time.perf_counter()
+        scorer.engine.fold_scaler(scorer.scaler.mean_, scorer.scaler.scale_)
+        print(f'Scaler folded into {len(scorer.engine.threshold)} nodes in {time.perf_counter() - start:.3f}s')
+
+        calls = [rows[i % len(rows)] for i in range(args.calls)]
+        calls[:3] = [{}, {'avg_quality_score': 95}, {'total_projects': 2, 'team_size': 400}]
+        for features in calls:
+            assert legacy_score_vendor(scorer, features) == scorer.score_vendor(features), features
+
+        for name, fn in (('legacy score_vendor', legacy_score_vendor), ('score_vendor', None)):
+            seconds = []
+            for features in calls:
+                start = time.perf_counter()
+                if fn is None:
+                    scorer.score_vendor(features)
+                else:
+                    fn(scorer, features)
+                seconds.append(time.perf_counter() - start)
+            print(f'{name:<22} {percentiles(seconds)}')
+
+        batch = calls[:args.batch]
+        start = time.perf_counter()
+        legacy = [legacy_score_vendor(scorer, features) for features in batch]
+        legacy_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        many = scorer.score_many(batch)
+        many_seconds = time.perf_counter() - start
+        # score_many sums tree outputs as one batch, like predicting the
+        # scaled rows together, so it is compared against that
+        scaled_batch = scorer.predict(scorer.scaler.transform(feature_matrix(batch)))
+        assert [result['score'] for result in many] == [float(score) for score in scaled_batch]
+        assert np.allclose([result['score'] for result in many], [result['score'] for result in legacy], rtol=0, atol=1e-9)
+        print(f'{"legacy loop":<22} {len(batch) / legacy_seconds:>10.0f} vendors/s')
+        print(f'{"score_many":<22} {len(batch) / many_seconds:>10.0f} vendors/s')
+        print('✓ Results identical to the previous implementation')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Shared helpers for the ML benchmark scripts
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+# Make the scripts/ml modules importable when running a benchmark directly
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ML_DIR not in sys.path:
+    sys.path.insert(0, ML_DIR)
+
+N_API_FEATURES = 11
+
+def make_vendor_payloads(n_vendors, seed=42, max_records=20):
+    """Generate vendor payloads shaped like the Next.js /predict requests"""
+    rng = np.random.default_rng(seed)
+    sentiments = ['positive', 'neutral', 'negative', None]
+    risk_levels = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+    
+    vendors = []
+    for i in range(n_vendors):
+        n_internal = int(rng.integers(0, max_records + 1))
+        n_reviews = int(rng.integers(0, max_records + 1))
+        n_risks = int(rng.integers(0, 5))
+        vendors.append({
+            'id': f'VENDOR_{i:06d}',
+            'data': {
+                'internalRecords': [{
+                    'deliverySuccessRate': float(rng.uniform(50, 100)),
+                    'qualityScore': float(rng.uniform(50, 100)),
+                    'costEfficiency': float(rng.uniform(40, 100)),
+                    'complianceScore': float(rng.uniform(70, 100)),
+                } for _ in range(n_internal)],
+                'externalReviews': [{
+                    'rating': float(rng.uniform(2.5, 5.0)),
+                    'sentiment': sentiments[int(rng.integers(0, 4))],
+                } for _ in range(n_reviews)],
+                'features': [{
+                    'certifications': ['ISO9001'] * int(rng.integers(0, 8)),
+                    'yearsInBusiness': int(rng.integers(1, 40)),
+                    'teamSize': int(rng.integers(5, 1000)),
+                }],
+                'risks': [{
+                    'riskLevel': risk_levels[int(rng.integers(0, 4))],
+                    'severity': int(rng.integers(1, 10)),
+                    'status': 'ACTIVE' if rng.random() < 0.5 else 'RESOLVED',
+                } for _ in range(n_risks)],
+            },
+        })
+    return vendors
+
+def make_api_model(n_estimators=200, max_depth=15, n_samples=5000, seed=42, n_outputs=1):
+    """
+    Fit a RandomForest on synthetic data with the inference_api feature layout
+    
+    With n_outputs > 1 the first output is the overall score and the others
+    are further noisy mixes of the features, like a component-score model.
+    """
+    from sklearn.ensemble import RandomForestRegressor
+    
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 100, size=(n_samples, N_API_FEATURES))
+    y = X[:, 0] * 0.35 + X[:, 1] * 0.25 + X[:, 2] * 0.2 + X[:, 3] * 0.1 + rng.normal(0, 2, n_samples)
+    if n_outputs > 1:
+        weights = rng.dirichlet(np.ones(N_API_FEATURES), size=n_outputs - 1)
+        components = X @ weights.T + rng.normal(0, 2, (n_samples, n_outputs - 1))
+        y = np.column_stack([y, components])
+    model = RandomForestRegressor(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        min_samples_split=5,
+        min_samples_leaf=2,
+        random_state=seed,
+        n_jobs=-1
+    )
+    model.fit(X, y)
+    return model
+
+def load_or_make_api_model():
+    """Use the deployed model when MODEL_PATH points at one, otherwise a synthetic stand-in"""
+    model_path = os.getenv('MODEL_PATH')
+    if model_path and os.path.exists(model_path):
+        import joblib
+        return joblib.load(model_path)
+    return make_api_model()
+
+def make_training_frame(n_rows, n_vendors=5000, seed=42):
+    """Generate project rows with the vendor_training_data.csv columns"""
+    import pandas as pd
+    
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'vendor_id': np.char.add('VENDOR_', np.char.zfill(rng.integers(0, n_vendors, n_rows).astype(str), 6)),
+        'delivery_success_rate': rng.uniform(50, 100, n_rows),
+        'quality_score': rng.uniform(50, 100, n_rows),
+        'cost_efficiency': rng.uniform(40, 100, n_rows),
+        'compliance_score': rng.uniform(70, 100, n_rows),
+        'contract_value': rng.uniform(50000, 500000, n_rows),
+        'response_time_hours': rng.uniform(1, 48, n_rows),
+        'incident_count': rng.poisson(1, n_rows),
+        'external_rating': rng.uniform(2.5, 5.0, n_rows),
+        'review_count': rng.integers(10, 500, n_rows),
+        'certification_count': rng.integers(1, 8, n_rows),
+        'years_in_business': rng.integers(3, 25, n_rows),
+        'team_size': rng.integers(10, 500, n_rows),
+        'high_risk_flag': (rng.random(n_rows) < 0.15).astype(np.int64),
+        'compliance_issue': (rng.random(n_rows) < 0.1).astype(np.int64),
+    })
+
+def time_call(fn, *args, repeat=3, **kwargs):
+    """Return the best wall-clock time in seconds over `repeat` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
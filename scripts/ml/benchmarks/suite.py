@@ -0,0 +1,435 @@
+"""
+End-to-end performance suite for training and inference, with regression compare
+
+Usage:
+    python benchmarks/suite.py run [--scales small medium] [--cases ...] [--output results.json]
+    python benchmarks/suite.py compare baseline.json results.json [--threshold 0.10]
+
+`run` builds synthetic data and models per scale in a temporary directory
+and runs every case in a fresh process, so each case also reports its own
+peak RSS (VmHWM). Cases:
+
+  feature_engineering  engineer_features() and the streaming aggregation, rows/s
+  training             fit time per candidate model type
+  prediction           VendorScorer.score_vendor single-row latency
+                       percentiles, batch predict and score_many rows/s
+  model_load           joblib pickle vs memory-mapped artifact vs VendorScorer
+  http                 /predict and /batch-predict against a local gunicorn
+                       running inference_api, with the prediction cache off
+
+Results are written as JSON: {"meta": {...}, "results": {scale: {case:
+{metric: value}}}}. Metric names carry their unit; `_per_s` metrics are
+better when higher, everything else (`_ms`, `_s`, `_mib`) when lower.
+
+`compare` prints every metric present in both files and exits with status
+1 when any got worse by more than --threshold (relative).
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+import common
+from common import make_api_model, make_vendor_payloads
+
+SCALES = {
+    'small': {'rows': 100_000, 'train_rows': 5_000, 'batch': 100,
+              'latency_calls': 500, 'http_seconds': 5, 'http_clients': 4},
+    'medium': {'rows': 1_000_000, 'train_rows': 20_000, 'batch': 1_000,
+               'latency_calls': 2_000, 'http_seconds': 15, 'http_clients': 8},
+    'large': {'rows': 10_000_000, 'train_rows': 100_000, 'batch': 10_000,
+              'latency_calls': 5_000, 'http_seconds': 30, 'http_clients': 16},
+}
+CASES = ('feature_engineering', 'training', 'prediction', 'model_load', 'http')
+HTTP_BATCH_SIZE = 100
+
+def peak_rss_mib(pid='self'):
+    """Peak resident set size of a process, from /proc VmHWM"""
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def latency_stats(prefix, seconds):
+    """p50/p95/p99/mean of a list of per-call durations, in milliseconds"""
+    ms = np.asarray(seconds) * 1000
+    return {
+        f'{prefix}_p50_ms': round(float(np.percentile(ms, 50)), 4),
+        f'{prefix}_p95_ms': round(float(np.percentile(ms, 95)), 4),
+        f'{prefix}_p99_ms': round(float(np.percentile(ms, 99)), 4),
+        f'{prefix}_mean_ms': round(float(ms.mean()), 4),
+    }
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def build_fixtures(scale, work_dir):
+    """Synthetic training CSV, a trained 15-feature scorer and an 11-feature API model"""
+    import joblib
+    from sklearn.preprocessing import StandardScaler
+
+    from model_artifact import save_artifact
+    from model_selection import default_candidates
+    from synthetic_data import write_csv
+    from train_model import engineer_features
+    from training_data import read_training_csv
+    from tree_engine import CompiledEnsemble
+
+    params = SCALES[scale]
+    rows_per_vendor = 5.5  # mean of the default 2-9 projects per vendor
+    csv_path = os.path.join(work_dir, 'vendor_training_data.csv')
+    write_csv(csv_path, max(1, int(params['rows'] / rows_per_vendor)), seed=1)
+    train_csv = os.path.join(work_dir, 'train.csv')
+    write_csv(train_csv, max(1, int(params['train_rows'] / rows_per_vendor)), seed=2)
+
+    X, y = engineer_features(read_training_csv(train_csv))
+    scaler = StandardScaler().fit(X)
+    model = default_candidates()['RandomForest'].set_params(n_jobs=-1).fit(scaler.transform(X), y)
+
+    scorer_dir = os.path.join(work_dir, 'scorer')
+    os.makedirs(scorer_dir)
+    joblib.dump(model, os.path.join(scorer_dir, 'vendor_scoring_model.pkl'))
+    joblib.dump(scaler, os.path.join(scorer_dir, 'feature_scaler.pkl'))
+    artifact = save_artifact(CompiledEnsemble.from_sklearn(model), os.path.join(scorer_dir, 'vendor_scoring_model.bin'), 'benchmark')
+    with open(os.path.join(scorer_dir, 'model_metadata.json'), 'w') as f:
+        json.dump({'version': 'benchmark', 'artifact': artifact}, f)
+
+    api_dir = os.path.join(work_dir, 'api')
+    os.makedirs(api_dir)
+    api_model = make_api_model()
+    joblib.dump(api_model, os.path.join(api_dir, 'vendor_score_model.pkl'))
+    artifact = save_artifact(CompiledEnsemble.from_sklearn(api_model), os.path.join(api_dir, 'vendor_score_model.bin'), 'benchmark')
+    with open(os.path.join(api_dir, 'model_metadata.json'), 'w') as f:
+        json.dump({'version': 'benchmark', 'artifact': artifact}, f)
+
+def case_feature_engineering(params, work_dir):
+    from feature_store import aggregate_training_csv
+    from train_model import engineer_features
+    from training_data import read_training_csv
+
+    csv_path = os.path.join(work_dir, 'vendor_training_data.csv')
+    df = read_training_csv(csv_path)
+    n_rows = len(df)
+    _, engineer_seconds = timed(engineer_features, df)
+    del df
+    _, stream_seconds = timed(aggregate_training_csv, csv_path, chunksize=250_000)
+    return {
+        'rows': n_rows,
+        'engineer_features_rows_per_s': round(n_rows / engineer_seconds),
+        'engineer_features_s': round(engineer_seconds, 4),
+        'stream_aggregate_rows_per_s': round(n_rows / stream_seconds),
+    }
+
+def case_training(params, work_dir):
+    from sklearn.preprocessing import StandardScaler
+
+    from model_selection import default_candidates
+    from train_model import engineer_features
+    from training_data import read_training_csv
+
+    X, y = engineer_features(read_training_csv(os.path.join(work_dir, 'train.csv')))
+    X = StandardScaler().fit_transform(X)
+    metrics = {'rows': len(X)}
+    for name, estimator in default_candidates().items():
+        _, seconds = timed(estimator.fit, X, y)
+        metrics[f'fit_{name}_s'] = round(seconds, 4)
+    return metrics
+
+def _scorer(work_dir):
+    from inference import VendorScorer
+
+    scorer_dir = os.path.join(work_dir, 'scorer')
+    return VendorScorer(
+        model_path=os.path.join(scorer_dir, 'vendor_scoring_model.pkl'),
+        scaler_path=os.path.join(scorer_dir, 'feature_scaler.pkl'),
+        artifact_path=os.path.join(scorer_dir, 'vendor_scoring_model.bin'),
+        metadata_path=os.path.join(scorer_dir, 'model_metadata.json')
+    )
+
+def _scorer_inputs(work_dir, n):
+    from train_model import engineer_features
+    from training_data import read_training_csv
+
+    X, _ = engineer_features(read_training_csv(os.path.join(work_dir, 'train.csv')))
+    return X.iloc[np.arange(n) % len(X)]
+
+def case_prediction(params, work_dir):
+    scorer = _scorer(work_dir)
+    n_calls = params['latency_calls']
+    inputs = _scorer_inputs(work_dir, max(n_calls, params['batch']))
+    rows = inputs.to_dict('records')
+
+    for row in rows[:20]:
+        scorer.score_vendor(row)
+    single = []
+    for row in rows[:n_calls]:
+        _, seconds = timed(scorer.score_vendor, row)
+        single.append(seconds)
+
+    batch = scorer.scaler.transform(inputs.iloc[:params['batch']].to_numpy())
+    batch_times = [timed(scorer.predict, batch)[1] for _ in range(max(5, n_calls // 50))]
+    batch_rows = rows[:params['batch']]
+    many_times = [timed(scorer.score_many, batch_rows)[1] for _ in range(max(5, n_calls // 50))]
+
+    metrics = {'batch_size': params['batch']}
+    metrics.update(latency_stats('score_vendor', single))
+    metrics.update(latency_stats('batch', batch_times))
+    metrics['batch_rows_per_s'] = round(params['batch'] / float(np.median(batch_times)))
+    metrics['score_many_rows_per_s'] = round(params['batch'] / float(np.median(many_times)))
+    return metrics
+
+def case_model_load(params, work_dir):
+    import joblib
+
+    from model_artifact import load_artifact
+
+    scorer_dir = os.path.join(work_dir, 'scorer')
+    metadata_path = os.path.join(scorer_dir, 'model_metadata.json')
+    _, pickle_seconds = timed(joblib.load, os.path.join(scorer_dir, 'vendor_scoring_model.pkl'))
+    _, artifact_seconds = timed(load_artifact, os.path.join(scorer_dir, 'vendor_scoring_model.bin'), metadata_path=metadata_path)
+    _, scorer_seconds = timed(_scorer, work_dir)
+    return {
+        'joblib_load_ms': round(pickle_seconds * 1000, 3),
+        'artifact_load_ms': round(artifact_seconds * 1000, 3),
+        'vendor_scorer_init_ms': round(scorer_seconds * 1000, 3),
+    }
+
+def _server_rss_mib(pid):
+    """Peak RSS of the gunicorn master plus all of its workers"""
+    total = peak_rss_mib(pid)
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+            if parent == pid:
+                total += peak_rss_mib(entry)
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+def _load(port, path, bodies, clients, seconds):
+    """Closed-loop load: `clients` keep-alive connections posting round-robin bodies"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        i = offset
+        while time.perf_counter() < deadline:
+            body = bodies[i % len(bodies)]
+            i += clients
+            start = time.perf_counter()
+            try:
+                connection.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            if ok:
+                local.append(time.perf_counter() - start)
+            else:
+                with lock:
+                    errors[0] += 1
+        connection.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.perf_counter() - start
+
+def case_http(params, work_dir):
+    import socket
+
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    api_dir = os.path.join(work_dir, 'api')
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        MODEL_PATH=os.path.join(api_dir, 'vendor_score_model.pkl'),
+        MODEL_RELOAD_INTERVAL='0',
+        PREDICTION_CACHE_SIZE='0',
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'inference_api:create_app()'],
+        cwd=common.ML_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+                connection.request('GET', '/health')
+                if json.loads(connection.getresponse().read()).get('model_loaded'):
+                    break
+            except (OSError, ValueError, http.client.HTTPException):
+                pass
+            if time.time() > deadline or server.poll() is not None:
+                raise RuntimeError('inference API did not become healthy')
+            time.sleep(0.2)
+
+        vendors = make_vendor_payloads(2000, seed=3)
+        single_bodies = [json.dumps({'vendorData': vendor['data']}) for vendor in vendors]
+        batch_bodies = [
+            json.dumps({'vendors': vendors[i:i + HTTP_BATCH_SIZE]})
+            for i in range(0, len(vendors), HTTP_BATCH_SIZE)
+        ]
+
+        seconds = params['http_seconds']
+        clients = params['http_clients']
+        _load(port, '/predict', single_bodies, clients, 1)
+        latencies, errors, elapsed = _load(port, '/predict', single_bodies, clients, seconds)
+        metrics = {'clients': clients, 'predict_requests_per_s': round(len(latencies) / elapsed, 1), 'predict_errors': errors}
+        metrics.update(latency_stats('predict', latencies))
+
+        latencies, errors, elapsed = _load(port, '/batch-predict', batch_bodies, clients, seconds)
+        metrics['batch_vendors_per_s'] = round(len(latencies) * HTTP_BATCH_SIZE / elapsed, 1)
+        metrics['batch_errors'] = errors
+        metrics.update(latency_stats('batch_predict', latencies))
+        metrics['server_peak_rss_mib'] = round(_server_rss_mib(server.pid), 1)
+        return metrics
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def run_case_in_child(case, scale, work_dir):
+    output = subprocess.run(
+        [sys.executable, __file__, '_case', case, '--scale', scale, '--work-dir', work_dir],
+        capture_output=True, text=True
+    )
+    if output.returncode != 0:
+        return {'error': output.stderr.strip().splitlines()[-1] if output.stderr.strip() else 'failed'}
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=common.ML_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    import pandas
+    import sklearn
+
+    results = {}
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory(prefix=f'ml-bench-{scale}-') as work_dir:
+            print(f'[{scale}] building fixtures...', flush=True)
+            build_fixtures(scale, work_dir)
+            results[scale] = {}
+            for case in args.cases:
+                print(f'[{scale}] {case}...', flush=True)
+                results[scale][case] = run_case_in_child(case, scale, work_dir)
+                print(f'  {json.dumps(results[scale][case])}', flush=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pandas.__version__,
+            'sklearn': sklearn.__version__,
+            'cpu_count': os.cpu_count(),
+            'scales': {scale: SCALES[scale] for scale in args.scales},
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'✓ Results written to {args.output}')
+
+def higher_is_better(metric):
+    return metric.endswith('_per_s')
+
+def is_measurement(metric):
+    return metric.endswith(('_per_s', '_ms', '_s', '_mib'))
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.current) as f:
+        current = json.load(f)['results']
+
+    regressions = []
+    print(f'{"scale/case/metric":<58} {"baseline":>12} {"current":>12} {"change":>8}')
+    for scale in sorted(set(baseline) & set(current)):
+        for case in sorted(set(baseline[scale]) & set(current[scale])):
+            before, after = baseline[scale][case], current[scale][case]
+            for metric in sorted(set(before) & set(after)):
+                if not is_measurement(metric) or not before[metric]:
+                    continue
+                change = (after[metric] - before[metric]) / before[metric]
+                worse = -change if higher_is_better(metric) else change
+                flag = ''
+                if worse > args.threshold:
+                    flag = '  ✗ regression'
+                    regressions.append(f'{scale}/{case}/{metric}')
+                name = f'{scale}/{case}/{metric}'
+                print(f'{name:<58} {before[metric]:>12.4g} {after[metric]:>12.4g} {change:>+8.1%}{flag}')
+
+    if regressions:
+        print(f'\n✗ {len(regressions)} metrics regressed by more than {args.threshold:.0%}')
+        sys.exit(1)
+    print(f'\n✓ No regressions beyond {args.threshold:.0%}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the suite and write JSON results')
+    run_parser.add_argument('--scales', nargs='+', choices=SCALES, default=['small'])
+    run_parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    run_parser.add_argument('--output', default='benchmark_results.json')
+
+    compare_parser = commands.add_parser('compare', help='flag regressions between two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10)
+
+    case_parser = commands.add_parser('_case')
+    case_parser.add_argument('case', choices=CASES)
+    case_parser.add_argument('--scale', choices=SCALES, required=True)
+    case_parser.add_argument('--work-dir', required=True)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'compare':
+        compare(args)
+    else:
+        metrics = globals()[f'case_{args.case}'](SCALES[args.scale], args.work_dir)
+        metrics['peak_rss_mib'] = round(peak_rss_mib(), 1)
+        print(json.dumps(metrics))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""
+Offline bulk scoring with VendorScorer
+Scores a newline-delimited JSON file of vendor features through a
+multi-process pipeline: the main process reads, extract workers parse
+records into feature matrices, predict workers each load the model once,
+and a writer process serializes results in input order
+
+Usage:
+    python bulk_score.py vendors.ndjson scores.ndjson
+    python bulk_score.py vendors.ndjson - --predict-workers 4 --chunk-rows 20000 --model-dir models
+
+Each input line is a JSON object with the feature names VendorScorer
+uses (missing ones take their defaults) and an optional "id". Each
+output line is {"id", "score", "recommendation"} plus "components" for a
+multi-output model, or {"id", "line", "error"} for a line that could not
+be scored. Stages are connected by queues of at most --queue-chunks
+chunks, so memory stays bounded and a slow stage holds back the ones
+before it.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+import numpy as np
+
+from inference import FEATURE_DEFAULTS, VendorScorer, feature_matrix, recommendation
+
+# Seconds between liveness checks while a stage waits on a queue
+POLL_SECONDS = 1.0
+
+class PipelineError(Exception):
+    """Raised when a pipeline process exits with an error"""
+
+def _parse_chunk(first_line, lines):
+    """Records, their line numbers and (line, id, error) for lines that cannot be scored"""
+    records = []
+    line_numbers = []
+    errors = []
+    for line_number, line in enumerate(lines, start=first_line):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            errors.append((line_number, None, f'Invalid JSON: {e}'))
+            continue
+        if not isinstance(record, dict):
+            errors.append((line_number, None, 'Expected a JSON object'))
+            continue
+        records.append(record)
+        line_numbers.append(line_number)
+    return records, line_numbers, errors
+
+def extract_chunk(first_line, lines):
+    """Parse a chunk of input lines into ids, line numbers, a feature matrix and errors"""
+    records, line_numbers, errors = _parse_chunk(first_line, lines)
+    try:
+        matrix = feature_matrix(records)
+        keep = range(len(records))
+    except (TypeError, ValueError):
+        # Some record has a non-numeric feature; find it row by row
+        rows = []
+        keep = []
+        for i, record in enumerate(records):
+            try:
+                rows.append(feature_matrix([record])[0])
+                keep.append(i)
+            except (TypeError, ValueError) as e:
+                errors.append((line_numbers[i], record.get('id'), f'Invalid features: {e}'))
+        matrix = np.array(rows, dtype=np.float64).reshape(len(rows), len(FEATURE_DEFAULTS))
+    ids = [records[i].get('id') for i in keep]
+    line_numbers = [line_numbers[i] for i in keep]
+    return ids, line_numbers, matrix, errors
+
+def result_lines(ids, line_numbers, predictions, errors, outputs):
+    """NDJSON output for one chunk, ordered by input line"""
+    entries = []
+    for vendor_id, line_number, prediction in zip(ids, line_numbers, predictions):
+        if outputs is None:
+            result = {'id': vendor_id, 'score': float(prediction)}
+        else:
+            components = dict(zip(outputs, prediction.tolist()))
+            result = {'id': vendor_id, 'score': components.pop('total')}
+        result['recommendation'] = recommendation(result['score'])
+        if outputs is not None:
+            result['components'] = components
+        entries.append((line_number, result))
+    for line_number, vendor_id, error in errors:
+        entries.append((line_number, {'id': vendor_id, 'line': line_number, 'error': error}))
+    entries.sort(key=lambda entry: entry[0])
+    return ''.join(json.dumps(result) + '\n' for _, result in entries)
+
+def _extract_worker(in_queue, out_queue):
+    while True:
+        item = in_queue.get()
+        if item is None:
+            return
+        seq, first_line, lines = item
+        out_queue.put((seq, *extract_chunk(first_line, lines)))
+
+def _predict_worker(model_paths, in_queue, out_queue):
+    scorer = VendorScorer(**model_paths)
+    while True:
+        item = in_queue.get()
+        if item is None:
+            return
+        seq, ids, line_numbers, matrix, errors = item
+        predictions = scorer.predict_raw(matrix) if len(matrix) else []
+        out_queue.put((seq, ids, line_numbers, predictions, errors, scorer.outputs))
+
+def _write_worker(output_path, in_queue, stats_queue):
+    """Write chunks in input order as they arrive, then report (scored, failed)"""
+    pending = {}
+    next_seq = 0
+    scored = failed = 0
+    out = sys.stdout if output_path == '-' else open(f'{output_path}.tmp', 'w')
+    try:
+        while True:
+            item = in_queue.get()
+            if item is None:
+                break
+            pending[item[0]] = item[1:]
+            while next_seq in pending:
+                ids, line_numbers, predictions, errors, outputs = pending.pop(next_seq)
+                out.write(result_lines(ids, line_numbers, predictions, errors, outputs))
+                scored += len(ids)
+                failed += len(errors)
+                next_seq += 1
+        out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if output_path != '-':
+        os.replace(f'{output_path}.tmp', output_path)
+    stats_queue.put((scored, failed))
+
+def _check(processes):
+    for process in processes:
+        if process.exitcode not in (None, 0):
+            raise PipelineError(f'{process.name} exited with code {process.exitcode}')
+
+def _put(q, item, processes):
+    """Put with backpressure, failing instead of blocking forever if a stage died"""
+    while True:
+        try:
+            q.put(item, timeout=POLL_SECONDS)
+            return
+        except queue.Full:
+            _check(processes)
+
+def _join(stage, processes):
+    for process in stage:
+        while process.is_alive():
+            process.join(POLL_SECONDS)
+            _check(processes)
+    _check(processes)
+
+def score_file(input_path, output_path, model_paths, chunk_rows=10_000, extract_workers=1,
+               predict_workers=1, queue_chunks=4):
+    """
+    Score `input_path` into `output_path` ('-' for stdin / stdout)
+
+    `model_paths` are the VendorScorer keyword arguments. Returns (lines
+    read, vendors scored, lines failed). A file output is written under a
+    temporary name and renamed once complete.
+    """
+    raw_queue = multiprocessing.Queue(queue_chunks)
+    feature_queue = multiprocessing.Queue(queue_chunks)
+    result_queue = multiprocessing.Queue(queue_chunks)
+    stats_queue = multiprocessing.Queue()
+
+    extractors = [
+        multiprocessing.Process(target=_extract_worker, args=(raw_queue, feature_queue), name=f'extract-{i}')
+        for i in range(extract_workers)
+    ]
+    predictors = [
+        multiprocessing.Process(
+            target=_predict_worker, args=(model_paths, feature_queue, result_queue), name=f'predict-{i}'
+        )
+        for i in range(predict_workers)
+    ]
+    writer = multiprocessing.Process(target=_write_worker, args=(output_path, result_queue, stats_queue), name='write')
+    processes = extractors + predictors + [writer]
+    for process in processes:
+        process.start()
+
+    n_lines = 0
+    try:
+        source = sys.stdin.buffer if input_path == '-' else open(input_path, 'rb')
+        try:
+            seq = 0
+            lines = []
+            for line in source:
+                lines.append(line)
+                if len(lines) == chunk_rows:
+                    _put(raw_queue, (seq, n_lines + 1, lines), processes)
+                    n_lines += len(lines)
+                    seq += 1
+                    lines = []
+            if lines:
+                _put(raw_queue, (seq, n_lines + 1, lines), processes)
+                n_lines += len(lines)
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+
+        # Each stage is told to stop once the one before it has drained
+        for _ in extractors:
+            _put(raw_queue, None, processes)
+        _join(extractors, processes)
+        for _ in predictors:
+            _put(feature_queue, None, processes)
+        _join(predictors, processes)
+        _put(result_queue, None, processes)
+        _join([writer], processes)
+    except BaseException:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        raise
+
+    scored, failed = stats_queue.get()
+    return n_lines, scored, failed
+
+def main():
+    parser = argparse.ArgumentParser(description='Score an NDJSON file of vendor features with VendorScorer')
+    parser.add_argument('input', help="NDJSON vendor features, or '-' for stdin")
+    parser.add_argument('output', help="NDJSON results, or '-' for stdout")
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--chunk-rows', type=int, default=10_000)
+    parser.add_argument('--extract-workers', type=int, default=1)
+    parser.add_argument('--predict-workers', type=int, default=max(1, (os.cpu_count() or 1) - 2))
+    parser.add_argument('--queue-chunks', type=int, default=4, help='chunks buffered between stages')
+    args = parser.parse_args()
+
+    model_paths = {
+        'model_path': os.path.join(args.model_dir, 'vendor_scoring_model.pkl'),
+        'scaler_path': os.path.join(args.model_dir, 'feature_scaler.pkl'),
+        'artifact_path': os.path.join(args.model_dir, 'vendor_scoring_model.bin'),
+        'metadata_path': os.path.join(args.model_dir, 'model_metadata.json'),
+    }
+    start = time.perf_counter()
+    n_lines, scored, failed = score_file(
+        args.input, args.output, model_paths,
+        chunk_rows=max(1, args.chunk_rows),
+        extract_workers=max(1, args.extract_workers),
+        predict_workers=max(1, args.predict_workers),
+        queue_chunks=max(1, args.queue_chunks)
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"✓ Scored {scored} vendors ({failed} failed lines) from {n_lines} lines in {elapsed:.1f}s "
+        f"({scored / elapsed:.0f} vendors/s) -> {args.output}",
+        file=sys.stderr
+    )
+
+if __name__ == '__main__':
+    main()
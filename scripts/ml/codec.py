@@ -0,0 +1,51 @@
+"""
+JSON codec for the inference API
+Decodes request bodies and encodes responses with orjson when it is
+installed and with the standard library json module otherwise; set
+JSON_CODEC=json to force the standard library
+"""
+
+import json
+import os
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_CODEC = os.getenv('JSON_CODEC', 'auto').lower()
+if JSON_CODEC not in ('auto', 'orjson', 'json'):
+    raise ValueError(f"JSON_CODEC must be 'auto', 'orjson' or 'json', got {JSON_CODEC!r}")
+if JSON_CODEC == 'orjson' and orjson is None:
+    print("✗ JSON_CODEC=orjson but orjson is not installed; using the json module")
+
+BACKEND = 'orjson' if orjson is not None and JSON_CODEC != 'json' else 'json'
+
+JSON_CONTENT_TYPE = 'application/json'
+
+def _default(obj):
+    """NumPy values the encoder does not handle natively"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+if BACKEND == 'orjson':
+    def loads(data):
+        """Decode JSON bytes or str; raises ValueError on invalid input"""
+        return orjson.loads(data)
+
+    def dumps(obj):
+        """Compact UTF-8 JSON bytes; NumPy arrays and scalars are written directly"""
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+else:
+    def loads(data):
+        """Decode JSON bytes or str; raises ValueError on invalid input"""
+        return json.loads(data)
+
+    def dumps(obj):
+        """Compact UTF-8 JSON bytes; NumPy arrays and scalars are written directly"""
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode()
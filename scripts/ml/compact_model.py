@@ -0,0 +1,472 @@
+"""
+Compact, quantized tree ensembles
+Lays a compiled ensemble out breadth-first in narrow struct-of-arrays
+node arrays, with split thresholds stored as float32 or as per-feature
+uint8 / uint16 bin indices that inputs are mapped to once per request
+
+Usage:
+    python compact_model.py models/vendor_scoring_model.bin --mode uint16
+    python compact_model.py models/vendor_score_model.bin --mode uint8 --output models/small.compact.bin
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from tree_engine import MAX_CHUNK_PAIRS, _raw_thresholds, check_finite
+
+COMPACT_FORMAT_VERSION = 1
+COMPACT_MODES = ('float32', 'uint16', 'uint8')
+# Node arrays that make up a compact ensemble, in on-disk order
+COMPACT_ARRAY_FIELDS = ('feature', 'threshold', 'left', 'value', 'roots', 'base_score', 'edges', 'edge_offsets')
+
+class CompactEnsemble:
+    """
+    Breadth-first, narrow-typed node arrays for a tree ensemble
+
+    All trees share one set of node arrays, each tree a contiguous block
+    in breadth-first order:
+        feature      uint8/16 split feature of each node (0 for leaves)
+        threshold    float32 split value, or the uint8/16 index of the
+                     split value among its feature's `edges`
+        left         int32    left child; the right child is left + 1, since
+                              breadth-first order keeps siblings adjacent.
+                              Leaves point to themselves
+        value        float32  (n_nodes, n_outputs) leaf value, pre-multiplied
+                              by the tree weight
+        roots        int32    root node of each tree
+        edges        float64  sorted distinct split values of every feature,
+                              concatenated; empty in float32 mode
+        edge_offsets int64    (n_features + 1) start of each feature's edges
+        cover        float32  optional training cover of each node, for
+                              tree_explainer.TreeExplainer
+        missing_left bool     optional; whether NaN goes left at each node,
+                              as in CompiledEnsemble
+
+    In the bin modes a row is first mapped to bins, bin = the number of
+    the feature's edges below x, so x <= edges[k] exactly when bin <= k and
+    every split compares small integers. Leaves hold the largest threshold
+    of their dtype, so rows at a leaf always go "left" back to it. NaN
+    maps to that largest value too, a bin no real input reaches.
+
+    Predictions sum the float32 leaf values in float64, as
+    (base_score + sum of leaf values) / divisor, like CompiledEnsemble.
+    """
+
+    def __init__(self, mode, feature, threshold, left, value, roots, base_score, edges, edge_offsets,
+                 max_depth, n_features, divisor, model_type, feature_importances=None, float32_inputs=True,
+                 cover=None, missing_left=None):
+        if mode not in COMPACT_MODES:
+            raise ValueError(f'Unknown compact mode {mode!r}; expected one of {COMPACT_MODES}')
+        self.mode = mode
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.value = value
+        self.roots = roots
+        self.base_score = base_score
+        self.edges = edges
+        self.edge_offsets = edge_offsets
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.divisor = float(divisor)
+        self.model_type = model_type
+        self.feature_importances = feature_importances
+        self.float32_inputs = float32_inputs
+        self.cover = cover
+        self.missing_left = missing_left
+        self._missing_right = None if missing_left is None else ~np.asarray(missing_left, dtype=bool)
+        # Views of each feature's edges, so binning does not slice per request
+        bounds = edge_offsets.tolist()
+        self._feature_edges = [edges[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+        # Set by model_artifact.load_artifact
+        self.model_version = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_outputs(self):
+        return self.value.shape[1]
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.to_state()[1].values())
+
+    def prepare(self, X):
+        """
+        Map input rows to what the splits compare, once per request
+
+        float32 rows in float32 mode, per-feature bin indices otherwise.
+        Inputs are rounded to float32 first unless the scaler has been
+        folded into the edges, and rejected like CompiledEnsemble rejects
+        them.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f'Expected input of shape (n, {self.n_features}), got {X.shape}')
+        if self.float32_inputs or self.mode == 'float32':
+            X = X.astype(np.float32)
+        check_finite(X, allow_nan=self.missing_left is not None)
+        if self.mode == 'float32':
+            return X
+        binned = [np.searchsorted(edges, column, side='left') for edges, column in zip(self._feature_edges, X.T)]
+        binned = np.array(binned, dtype=self.threshold.dtype).T
+        if self.missing_left is not None:
+            binned[np.isnan(X)] = np.iinfo(binned.dtype).max
+        return binned
+
+    def _is_missing(self, Xq):
+        """Which prepared inputs stand for NaN"""
+        if self.mode == 'float32':
+            return np.isnan(Xq)
+        return Xq == np.iinfo(Xq.dtype).max
+
+    def _has_missing(self, Xq):
+        return self.missing_left is not None and bool(self._is_missing(Xq).any())
+
+    def _chunks(self, n_rows):
+        step = max(1, MAX_CHUNK_PAIRS // self.n_trees)
+        for start in range(0, n_rows, step):
+            yield start, min(n_rows, start + step)
+
+    def _apply_rows(self, Xq, missing=False):
+        n_rows = Xq.shape[0]
+        flat_X = Xq.ravel()
+        if n_rows == 1:
+            node = self.roots
+            for _ in range(self.max_depth):
+                x = flat_X.take(self.feature.take(node))
+                go_right = x > self.threshold.take(node)
+                if missing:
+                    go_right = np.where(self._is_missing(x), self._missing_right.take(node), go_right)
+                node = self.left.take(node) + go_right
+            return node.reshape(self.n_trees, 1)
+
+        row_offset = np.tile(np.arange(n_rows, dtype=np.intp) * self.n_features, self.n_trees)
+        node = np.repeat(self.roots, n_rows)
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offset + self.feature.take(node))
+            go_right = x > self.threshold.take(node)
+            if missing:
+                go_right = np.where(self._is_missing(x), self._missing_right.take(node), go_right)
+            node = self.left.take(node) + go_right
+        return node.reshape(self.n_trees, n_rows)
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_trees, n_rows)"""
+        Xq = self.prepare(X)
+        missing = self._has_missing(Xq)
+        leaves = np.empty((self.n_trees, Xq.shape[0]), dtype=np.intp)
+        for start, stop in self._chunks(Xq.shape[0]):
+            leaves[:, start:stop] = self._apply_rows(Xq[start:stop], missing)
+        return leaves
+
+    def predict(self, X):
+        """Predict a batch; returns shape (n_rows,) for single-output models"""
+        Xq = self.prepare(X)
+        missing = self._has_missing(Xq)
+        prediction = np.empty((Xq.shape[0], self.n_outputs))
+        for start, stop in self._chunks(Xq.shape[0]):
+            leaves = self._apply_rows(Xq[start:stop], missing)
+            total = np.concatenate([
+                np.broadcast_to(self.base_score, (1, stop - start, self.n_outputs)),
+                self.value[leaves],
+            ]).sum(axis=0, dtype=np.float64)
+            prediction[start:stop] = total / self.divisor
+        if self.n_outputs == 1:
+            return prediction[:, 0]
+        return prediction
+
+    def fold_scaler(self, mean, scale):
+        """
+        Copy that takes unscaled rows, by moving the bin edges to raw feature space
+
+        Each edge becomes the largest raw value whose scaled, float32-rounded
+        value is still at most the edge, as CompiledEnsemble.fold_scaler()
+        does for thresholds, so raw rows land in exactly the same bins.
+        float32 mode keeps thresholds per node and cannot be folded.
+        """
+        if self.mode == 'float32':
+            raise ValueError('float32 thresholds cannot take the scaler; scale inputs first')
+        if not self.float32_inputs:
+            raise ValueError('Ensemble already takes raw inputs')
+        mean = np.broadcast_to(np.asarray(mean, dtype=np.float64), (self.n_features,))
+        scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), (self.n_features,))
+        if np.any(scale <= 0):
+            raise ValueError('Scale must be positive to fold it into split thresholds')
+        owner = np.repeat(np.arange(self.n_features), np.diff(self.edge_offsets))
+        params, arrays = self.to_state()
+        arrays['edges'] = _raw_thresholds(self.edges, mean[owner], scale[owner])
+        folded = CompactEnsemble.from_state(params, arrays)
+        folded.float32_inputs = False
+        folded.model_version = self.model_version
+        return folded
+
+    def to_state(self):
+        """Split the ensemble into JSON-serialisable params and a dict of arrays"""
+        params = {
+            'engine': 'compact',
+            'compact_format_version': COMPACT_FORMAT_VERSION,
+            'mode': self.mode,
+            'max_depth': self.max_depth,
+            'n_features': self.n_features,
+            'divisor': self.divisor,
+            'model_type': self.model_type,
+            'float32_inputs': self.float32_inputs,
+        }
+        arrays = {name: getattr(self, name) for name in COMPACT_ARRAY_FIELDS}
+        if self.feature_importances is not None:
+            arrays['feature_importances'] = self.feature_importances
+        if self.cover is not None:
+            arrays['cover'] = self.cover
+        if self.missing_left is not None:
+            arrays['missing_left'] = self.missing_left
+        return params, arrays
+
+    @classmethod
+    def from_state(cls, params, arrays):
+        """Rebuild an ensemble from the output of to_state"""
+        version = params['compact_format_version']
+        if version != COMPACT_FORMAT_VERSION:
+            raise ValueError(f'Unsupported compact format version {version}')
+        return cls(
+            mode=params['mode'],
+            max_depth=params['max_depth'],
+            n_features=params['n_features'],
+            divisor=params['divisor'],
+            model_type=params['model_type'],
+            float32_inputs=params['float32_inputs'],
+            feature_importances=arrays.get('feature_importances'),
+            cover=arrays.get('cover'),
+            missing_left=arrays.get('missing_left'),
+            **{name: arrays[name] for name in COMPACT_ARRAY_FIELDS},
+        )
+
+def _breadth_first_order(children, roots):
+    """Old node ids in breadth-first order, each tree a contiguous block"""
+    node_ids = np.arange(len(children))
+    nodes = [roots]
+    trees = [np.arange(len(roots))]
+    levels = [np.zeros(len(roots), dtype=np.intp)]
+    frontier, frontier_trees = roots, trees[0]
+    depth = 0
+    while len(frontier):
+        internal = children[frontier, 0] != node_ids[frontier]
+        parents = frontier[internal]
+        # Children interleaved left, right after their parent's position
+        frontier = children[parents].ravel()
+        frontier_trees = np.repeat(frontier_trees[internal], 2)
+        depth += 1
+        nodes.append(frontier)
+        trees.append(frontier_trees)
+        levels.append(np.full(len(frontier), depth, dtype=np.intp))
+    nodes = np.concatenate(nodes)
+    # Stable sort by tree, then depth, keeping the order within each level
+    return nodes[np.lexsort((np.arange(len(nodes)), np.concatenate(levels), np.concatenate(trees)))]
+
+def _float32_below(values):
+    """Largest float32 <= each float64 value, so float32 inputs split exactly as before"""
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+def _bin_edges(feature, threshold, is_split, n_features, max_edges):
+    """
+    Per-feature edges and the edge index of every split
+
+    A feature with more distinct thresholds than `max_edges` keeps
+    `max_edges` of them, evenly spaced through the sorted distinct values,
+    and its splits move to the nearest kept edge; that is the only lossy
+    step of compaction.
+    """
+    edges = []
+    index = np.zeros(len(feature), dtype=np.int64)
+    for f in range(n_features):
+        nodes = np.flatnonzero(is_split & (feature == f))
+        values = np.unique(threshold[nodes])
+        if len(values) > max_edges:
+            values = values[np.unique(np.linspace(0, len(values) - 1, max_edges).round().astype(np.int64))]
+            position = np.clip(np.searchsorted(values, threshold[nodes]), 1, len(values) - 1)
+            # An infinite threshold (sklearn's split of missing from present
+            # values) is the largest value, always kept; inf - inf is NaN
+            # there and leaves the split on that edge
+            with np.errstate(invalid='ignore'):
+                nearer_left = threshold[nodes] - values[position - 1] <= values[position] - threshold[nodes]
+            index[nodes] = np.where(nearer_left, position - 1, position)
+        else:
+            index[nodes] = np.searchsorted(values, threshold[nodes])
+        edges.append(values)
+    offsets = np.concatenate([[0], np.cumsum([len(values) for values in edges])]).astype(np.int64)
+    return np.concatenate(edges).astype(np.float64), offsets, index
+
+def compact(ensemble, mode='uint16'):
+    """
+    CompactEnsemble with the same trees as a CompiledEnsemble
+
+    float32 mode rounds each threshold down to float32, which splits
+    float32-rounded inputs exactly as before. uint16 bins are exact unless
+    a feature has more than 65534 distinct thresholds, uint8 unless it
+    has more than 254 (the top bin is kept for NaN). Leaf values are
+    stored as float32 in every mode.
+    """
+    if mode not in COMPACT_MODES:
+        raise ValueError(f'Unknown compact mode {mode!r}; expected one of {COMPACT_MODES}')
+    order = _breadth_first_order(np.asarray(ensemble.children), np.asarray(ensemble.roots))
+    new_id = np.empty(len(order), dtype=np.int64)
+    new_id[order] = np.arange(len(order))
+
+    children = np.asarray(ensemble.children)[order]
+    is_split = children[:, 0] != order
+    left = np.where(is_split, new_id[children[:, 0]], np.arange(len(order))).astype(np.int32)
+    if np.any(new_id[children[is_split, 1]] != left[is_split] + 1):
+        raise ValueError('Breadth-first layout did not keep siblings adjacent')
+
+    feature = np.where(is_split, np.asarray(ensemble.feature)[order], 0)
+    threshold = np.asarray(ensemble.threshold, dtype=np.float64)[order]
+    if mode == 'float32':
+        quantized = np.full(len(order), np.inf, dtype=np.float32)
+        quantized[is_split] = _float32_below(threshold[is_split])
+        edges = np.zeros(0)
+        edge_offsets = np.zeros(ensemble.n_features + 1, dtype=np.int64)
+    else:
+        dtype = np.dtype(mode)
+        max_edges = int(np.iinfo(dtype).max) - 1
+        edges, edge_offsets, index = _bin_edges(feature, threshold, is_split, ensemble.n_features, max_edges)
+        quantized = np.full(len(order), np.iinfo(dtype).max, dtype=dtype)
+        quantized[is_split] = index[is_split]
+
+    return CompactEnsemble(
+        mode=mode,
+        feature=feature.astype(np.uint8 if ensemble.n_features <= 256 else np.uint16),
+        threshold=quantized,
+        left=left,
+        value=np.asarray(ensemble.value, dtype=np.float32)[order],
+        roots=new_id[np.asarray(ensemble.roots)].astype(np.int32),
+        base_score=np.asarray(ensemble.base_score, dtype=np.float64),
+        edges=edges,
+        edge_offsets=edge_offsets,
+        max_depth=ensemble.max_depth,
+        n_features=ensemble.n_features,
+        divisor=ensemble.divisor,
+        model_type=ensemble.model_type,
+        feature_importances=ensemble.feature_importances,
+        float32_inputs=ensemble.float32_inputs,
+        cover=None if ensemble.cover is None else np.asarray(ensemble.cover, dtype=np.float32)[order],
+        missing_left=None if ensemble.missing_left is None else np.asarray(ensemble.missing_left, dtype=bool)[order],
+    )
+
+def probe_rows(ensemble, n_rows=10_000, seed=0):
+    """
+    Inputs that exercise the splits: each value is a split threshold of
+    its feature nudged slightly to either side, or drawn across the
+    feature's threshold range
+    """
+    rng = np.random.default_rng(seed)
+    feature = np.asarray(ensemble.feature)
+    threshold = np.asarray(ensemble.threshold)
+    is_split = np.asarray(ensemble.children)[:, 0] != np.arange(len(feature))
+    X = np.zeros((n_rows, ensemble.n_features))
+    for f in range(ensemble.n_features):
+        values = threshold[is_split & (feature == f)]
+        if len(values) == 0:
+            continue
+        spread = max(float(values.max() - values.min()), 1e-6)
+        picks = rng.choice(values, n_rows) + rng.normal(0, spread * 1e-3, n_rows)
+        uniform = rng.uniform(values.min() - 0.1 * spread, values.max() + 0.1 * spread, n_rows)
+        X[:, f] = np.where(rng.random(n_rows) < 0.5, picks, uniform)
+    return X
+
+def _best_ms(fn, X, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 4)
+
+def compaction_report(original, compacted, X, batch_sizes=(1, 1000)):
+    """Accuracy drift on `X` and node-array size and predict time of both ensembles"""
+    expected = np.asarray(original.predict(X))
+    actual = np.asarray(compacted.predict(X))
+    drift = np.abs(actual - expected)
+    # Scores are served rounded to 2 decimals
+    changed = np.round(actual, 2) != np.round(expected, 2)
+    if drift.ndim == 2:
+        drift = drift.max(axis=1)
+        changed = changed.any(axis=1)
+    timing = {}
+    for n in batch_sizes:
+        rows = X[:n]
+        repeat = 200 if n == 1 else 5
+        timing[str(n)] = {
+            'original_ms': _best_ms(original.predict, rows, repeat),
+            'compact_ms': _best_ms(compacted.predict, rows, repeat),
+        }
+    original_bytes = sum(array.nbytes for array in original.to_state()[1].values())
+    return {
+        'mode': compacted.mode,
+        'nodes': int(len(compacted.feature)),
+        'original_bytes': int(original_bytes),
+        'compact_bytes': int(compacted.nbytes),
+        'rows': int(len(X)),
+        'max_abs_drift': float(drift.max()) if len(drift) else 0.0,
+        'mean_abs_drift': float(drift.mean()) if len(drift) else 0.0,
+        'rows_changed': int(np.count_nonzero(changed)),
+        'predict_ms': timing,
+    }
+
+def compact_artifact(artifact_path, metadata_path, mode='uint16', output_path=None):
+    """
+    Compact a saved artifact next to it and record it in the model metadata
+
+    Writes `output_path` (default <artifact>.compact.bin), then adds its
+    checksum under 'compact_artifact' and the compaction report under
+    'compaction' in `metadata_path`. Returns the report.
+    """
+    from model_artifact import load_artifact, save_artifact
+
+    original = load_artifact(artifact_path, metadata_path=metadata_path)
+    compacted = compact(original, mode)
+    report = compaction_report(original, compacted, probe_rows(original))
+
+    output_path = output_path or os.path.splitext(artifact_path)[0] + '.compact.bin'
+    artifact = save_artifact(compacted, output_path, original.model_version)
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    metadata['compact_artifact'] = artifact
+    metadata['compaction'] = report
+    tmp_path = f'{metadata_path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, metadata_path)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a compact, quantized copy of a model artifact')
+    parser.add_argument('artifact', help='artifact written by save_model()')
+    parser.add_argument('--mode', choices=COMPACT_MODES, default='uint16')
+    parser.add_argument('--metadata', help='model_metadata.json; defaults to the one next to the artifact')
+    parser.add_argument('--output', help='defaults to <artifact>.compact.bin')
+    args = parser.parse_args()
+
+    metadata_path = args.metadata or os.path.join(os.path.dirname(args.artifact), 'model_metadata.json')
+    report = compact_artifact(args.artifact, metadata_path, args.mode, args.output)
+    print(
+        f"✓ Compacted {report['nodes']} nodes to {report['mode']}: "
+        f"{report['original_bytes'] / 1e6:.1f} MB -> {report['compact_bytes'] / 1e6:.1f} MB"
+    )
+    print(
+        f"  Drift on {report['rows']} probe rows: max {report['max_abs_drift']:.2e}, "
+        f"mean {report['mean_abs_drift']:.2e}, {report['rows_changed']} served scores changed"
+    )
+    for n, timing in report['predict_ms'].items():
+        print(f"  {n} rows: {timing['original_ms']:.3f} ms -> {timing['compact_ms']:.3f} ms")
+
+if __name__ == '__main__':
+    main()
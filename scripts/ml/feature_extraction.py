@@ -0,0 +1,264 @@
+"""
+Feature extraction for the inference API
+Turns the nested vendor JSON sent by the Next.js app into model feature rows
+"""
+
+import numpy as np
+from typing import Dict, List, Any
+
+FEATURE_NAMES = [
+    'avg_delivery_rate',
+    'avg_quality_score',
+    'avg_cost_efficiency',
+    'avg_compliance_score',
+    'avg_rating',
+    'positive_sentiment_ratio',
+    'certification_count',
+    'years_in_business',
+    'team_size',
+    'risk_level_numeric',
+    'active_risk_count',
+]
+
+INTERNAL_FIELDS = ('deliverySuccessRate', 'qualityScore', 'costEfficiency', 'complianceScore')
+RISK_LEVELS = {'LOW': 1, 'MEDIUM': 2, 'HIGH': 3, 'CRITICAL': 4}
+
+def extract_vendor_features(vendor_data: Dict[str, Any]) -> np.ndarray:
+    """
+    Extract features for a single vendor, one dict at a time
+
+    This is the reference implementation: extract_feature_matrix must match
+    it bit for bit, and falls back to it for vendors whose records are not
+    plain numbers.
+
+    Expected vendor_data structure:
+    {
+        "internalRecords": [{"deliverySuccessRate": 95, "qualityScore": 90, ...}],
+        "externalReviews": [{"rating": 4.5, "sentiment": "positive"}],
+        "features": [{"certifications": [...], "yearsInBusiness": 10, "teamSize": 50}],
+        "risks": [{"riskLevel": "LOW", "severity": 2}]
+    }
+    """
+
+    # Initialize default values
+    features = {
+        'avg_delivery_rate': 0.0,
+        'avg_quality_score': 0.0,
+        'avg_cost_efficiency': 0.0,
+        'avg_compliance_score': 0.0,
+        'avg_rating': 0.0,
+        'positive_sentiment_ratio': 0.0,
+        'certification_count': 0,
+        'years_in_business': 0,
+        'team_size': 0,
+        'risk_level_numeric': 0.0,
+        'active_risk_count': 0
+    }
+
+    # Process internal records
+    internal = vendor_data.get('internalRecords', [])
+    if internal:
+        features['avg_delivery_rate'] = np.mean([r.get('deliverySuccessRate', 0) for r in internal])
+        features['avg_quality_score'] = np.mean([r.get('qualityScore', 0) for r in internal])
+        features['avg_cost_efficiency'] = np.mean([r.get('costEfficiency', 0) for r in internal])
+        features['avg_compliance_score'] = np.mean([r.get('complianceScore', 0) for r in internal])
+
+    # Process external reviews
+    reviews = vendor_data.get('externalReviews', [])
+    if reviews:
+        features['avg_rating'] = np.mean([r.get('rating', 0) for r in reviews])
+        sentiments = [r.get('sentiment') for r in reviews if r.get('sentiment')]
+        if sentiments:
+            features['positive_sentiment_ratio'] = sum(1 for s in sentiments if s == 'positive') / len(sentiments)
+
+    # Process vendor features
+    vendor_features = vendor_data.get('features', [])
+    if vendor_features:
+        feat = vendor_features[0]  # Use first feature record
+        features['certification_count'] = len(feat.get('certifications', []))
+        features['years_in_business'] = feat.get('yearsInBusiness', 0) or 0
+        features['team_size'] = feat.get('teamSize', 0) or 0
+
+    # Process risks
+    risks = vendor_data.get('risks', [])
+    if risks:
+        risk_values = [RISK_LEVELS.get(r.get('riskLevel', 'LOW'), 1) for r in risks]
+        features['risk_level_numeric'] = np.mean(risk_values)
+        features['active_risk_count'] = len([r for r in risks if r.get('status') == 'ACTIVE'])
+
+    # Return as numpy array in the correct order
+    feature_array = np.array([features[name] for name in FEATURE_NAMES]).reshape(1, -1)
+
+    return feature_array
+
+def _as_numeric(values: List[Any]):
+    """Convert a flat value list to an array, or None if it holds anything but numbers"""
+    try:
+        array = np.array(values)
+    except (TypeError, ValueError):
+        # Ragged nested values, e.g. one record sending a list
+        return None
+    # A 2-D result means every value was itself a list of numbers
+    if array.ndim == 1 and array.dtype.kind in 'biuf':
+        return array
+    return None
+
+def _non_numeric_owners(values: List[Any], counts: np.ndarray) -> np.ndarray:
+    """Indices of the vendors that own a non-numeric value in a flat value list"""
+    bad = np.fromiter(
+        (not isinstance(v, (int, float, np.number)) for v in values),
+        dtype=bool, count=len(values)
+    )
+    owners = np.repeat(np.arange(len(counts)), counts)
+    return np.unique(owners[bad])
+
+def _group_means(values: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Per-vendor means of a flat value array, 0.0 for vendors without values
+
+    Vendors are bucketed by record count so each bucket is summed as one
+    (vendors, records) matrix along axis 1. That uses the same pairwise
+    summation as np.mean on a single vendor's list, so results are
+    bit-identical to extract_vendor_features.
+    """
+    means = np.zeros(len(counts))
+    offsets = np.cumsum(counts) - counts
+    for length in np.unique(counts[counts > 0]):
+        groups = np.flatnonzero(counts == length)
+        index = offsets[groups, None] + np.arange(length)
+        means[groups] = values[index].sum(axis=1) / length
+    return means
+
+def extract_feature_matrix(vendor_datas: List[Dict[str, Any]]):
+    """
+    Extract features for many vendors at once
+
+    The nested records of every vendor are flattened into flat value lists
+    in a single pass, then the means, sentiment ratio, risk level and
+    ACTIVE counts are computed with grouped array reductions.
+
+    Returns the (n_ok, 11) float64 feature matrix, the index of each row
+    in `vendor_datas`, and a dict mapping the index of every vendor that
+    failed extraction to its error message.
+    """
+    n = len(vendor_datas)
+    internal_values = [[] for _ in INTERNAL_FIELDS]
+    internal_counts = np.zeros(n, dtype=np.int64)
+    ratings = []
+    review_counts = np.zeros(n, dtype=np.int64)
+    sentiment_counts = np.zeros(n, dtype=np.int64)
+    positive_counts = np.zeros(n, dtype=np.int64)
+    risk_levels = []
+    risk_counts = np.zeros(n, dtype=np.int64)
+    active_risks = np.zeros(n, dtype=np.int64)
+    cert_counts = np.zeros(n, dtype=np.int64)
+    years = [0] * n
+    team_sizes = [0] * n
+    fallback = set()
+
+    for i, vendor_data in enumerate(vendor_datas):
+        try:
+            internal = vendor_data.get('internalRecords', [])
+            if internal:
+                vendor_internal = [[r.get(field, 0) for r in internal] for field in INTERNAL_FIELDS]
+
+            reviews = vendor_data.get('externalReviews', [])
+            if reviews:
+                vendor_ratings = [r.get('rating', 0) for r in reviews]
+                vendor_sentiments = [r.get('sentiment') for r in reviews if r.get('sentiment')]
+                vendor_positive = sum(1 for s in vendor_sentiments if s == 'positive')
+
+            vendor_features = vendor_data.get('features', [])
+            if vendor_features:
+                feat = vendor_features[0]
+                vendor_certs = len(feat.get('certifications', []))
+                vendor_years = feat.get('yearsInBusiness', 0) or 0
+                vendor_team = feat.get('teamSize', 0) or 0
+
+            risks = vendor_data.get('risks', [])
+            if risks:
+                vendor_levels = [RISK_LEVELS.get(r.get('riskLevel', 'LOW'), 1) for r in risks]
+                vendor_active = sum(1 for r in risks if r.get('status') == 'ACTIVE')
+        except Exception:
+            fallback.add(i)
+            continue
+
+        if internal:
+            for values, vendor_column in zip(internal_values, vendor_internal):
+                values.extend(vendor_column)
+            internal_counts[i] = len(internal)
+        if reviews:
+            ratings.extend(vendor_ratings)
+            review_counts[i] = len(reviews)
+            sentiment_counts[i] = len(vendor_sentiments)
+            positive_counts[i] = vendor_positive
+        if vendor_features:
+            cert_counts[i] = vendor_certs
+            years[i] = vendor_years
+            team_sizes[i] = vendor_team
+        if risks:
+            risk_levels.extend(vendor_levels)
+            risk_counts[i] = len(risks)
+            active_risks[i] = vendor_active
+
+    # Anything that is not a plain number (None, strings, ...) goes through
+    # the reference extractor so values and error messages stay identical
+    numeric = {}
+    flat_lists = [(f'internal_{k}', values, internal_counts) for k, values in enumerate(internal_values)]
+    flat_lists += [
+        ('ratings', ratings, review_counts),
+        ('years', years, np.ones(n, dtype=np.int64)),
+        ('team_sizes', team_sizes, np.ones(n, dtype=np.int64)),
+    ]
+    for name, values, counts in flat_lists:
+        array = _as_numeric(values) if values else np.zeros(0)
+        if array is None:
+            fallback.update(_non_numeric_owners(values, counts).tolist())
+        numeric[name] = array
+
+    if fallback and len(fallback) < n:
+        # Re-run the columnar path on the regular vendors only
+        regular = [i for i in range(n) if i not in fallback]
+        matrix, row_index, errors = extract_feature_matrix([vendor_datas[i] for i in regular])
+        row_index = [regular[j] for j in row_index]
+        errors = {regular[j]: message for j, message in errors.items()}
+        return _merge_fallback(vendor_datas, sorted(fallback), matrix, row_index, errors)
+    if fallback:
+        return _merge_fallback(vendor_datas, sorted(fallback), np.empty((0, len(FEATURE_NAMES))), [], {})
+
+    matrix = np.zeros((n, len(FEATURE_NAMES)))
+    for k in range(len(INTERNAL_FIELDS)):
+        matrix[:, k] = _group_means(numeric[f'internal_{k}'], internal_counts)
+    matrix[:, 4] = _group_means(numeric['ratings'], review_counts)
+
+    has_sentiment = sentiment_counts > 0
+    matrix[has_sentiment, 5] = positive_counts[has_sentiment] / sentiment_counts[has_sentiment]
+
+    matrix[:, 6] = cert_counts
+    matrix[:, 7] = numeric['years']
+    matrix[:, 8] = numeric['team_sizes']
+
+    if risk_levels:
+        owners = np.repeat(np.arange(n), risk_counts)
+        level_sums = np.bincount(owners, weights=np.asarray(risk_levels, dtype=np.float64), minlength=n)
+        has_risks = risk_counts > 0
+        matrix[has_risks, 9] = level_sums[has_risks] / risk_counts[has_risks]
+    matrix[:, 10] = active_risks
+
+    return matrix, list(range(n)), {}
+
+def _merge_fallback(vendor_datas, fallback, matrix, row_index, errors):
+    """Extract the irregular vendors one at a time and merge them into the columnar result"""
+    rows = dict(zip(row_index, matrix))
+    for i in fallback:
+        try:
+            rows[i] = extract_vendor_features(vendor_datas[i])[0].astype(np.float64)
+        except Exception as e:
+            errors[i] = str(e)
+
+    row_index = sorted(rows)
+    if row_index:
+        matrix = np.vstack([rows[i] for i in row_index])
+    else:
+        matrix = np.empty((0, len(FEATURE_NAMES)))
+    return matrix, row_index, errors
@@ -0,0 +1,411 @@
+"""
+Incremental per-vendor feature store for training
+Keeps running sums, counts and maxes per vendor so new project rows can be
+folded in without re-aggregating the full history
+"""
+
+import hashlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from training_data import csv_columns, iter_training_chunks, read_training_csv
+
+# (feature name, source column, aggregation) in engineer_features() order
+VENDOR_AGGREGATES = [
+    ('avg_delivery_success', 'delivery_success_rate', 'mean'),
+    ('avg_quality_score', 'quality_score', 'mean'),
+    ('avg_cost_efficiency', 'cost_efficiency', 'mean'),
+    ('avg_compliance_score', 'compliance_score', 'mean'),
+    ('avg_contract_value', 'contract_value', 'mean'),
+    ('total_projects', 'vendor_id', 'count'),
+    ('incident_rate', 'incident_count', 'mean'),
+    ('avg_response_time', 'response_time_hours', 'mean'),
+    ('avg_external_rating', 'external_rating', 'mean'),
+    ('total_reviews', 'review_count', 'sum'),
+    ('cert_count', 'certification_count', 'max'),
+    ('years_in_business', 'years_in_business', 'max'),
+    ('team_size', 'team_size', 'max'),
+    ('high_risk_incidents', 'high_risk_flag', 'sum'),
+    ('compliance_issues', 'compliance_issue', 'sum'),
+]
+
+SUMMED_COLUMNS = sorted({column for _, column, how in VENDOR_AGGREGATES if how in ('mean', 'sum')})
+MAX_COLUMNS = sorted({column for _, column, how in VENDOR_AGGREGATES if how == 'max'})
+
+# Component scores predicted alongside the overall score by the
+# multi-output model; the API returns each as f'{name}Score'
+COMPONENT_SCORES = ('reliability', 'cost', 'capability', 'performance', 'reputation', 'risk')
+TARGET_COLUMNS = ('total',) + COMPONENT_SCORES
+
+def compute_target(df):
+    """Overall vendor score for every project row"""
+    return (
+        df['delivery_success_rate'] * 0.35 +
+        df['quality_score'] * 0.25 +
+        df['cost_efficiency'] * 0.20 +
+        df['compliance_score'] * 0.10 +
+        df['external_rating'] * 20 * 0.10  # Convert 0-5 to 0-100
+    )
+
+def compute_component_scores(df):
+    """
+    Component scores for every project row, 0-100, in COMPONENT_SCORES order
+
+    Risk is the only one where higher is worse.
+    """
+    incidents = df['incident_count'].astype(np.float64)
+    return pd.DataFrame({
+        'reliability': (
+            df['delivery_success_rate'] * 0.6 +
+            df['compliance_score'] * 0.3 +
+            (100 - incidents * 20).clip(0, 100) * 0.1
+        ),
+        'cost': df['cost_efficiency'] * 0.7 + (100 - df['response_time_hours'] * 2).clip(0, 100) * 0.3,
+        'capability': (
+            df['quality_score'] * 0.5 +
+            (df['certification_count'] * (100 / 7)).clip(upper=100) * 0.25 +
+            (df['years_in_business'] * 4).clip(upper=100) * 0.25
+        ),
+        'performance': df['delivery_success_rate'] * 0.5 + df['quality_score'] * 0.3 + df['cost_efficiency'] * 0.2,
+        'reputation': df['external_rating'] * 20,
+        'risk': (df['high_risk_flag'] * 40 + df['compliance_issue'] * 30 + incidents * 10).clip(0, 100),
+    }, index=df.index).astype(np.float64)
+
+def aggregate_groups(df, codes, n_groups):
+    """
+    Row counts, sums, non-null counts and maxes per group in one pass
+
+    `codes` are integer group codes in [0, n_groups) for every row of `df`,
+    e.g. from pd.factorize(); rows with a negative code are skipped. Sums
+    and counts are bincount reductions; maxes are one stable sort by code
+    followed by a NaN-ignoring reduceat per column, NaN for empty groups.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    if codes.size and codes.min() < 0:
+        keep = codes >= 0
+        df = df[keep]
+        codes = codes[keep]
+
+    aggregates = {
+        'rows': np.bincount(codes, minlength=n_groups),
+        'sum': {},
+        'non_null': {},
+        'max': {},
+    }
+    for column in SUMMED_COLUMNS:
+        values = df[column].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        if valid.all():
+            aggregates['sum'][column] = np.bincount(codes, weights=values, minlength=n_groups)
+            aggregates['non_null'][column] = aggregates['rows'].copy()
+        else:
+            aggregates['sum'][column] = np.bincount(codes[valid], weights=values[valid], minlength=n_groups)
+            aggregates['non_null'][column] = np.bincount(codes[valid], minlength=n_groups)
+
+    # Stable sort of 16-bit keys is a radix sort, several times faster
+    sort_keys = codes.astype(np.uint16) if n_groups <= 1 << 16 else codes
+    order = np.argsort(sort_keys, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    present = sorted_codes[starts]
+    for column in MAX_COLUMNS:
+        maxes = np.full(n_groups, np.nan)
+        if codes.size:
+            maxes[present] = np.fmax.reduceat(df[column].to_numpy(dtype=np.float64)[order], starts)
+        aggregates['max'][column] = maxes
+    return aggregates
+
+def vendor_feature_table(row_counts, sums, non_null, maxes, int_columns=()):
+    """
+    Per-vendor feature columns in engineer_features() order
+
+    Means skip NaN like pandas; counts, and sums and maxes of integer
+    columns, come back as int64 to keep engineer_features() dtypes.
+    """
+    columns = {}
+    for feature, column, how in VENDOR_AGGREGATES:
+        if how == 'count':
+            columns[feature] = np.asarray(row_counts, dtype=np.int64)
+            continue
+        if how == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = sums[column] / non_null[column]
+        elif how == 'sum':
+            values = sums[column]
+        else:
+            values = maxes[column]
+        if how != 'mean' and column in int_columns and not np.isnan(values).any():
+            values = values.astype(np.int64)
+        columns[feature] = values
+    return pd.DataFrame(columns)
+
+def integer_columns(df):
+    """Source columns whose sums and maxes should stay integers"""
+    return {column for column in SUMMED_COLUMNS + MAX_COLUMNS if pd.api.types.is_integer_dtype(df[column])}
+
+class VendorAggregateStore:
+    """
+    Running per-vendor aggregates plus the per-row vendor codes and targets
+
+    For every summed column the store keeps the sum and the number of
+    non-null values per vendor, so means match pandas' skip-NaN semantics;
+    max columns keep a NaN-ignoring running max. The per-row vendor codes,
+    targets and float32 component scores (36 bytes a row) are kept so
+    feature_frame() can rebuild the row-level frame engineer_features()
+    returns without the raw data; everything else is sized by the number
+    of vendors.
+    """
+
+    def __init__(self):
+        self.vendor_ids = []
+        self._vendor_index = {}
+        self.row_counts = np.zeros(0, dtype=np.int64)
+        self.sums = {column: np.zeros(0) for column in SUMMED_COLUMNS}
+        self.non_null = {column: np.zeros(0, dtype=np.int64) for column in SUMMED_COLUMNS}
+        self.maxes = {column: np.zeros(0) for column in MAX_COLUMNS}
+        self.int_columns = set()
+        self._row_vendor = [np.zeros(0, dtype=np.int32)]
+        self._row_target = [np.zeros(0)]
+        self._row_components = [np.zeros((0, len(COMPONENT_SCORES)), dtype=np.float32)]
+        self.rows_seen = 0
+        # How many bytes of the CSV update_from_csv() has folded in, and their
+        # SHA-256; None for a store that was not built from a CSV
+        self.source_bytes = 0
+        self.source_sha256 = None
+
+    @property
+    def n_vendors(self):
+        return len(self.vendor_ids)
+
+    @property
+    def row_vendor(self):
+        """Store vendor code of every row added so far"""
+        if len(self._row_vendor) > 1:
+            self._row_vendor = [np.concatenate(self._row_vendor)]
+        return self._row_vendor[0]
+
+    @property
+    def row_target(self):
+        """Target of every row added so far"""
+        if len(self._row_target) > 1:
+            self._row_target = [np.concatenate(self._row_target)]
+        return self._row_target[0]
+
+    @property
+    def row_components(self):
+        """(n_rows, len(COMPONENT_SCORES)) component scores of every row added so far"""
+        if len(self._row_components) > 1:
+            self._row_components = [np.concatenate(self._row_components)]
+        return self._row_components[0]
+
+    def _grow(self, n_vendors):
+        extra = n_vendors - len(self.row_counts)
+        if extra <= 0:
+            return
+        self.row_counts = np.concatenate([self.row_counts, np.zeros(extra, dtype=np.int64)])
+        for column in SUMMED_COLUMNS:
+            self.sums[column] = np.concatenate([self.sums[column], np.zeros(extra)])
+            self.non_null[column] = np.concatenate([self.non_null[column], np.zeros(extra, dtype=np.int64)])
+        for column in MAX_COLUMNS:
+            self.maxes[column] = np.concatenate([self.maxes[column], np.full(extra, np.nan)])
+
+    def _codes(self, vendor_ids):
+        """Map vendor ids to stable store codes, registering new vendors"""
+        codes, uniques = pd.factorize(vendor_ids)
+        if codes.size and codes.min() < 0:
+            raise ValueError('vendor_id is missing for some rows')
+        unique_codes = np.empty(len(uniques), dtype=np.int64)
+        for i, vendor_id in enumerate(map(str, uniques)):
+            code = self._vendor_index.get(vendor_id)
+            if code is None:
+                code = len(self.vendor_ids)
+                self._vendor_index[vendor_id] = code
+                self.vendor_ids.append(vendor_id)
+            unique_codes[i] = code
+        self._grow(len(self.vendor_ids))
+        return unique_codes[codes]
+
+    def update(self, df):
+        """Fold a batch of new project rows into the running aggregates"""
+        if len(df) == 0:
+            return self
+        codes = self._codes(df['vendor_id'])
+        batch = aggregate_groups(df, codes, self.n_vendors)
+
+        self.row_counts += batch['rows']
+        for column in SUMMED_COLUMNS:
+            self.sums[column] += batch['sum'][column]
+            self.non_null[column] += batch['non_null'][column]
+        for column in MAX_COLUMNS:
+            self.maxes[column] = np.fmax(self.maxes[column], batch['max'][column])
+        batch_int_columns = integer_columns(df)
+        if self.rows_seen == 0:
+            self.int_columns = batch_int_columns
+        else:
+            self.int_columns &= batch_int_columns
+
+        # Chunks are concatenated on first access instead of on every update
+        self._row_vendor.append(codes.astype(np.int32))
+        self._row_target.append(compute_target(df).to_numpy(dtype=np.float64))
+        self._row_components.append(compute_component_scores(df).to_numpy(dtype=np.float32))
+        self.rows_seen += len(df)
+        return self
+
+    def vendor_frame(self):
+        """One row of features per vendor, indexed by vendor_id"""
+        table = vendor_feature_table(self.row_counts, self.sums, self.non_null, self.maxes, self.int_columns)
+        table.index = pd.Index(self.vendor_ids, name='vendor_id')
+        return table
+
+    def feature_frame(self):
+        """
+        Row-level features and target, as returned by engineer_features()
+
+        Every project row gets its vendor's aggregates, in the order the
+        rows were added.
+        """
+        vendors = self.vendor_frame().reset_index(drop=True)
+        features = vendors.take(self.row_vendor).reset_index(drop=True)
+        target = pd.Series(self.row_target)
+        return features, target
+
+    def target_frame(self):
+        """Overall and component score of every row, columns TARGET_COLUMNS"""
+        targets = pd.DataFrame(self.row_components.astype(np.float64), columns=list(COMPONENT_SCORES))
+        targets.insert(0, 'total', self.row_target)
+        return targets
+
+    def save(self, path):
+        """Write the store to an .npz file, atomically"""
+        arrays = {
+            'vendor_ids': np.asarray(self.vendor_ids, dtype=str),
+            'row_counts': self.row_counts,
+            'int_columns': np.asarray(sorted(self.int_columns), dtype=str),
+            'row_vendor': self.row_vendor,
+            'row_target': self.row_target,
+            'row_components': self.row_components,
+            'rows_seen': np.array(self.rows_seen),
+            'source_bytes': np.array(self.source_bytes),
+        }
+        if self.source_sha256 is not None:
+            arrays['source_sha256'] = np.array(self.source_sha256)
+        for column in SUMMED_COLUMNS:
+            arrays[f'sum__{column}'] = self.sums[column]
+            arrays[f'non_null__{column}'] = self.non_null[column]
+        for column in MAX_COLUMNS:
+            arrays[f'max__{column}'] = self.maxes[column]
+
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        store = cls()
+        with np.load(path) as arrays:
+            if 'row_components' not in arrays:
+                raise ValueError(f'{path} predates component scores; delete it to rebuild the store')
+            store.vendor_ids = arrays['vendor_ids'].tolist()
+            store._vendor_index = {vendor_id: i for i, vendor_id in enumerate(store.vendor_ids)}
+            store.row_counts = arrays['row_counts']
+            store.int_columns = set(arrays['int_columns'].tolist())
+            store._row_vendor = [arrays['row_vendor']]
+            store._row_target = [arrays['row_target']]
+            store._row_components = [arrays['row_components']]
+            store.rows_seen = int(arrays['rows_seen'])
+            if 'source_sha256' in arrays:
+                store.source_bytes = int(arrays['source_bytes'])
+                store.source_sha256 = str(arrays['source_sha256'])
+            for column in SUMMED_COLUMNS:
+                store.sums[column] = arrays[f'sum__{column}']
+                store.non_null[column] = arrays[f'non_null__{column}']
+            for column in MAX_COLUMNS:
+                store.maxes[column] = arrays[f'max__{column}']
+        return store
+
+def aggregate_training_csv(csv_path, chunksize=1_000_000, cache_dir=None):
+    """
+    Build an in-memory store by streaming `csv_path` chunk by chunk
+
+    Only one typed chunk of raw rows is alive at a time; see
+    training_data.iter_training_chunks() for `cache_dir`.
+    """
+    store = VendorAggregateStore()
+    for chunk in iter_training_chunks(csv_path, chunksize=chunksize, cache_dir=cache_dir):
+        store.update(chunk)
+    print(f"Aggregated {store.rows_seen} rows for {store.n_vendors} vendors")
+    return store
+
+class _HashingReader(io.RawIOBase):
+    """Read-only view of a binary file that hashes and counts the bytes read through it"""
+
+    def __init__(self, f, digest):
+        self._f = f
+        self.digest = digest
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self._f.readinto(buffer)
+        self.digest.update(memoryview(buffer)[:n])
+        self.bytes_read += n
+        return n
+
+def _prefix_matches(f, n_bytes, expected_sha256, digest):
+    """Hash the first `n_bytes` of `f` into `digest`; True if they hash to `expected_sha256`"""
+    remaining = n_bytes
+    while remaining:
+        block = f.read(min(remaining, 1 << 20))
+        if not block:
+            return False
+        digest.update(block)
+        remaining -= len(block)
+    return digest.hexdigest() == expected_sha256
+
+def update_from_csv(store_path, csv_path, chunksize=1_000_000):
+    """
+    Bring the store at `store_path` up to date with `csv_path`
+
+    The store records how many bytes of the CSV it has read and their
+    SHA-256. While the CSV still starts with those bytes, reading resumes
+    right after them, so an appended CSV costs a hash of the old bytes and
+    parsing the delta. A CSV that was rewritten or truncated, or a store
+    not built by this function, is rebuilt from scratch. Creates the store
+    if it does not exist.
+    """
+    if os.path.exists(store_path):
+        store = VendorAggregateStore.load(store_path)
+    else:
+        store = VendorAggregateStore()
+
+    with open(csv_path, 'rb') as f:
+        digest = hashlib.sha256()
+        if store.source_sha256 is None:
+            resumable = store.rows_seen == 0
+        else:
+            resumable = _prefix_matches(f, store.source_bytes, store.source_sha256, digest)
+        if not resumable:
+            print(f"✗ {csv_path} no longer starts with the rows in {store_path}; rebuilding the feature store")
+            store = VendorAggregateStore()
+            f.seek(0)
+            digest = hashlib.sha256()
+
+        # Past the header the columns come from it; everything read is hashed on the way
+        columns = csv_columns(csv_path) if store.source_bytes else None
+        reader = _HashingReader(f, digest)
+        new_rows = 0
+        for chunk in read_training_csv(reader, chunksize=chunksize, columns=columns):
+            store.update(chunk)
+            new_rows += len(chunk)
+        store.source_bytes += reader.bytes_read
+        store.source_sha256 = digest.hexdigest()
+
+    store.save(store_path)
+    print(f"Feature store: {new_rows} new rows, {store.rows_seen} total, {store.n_vendors} vendors")
+    return store
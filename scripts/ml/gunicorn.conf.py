@@ -0,0 +1,43 @@
+"""
+Gunicorn configuration for serving the inference API in production
+
+    gunicorn -c gunicorn.conf.py "inference_api:create_app()"
+
+Environment:
+    PORT                 port to bind (default 5000)
+    ML_WORKERS           worker processes (default: CPU count, max 8)
+    ML_THREADS           request threads per worker (default 16)
+    ML_PRELOAD_MODEL     'true' loads the model once in the master and
+                         shares it with the workers copy-on-write;
+                         'false' gives every worker its own model instance
+                         (default 'true')
+    ML_TIMEOUT           worker timeout in seconds (default 30)
+
+Prediction concurrency inside each worker is set by PREDICT_WORKERS and
+PREDICT_QUEUE_SIZE, read by inference_api.py. SHARD_WORKERS gives each
+worker processes of its own for splitting large /batch-predict chunks;
+with ML_WORKERS at the CPU count leave it at 0, or every worker's shards
+compete for the same cores.
+
+With ML_PRELOAD_MODEL the model watcher started in the master does not
+survive the fork, so post_fork starts one in every worker; each worker
+then reloads a changed model on its own.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('ML_WORKERS', min(multiprocessing.cpu_count(), 8)))
+worker_class = 'gthread'
+threads = int(os.getenv('ML_THREADS', 16))
+preload_app = os.getenv('ML_PRELOAD_MODEL', 'true').lower() == 'true'
+timeout = int(os.getenv('ML_TIMEOUT', 30))
+keepalive = 5
+accesslog = '-'
+
+def post_fork(server, worker):
+    """Start the hot-reload watcher in a worker forked from a preloading master"""
+    if preload_app:
+        import inference_api
+        inference_api.registry.start_watching()
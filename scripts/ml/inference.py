@@ -5,64 +5,259 @@ Inference script for vendor scoring
 import joblib
 import numpy as np
 import json
+import os
+import threading
+
+from sklearn.preprocessing import StandardScaler
+
+from model_artifact import load_artifact
+from sharded_predict import ShardPool
+from tree_engine import compile_model
+from tree_explainer import TreeExplainer
+
+# Scoring features in model input order, with the value used when a vendor omits one
+FEATURE_DEFAULTS = (
+    ('avg_delivery_success', 80),
+    ('avg_quality_score', 80),
+    ('avg_cost_efficiency', 75),
+    ('avg_compliance_score', 90),
+    ('avg_contract_value', 100000),
+    ('total_projects', 5),
+    ('incident_rate', 0.5),
+    ('avg_response_time', 24),
+    ('avg_external_rating', 4.0),
+    ('total_reviews', 100),
+    ('cert_count', 3),
+    ('years_in_business', 10),
+    ('team_size', 50),
+    ('high_risk_incidents', 0),
+    ('compliance_issues', 0),
+)
+
+# Short names used for the feature_importance explanation
+IMPORTANCE_NAMES = ['delivery', 'quality', 'cost', 'compliance', 'contract_value',
+                    'projects', 'incidents', 'response', 'rating', 'reviews',
+                    'certs', 'years', 'team', 'risks', 'compliance_issues']
+
+def recommendation(score):
+    return 'Recommended' if score >= 75 else 'Review Required' if score >= 60 else 'Not Recommended'
+
+def feature_matrix(vendors):
+    """(n, n_features) float64 rows for a list of feature dicts or a 2-D array"""
+    if isinstance(vendors, np.ndarray):
+        matrix = np.asarray(vendors, dtype=np.float64)
+        if matrix.ndim != 2 or matrix.shape[1] != len(FEATURE_DEFAULTS):
+            raise ValueError(f'Expected shape (n, {len(FEATURE_DEFAULTS)}), got {matrix.shape}')
+        return matrix
+    if not vendors:
+        return np.empty((0, len(FEATURE_DEFAULTS)), dtype=np.float64)
+    return np.array(
+        [[features.get(name, default) for name, default in FEATURE_DEFAULTS] for features in vendors],
+        dtype=np.float64
+    )
 
 class VendorScorer:
     def __init__(self, model_path='models/vendor_scoring_model.pkl', 
-                 scaler_path='models/feature_scaler.pkl'):
-        self.model = joblib.load(model_path)
+                 scaler_path='models/feature_scaler.pkl',
+                 artifact_path='models/vendor_scoring_model.bin',
+                 metadata_path='models/model_metadata.json',
+                 compact_path=None, shard_workers=0):
         self.scaler = joblib.load(scaler_path)
+        
+        # A compact artifact from compact_model.py replaces the full model when given
+        if compact_path:
+            self.model = None
+            self.engine = load_artifact(compact_path, metadata_path=metadata_path, metadata_key='compact_artifact')
+            self.feature_importances = self.engine.feature_importances
+        # Prefer the memory-mapped artifact, which skips unpickling the model
+        elif artifact_path and os.path.exists(artifact_path):
+            self.model = None
+            self.engine = load_artifact(artifact_path, metadata_path=metadata_path)
+            self.feature_importances = self.engine.feature_importances
+        else:
+            self.model = joblib.load(model_path)
+            self.engine = compile_model(self.model)
+            self.feature_importances = getattr(self.model, 'feature_importances_', None)
+        self.outputs = self._load_outputs(metadata_path)
+        
+        # Work done once instead of on every score_vendor() call
+        self.raw_engine = self._fold_scaler()
+        self._buffers = threading.local()
+        # TreeExplainers by engine, each built on its first explain=True call
+        self._explainers = {}
+        self._explainer_lock = threading.Lock()
+        try:
+            self._importance = dict(zip(IMPORTANCE_NAMES, self.feature_importances))
+        except TypeError:
+            self._importance = {}
+        
+        # score_many() splits large batches across shard_workers processes
+        # that each load this scorer once (None: one per CPU beyond this one)
+        self._spec = (
+            VendorScorer, (model_path, scaler_path, artifact_path, metadata_path, compact_path), 'predict_raw', None
+        )
+        self.shard_pool = ShardPool(shard_workers, preload=[self._spec]) if shard_workers != 0 else None
+    
+    def _load_outputs(self, metadata_path):
+        """Output names of a multi-output model, from the training metadata"""
+        n_outputs = self.engine.n_outputs if self.engine is not None else getattr(self.model, 'n_outputs_', 1)
+        if n_outputs == 1:
+            return None
+        with open(metadata_path) as f:
+            outputs = json.load(f).get('outputs')
+        if not outputs or len(outputs) != n_outputs or 'total' not in outputs:
+            raise ValueError(f"Model has {n_outputs} outputs but {metadata_path} does not name them, including 'total'")
+        return outputs
+    
+    def _fold_scaler(self):
+        """
+        The compiled engine with the StandardScaler folded into its thresholds
+        
+        None when there is no engine, the scaler is not a StandardScaler or
+        the engine is a float32 compact one; scoring then transforms each
+        row as before.
+        """
+        if self.engine is None or not isinstance(self.scaler, StandardScaler):
+            return None
+        n_features = self.engine.n_features
+        # mean_ is fitted even with with_mean=False; transform() only uses it when set
+        mean = self.scaler.mean_ if self.scaler.with_mean else np.zeros(n_features)
+        scale = self.scaler.scale_ if self.scaler.with_std else np.ones(n_features)
+        try:
+            return self.engine.fold_scaler(mean, scale)
+        except ValueError:
+            return None
+    
+    def predict(self, scaled_features):
+        """Predict scaled feature rows with the compiled engine when available"""
+        if self.engine is not None:
+            return self.engine.predict(scaled_features)
+        return self.model.predict(scaled_features)
+    
+    def _folded(self, features):
+        """
+        Whether unscaled rows can skip the scaler
+        
+        Rows with NaN or infinity, e.g. from a None feature, always go
+        through scaler.transform and the unfolded model, so they are scored
+        or rejected exactly as they were before the scaler was folded in.
+        """
+        return self.raw_engine is not None and np.isfinite(features).all()
+    
+    def predict_raw(self, features):
+        """Predict unscaled feature rows, skipping the scaler when it is folded in"""
+        if self._folded(features):
+            return self.raw_engine.predict(features)
+        return self.predict(self.scaler.transform(features))
     
-    def score_vendor(self, features):
+    def explain_raw(self, features):
+        """
+        (base score, per-feature contributions) to the overall score of unscaled feature rows
+        
+        Exact TreeSHAP values: each row's contributions add up with the
+        base score to its score.
+        """
+        if self._folded(features):
+            return self._explain(self.raw_engine, features)
+        return self._explain(self.engine, self.scaler.transform(features))
+    
+    def _explain(self, engine, features):
+        """Explain rows with the TreeExplainer of `engine`, built on its first use"""
+        if engine is None:
+            raise ValueError('Explanations need a compiled model')
+        explainer = self._explainers.get(id(engine))
+        if explainer is None:
+            with self._explainer_lock:
+                explainer = self._explainers.get(id(engine))
+                if explainer is None:
+                    total = self.outputs.index('total') if self.outputs else 0
+                    explainer = self._explainers[id(engine)] = TreeExplainer(engine, output=total)
+        return explainer.expected_value, explainer.shap_values(features)
+    
+    def _explanations(self, features):
+        """'explanation' result entry for each unscaled feature row"""
+        base_score, contributions = self.explain_raw(features)
+        return [
+            {'base_score': base_score, 'contributions': dict(zip(IMPORTANCE_NAMES, row))}
+            for row in contributions.tolist()
+        ]
+    
+    def _buffer(self):
+        """This thread's reusable (1, n_features) input row"""
+        buffer = getattr(self._buffers, 'row', None)
+        if buffer is None:
+            buffer = self._buffers.row = np.empty((1, len(FEATURE_DEFAULTS)), dtype=np.float64)
+        return buffer
+    
+    def _result(self, prediction):
+        """score_vendor() result for one row of predictions"""
+        if self.outputs is None:
+            score = float(prediction)
+            components = None
+        else:
+            components = dict(zip(self.outputs, prediction.tolist()))
+            score = components.pop('total')
+        result = {
+            'score': score,
+            'feature_importance': dict(self._importance),
+            'recommendation': recommendation(score)
+        }
+        if components is not None:
+            result['components'] = components
+        return result
+    
+    def score_vendor(self, features, explain=False):
         """
         Score a vendor based on features
         
         Args:
             features: dict with keys matching training features
+            explain: also return this vendor's per-feature contributions
+                to its score under 'explanation'
         
         Returns:
-            dict with score and explanation
+            dict with score and explanation, plus the component scores
+            when the model predicts them
         """
-        # Convert to array in correct order
-        feature_array = np.array([
-            features.get('avg_delivery_success', 80),
-            features.get('avg_quality_score', 80),
-            features.get('avg_cost_efficiency', 75),
-            features.get('avg_compliance_score', 90),
-            features.get('avg_contract_value', 100000),
-            features.get('total_projects', 5),
-            features.get('incident_rate', 0.5),
-            features.get('avg_response_time', 24),
-            features.get('avg_external_rating', 4.0),
-            features.get('total_reviews', 100),
-            features.get('cert_count', 3),
-            features.get('years_in_business', 10),
-            features.get('team_size', 50),
-            features.get('high_risk_incidents', 0),
-            features.get('compliance_issues', 0),
-        ]).reshape(1, -1)
+        # Fill the row in model input order
+        feature_array = self._buffer()
+        feature_array[0] = [features.get(name, default) for name, default in FEATURE_DEFAULTS]
         
-        # Scale features
-        scaled_features = self.scaler.transform(feature_array)
+        result = self._result(self.predict_raw(feature_array)[0])
+        if explain:
+            result['explanation'] = self._explanations(feature_array)[0]
+        return result
+    
+    def score_many(self, vendors, explain=False):
+        """
+        Score many vendors with one predict call
         
-        # Predict
-        score = self.model.predict(scaled_features)[0]
+        With shard_workers, a large batch is split into row shards that
+        the worker processes score alongside this one.
         
-        # Get feature importance if available
-        try:
-            importance = dict(zip(
-                ['delivery', 'quality', 'cost', 'compliance', 'contract_value',
-                 'projects', 'incidents', 'response', 'rating', 'reviews',
-                 'certs', 'years', 'team', 'risks', 'compliance_issues'],
-                self.model.feature_importances_
-            ))
-        except:
-            importance = {}
+        Args:
+            vendors: list of feature dicts (as for score_vendor) or a 2-D
+                array of unscaled features in model input order
+            explain: add each vendor's 'explanation', computed for the
+                whole batch at once
         
-        return {
-            'score': float(score),
-            'feature_importance': importance,
-            'recommendation': 'Recommended' if score >= 75 else 'Review Required' if score >= 60 else 'Not Recommended'
-        }
+        Returns:
+            list of score_vendor() results, in input order
+        """
+        matrix = feature_matrix(vendors)
+        if len(matrix) == 0:
+            return []
+        if self.shard_pool is not None:
+            predictions = self.shard_pool.predict(
+                self._spec, matrix, self.predict_raw, len(self.outputs or [None])
+            )
+        else:
+            predictions = self.predict_raw(matrix)
+        results = [self._result(prediction) for prediction in predictions]
+        if explain:
+            for result, explanation in zip(results, self._explanations(matrix)):
+                result['explanation'] = explanation
+        return results
 
 # Example usage
 if __name__ == "__main__":
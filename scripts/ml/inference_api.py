@@ -3,117 +3,614 @@ Flask API for ML Model Inference
 Serves the trained vendor scoring model as a REST API
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-import joblib
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Any
+from concurrent.futures import Future
+import functools
 import os
+import json
+import time
+
+import codec
+from feature_extraction import FEATURE_NAMES, extract_feature_matrix as vendor_feature_matrix
+from metrics import LATENCY_BUCKETS, PROMETHEUS_CONTENT_TYPE, MetricsRegistry
+from micro_batching import BATCH_SIZE_BUCKETS, QUEUE_WAIT_BUCKETS, MicroBatcher
+from model_registry import ModelHandle, ModelRegistry, load_model_handle
+from model_variants import PRIMARY, ShadowLog, ShadowScorer, Variant, VariantRouter
+from prediction_cache import PredictionCache
+from profiler import SamplingProfiler
+from serving import PredictionExecutor, ServerOverloaded
+from sharded_predict import ShardPool, default_workers
 
 app = Flask(__name__)
 CORS(app)
 
 # Load the trained model
 MODEL_PATH = os.getenv('MODEL_PATH', './models/vendor_score_model.pkl')
-model = None
+# Memory-mapped artifact written next to the pickle by save_model(); preferred when present
+ARTIFACT_PATH = os.getenv('MODEL_ARTIFACT_PATH', os.path.splitext(MODEL_PATH)[0] + '.bin')
+METADATA_PATH = os.getenv('MODEL_METADATA_PATH', os.path.join(os.path.dirname(MODEL_PATH), 'model_metadata.json'))
+VERIFY_ARTIFACT = os.getenv('VERIFY_ARTIFACT', 'true').lower() == 'true'
+# Quantized copy written by compact_model.py; served instead of the artifact when COMPACT_MODEL=true
+COMPACT_PATH = (
+    os.getenv('MODEL_COMPACT_PATH', os.path.splitext(MODEL_PATH)[0] + '.compact.bin')
+    if os.getenv('COMPACT_MODEL', 'false').lower() == 'true' else None
+)
+# Seconds between checks of the model files for a new version; 0 disables hot reload
+MODEL_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', 30))
+# JSON list of vendorData objects a new model must score sensibly before it is swapped in
+CANARY_PATH = os.getenv('MODEL_CANARY_PATH')
+
+# A/B and shadow variants: a JSON list of {"name", "model_path", "mode":
+# "ab" | "shadow", "traffic"}; artifact_path and metadata_path default
+# like MODEL_PATH's, and an optional compact_path serves a compact model.
+# Variants are loaded at startup and not hot-reloaded.
+VARIANTS_PATH = os.getenv('MODEL_VARIANTS_PATH')
+SHADOW_LOG_PATH = os.getenv('SHADOW_LOG_PATH', './logs/shadow_predictions.ndjson')
+SHADOW_WORKERS = int(os.getenv('SHADOW_WORKERS', 1))
+SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', 32))
+
+# Built-in canary vendors: no data, an average vendor and a strong vendor
+CANARY_VENDORS = [
+    {},
+    {
+        'internalRecords': [{'deliverySuccessRate': 80, 'qualityScore': 75, 'costEfficiency': 70, 'complianceScore': 85}],
+        'externalReviews': [{'rating': 3.8, 'sentiment': 'neutral'}],
+        'features': [{'certifications': ['ISO9001'], 'yearsInBusiness': 8, 'teamSize': 40}],
+        'risks': [{'riskLevel': 'MEDIUM', 'status': 'ACTIVE'}]
+    },
+    {
+        'internalRecords': [{'deliverySuccessRate': 98, 'qualityScore': 95, 'costEfficiency': 90, 'complianceScore': 99}],
+        'externalReviews': [{'rating': 4.9, 'sentiment': 'positive'}],
+        'features': [{'certifications': ['ISO9001', 'ISO27001', 'SOC2'], 'yearsInBusiness': 25, 'teamSize': 400}],
+        'risks': []
+    },
+]
+
+# Cache of predictions keyed on the extracted feature row and model version
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv('PREDICTION_CACHE_SIZE', 10000)),
+    ttl_seconds=float(os.getenv('PREDICTION_CACHE_TTL', 300))
+)
+
+# Maximum number of rows passed to a single model.predict call in /batch-predict
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 1000))
+# Rows per explanation job; TreeSHAP costs far more per row than predict,
+# so "explain": true batches are split finer to keep pool jobs short
+EXPLAIN_CHUNK_SIZE = int(os.getenv('EXPLAIN_CHUNK_SIZE', 16))
+
+# /batch-predict/stream: vendors read and scored per chunk, the longest
+# accepted input line, and how often a chunk is retried while the
+# prediction pool is full before its vendors are reported as failed
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 500))
+STREAM_MAX_LINE_BYTES = int(os.getenv('STREAM_MAX_LINE_BYTES', 1 << 20))
+STREAM_OVERLOAD_RETRIES = int(os.getenv('STREAM_OVERLOAD_RETRIES', 30))
+
+# Sampling profiler for slow requests; its control endpoint only exists when
+# PROFILER_CONTROL=true, and sampling starts when it is switched on there
+# (or at startup with PROFILER_ENABLED=true)
+PROFILER_CONTROL = os.getenv('PROFILER_CONTROL', 'false').lower() == 'true'
+profiler = SamplingProfiler(
+    interval=float(os.getenv('PROFILER_INTERVAL_MS', 5)) / 1000.0,
+    slow_threshold=float(os.getenv('PROFILER_SLOW_MS', 100)) / 1000.0
+)
+if os.getenv('PROFILER_ENABLED', 'false').lower() == 'true':
+    profiler.start()
+
+# Predict calls run on a bounded pool; requests beyond the queue get a 503.
+# Each call is sampled by the profiler as part of the request that made it
+predict_executor = PredictionExecutor(
+    max_workers=int(os.getenv('PREDICT_WORKERS', 4)),
+    max_queue=int(os.getenv('PREDICT_QUEUE_SIZE', 64)),
+    retry_after=int(os.getenv('RETRY_AFTER_SECONDS', 1)),
+    wrap_task=profiler.bind
+)
+
+# Row-sharding of large /batch-predict chunks across SHARD_WORKERS
+# processes that each keep the model loaded ('auto': one per CPU beyond
+# the request's own). Off by default, since gunicorn already runs one
+# worker per CPU; it suits a server with few workers and large batches.
+_shard_workers = os.getenv('SHARD_WORKERS', '0')
+SHARD_WORKERS = default_workers() if _shard_workers == 'auto' else int(_shard_workers)
+shard_pool = ShardPool(SHARD_WORKERS) if SHARD_WORKERS > 0 else None
+if shard_pool is not None:
+    # Chunks large enough to give every worker a full shard
+    BATCH_CHUNK_SIZE = max(BATCH_CHUNK_SIZE, shard_pool.batch_rows)
+
+# Coalesce concurrent single-vendor /predict calls into one model call
+micro_batcher = None
+if os.getenv('MICROBATCH_ENABLED', 'false').lower() == 'true':
+    micro_batcher = MicroBatcher(
+        lambda features, handle: submit_predict(features, handle),
+        max_batch_size=int(os.getenv('MICROBATCH_MAX_SIZE', 64)),
+        max_wait_ms=float(os.getenv('MICROBATCH_MAX_WAIT_MS', 2)),
+        max_queue=int(os.getenv('MICROBATCH_MAX_QUEUE', 1024))
+    )
+
+# Prometheus metrics served on /metrics
+metrics_registry = MetricsRegistry()
+REQUESTS = metrics_registry.counter(
+    'ml_api_requests_total', 'HTTP requests by endpoint and status code', ('endpoint', 'status')
+)
+REQUEST_SECONDS = metrics_registry.histogram(
+    'ml_api_request_duration_seconds', 'End-to-end request time', LATENCY_BUCKETS, ('endpoint',)
+)
+STAGE_SECONDS = metrics_registry.histogram(
+    'ml_api_stage_duration_seconds', 'Time per request stage: parse, extract, predict, explain, serialize',
+    LATENCY_BUCKETS, ('endpoint', 'stage')
+)
+BATCH_VENDORS = metrics_registry.histogram(
+    'ml_api_batch_vendors', 'Vendors per /batch-predict request', BATCH_SIZE_BUCKETS + [1024, 2048, 4096, 8192]
+).labels()
+PREDICT_ROWS = metrics_registry.histogram(
+    'ml_api_predict_rows', 'Feature rows per model predict call', BATCH_SIZE_BUCKETS + [1024, 2048, 4096, 8192]
+).labels()
+metrics_registry.gauge_callback(
+    'ml_api_predict_in_flight', 'Predictions running or queued on the prediction pool',
+    lambda: predict_executor.in_flight
+)
+metrics_registry.counter_callback(
+    'ml_api_predict_rejected_total', 'Predictions rejected with 503 because the queue was full',
+    lambda: predict_executor.rejected
+)
+metrics_registry.counter_callback('ml_api_cache_hits_total', 'Prediction cache hits', lambda: prediction_cache.hits)
+metrics_registry.counter_callback('ml_api_cache_misses_total', 'Prediction cache misses', lambda: prediction_cache.misses)
+metrics_registry.counter_callback('ml_api_model_reloads_total', 'Models hot-swapped in', lambda: registry.reloads)
+VARIANT_VENDORS = metrics_registry.counter(
+    'ml_api_variant_vendors_total', 'Vendors scored by the primary model or an A/B variant', ('variant',)
+)
+SHADOW_SECONDS = metrics_registry.histogram(
+    'ml_api_shadow_predict_duration_seconds', 'Time per shadow variant predict call', LATENCY_BUCKETS, ('variant',)
+)
+metrics_registry.counter_callback(
+    'ml_api_shadow_dropped_total', 'Shadow predictions dropped because the shadow queue was full',
+    lambda: shadow_scorer.dropped if shadow_scorer else 0
+)
+if micro_batcher is not None:
+    metrics_registry.histogram(
+        'ml_api_microbatch_rows', 'Rows per coalesced /predict model call', BATCH_SIZE_BUCKETS
+    ).adopt(micro_batcher.batch_sizes)
+    metrics_registry.histogram(
+        'ml_api_microbatch_queue_wait_seconds', 'Time rows wait in the micro-batch queue', QUEUE_WAIT_BUCKETS
+    ).adopt(micro_batcher.queue_waits)
+
+def json_response(obj, status=200):
+    """Response with `obj` encoded by the JSON codec"""
+    return Response(codec.dumps(obj), status=status, content_type=codec.JSON_CONTENT_TYPE)
+
+def request_json():
+    """
+    The request body decoded by the JSON codec
+    
+    Bodies not sent as JSON go through request.json so they are rejected
+    the way they always were. The raw body is not kept after decoding.
+    """
+    if not request.is_json:
+        return request.json
+    return codec.loads(request.get_data(cache=False))
+
+def _canary_features():
+    vendors = CANARY_VENDORS
+    if CANARY_PATH:
+        with open(CANARY_PATH) as f:
+            vendors = json.load(f)
+    matrix, _, _ = vendor_feature_matrix(vendors)
+    return matrix
+
+def _model_swapped(handle):
+    prediction_cache.clear()
+    # Workers started from now on load the new model up front
+    if shard_pool is not None:
+        shard_pool.preload = [handle.spec]
+
+# Active model; swapped atomically when the files above change
+registry = ModelRegistry(
+    loader=functools.partial(load_model_handle, MODEL_PATH, ARTIFACT_PATH, METADATA_PATH, COMPACT_PATH, VERIFY_ARTIFACT),
+    watch_paths=[MODEL_PATH, ARTIFACT_PATH, METADATA_PATH] + ([COMPACT_PATH] if COMPACT_PATH else []),
+    canary_features=_canary_features(),
+    score_range=(float(os.getenv('CANARY_MIN_SCORE', 0)), float(os.getenv('CANARY_MAX_SCORE', 100))),
+    poll_interval=MODEL_RELOAD_INTERVAL,
+    on_swap=_model_swapped
+)
+
+# Routing to A/B variants and the shadow scorer; replaced by load_variants()
+variant_router = VariantRouter([])
+shadow_scorer = None
+
+def load_variants():
+    """
+    Load the variants listed in MODEL_VARIANTS_PATH
+    
+    A variant that fails to load or fails the canary check is skipped, so
+    its traffic stays on the primary model.
+    """
+    global variant_router, shadow_scorer
+    with open(VARIANTS_PATH) as f:
+        entries = json.load(f)
+    
+    variants = []
+    for entry in entries:
+        name = entry.get('name')
+        try:
+            model_path = entry['model_path']
+            handle = load_model_handle(
+                model_path,
+                entry.get('artifact_path', os.path.splitext(model_path)[0] + '.bin'),
+                entry.get('metadata_path', os.path.join(os.path.dirname(model_path), 'model_metadata.json')),
+                entry.get('compact_path'),
+                VERIFY_ARTIFACT
+            )
+            # Variant versions never collide with the primary's in the prediction cache
+            handle.version = f'{name}:{handle.version}'
+            registry.check_canary(handle)
+            variant = Variant(name, handle, entry.get('mode', 'shadow'), float(entry.get('traffic', 1.0)))
+        except Exception as e:
+            print(f"✗ Skipping model variant {name}: {e}")
+            continue
+        if variant.mode == 'shadow':
+            SHADOW_SECONDS.adopt(variant.latencies, name)
+        variants.append(variant)
+        print(f"✓ Model variant {name} ({variant.mode}, {variant.traffic:.0%} of vendors): {handle.version}")
+    
+    router = VariantRouter(variants)
+    if router.shadows:
+        shadow_scorer = ShadowScorer(
+            router.shadows, ShadowLog(SHADOW_LOG_PATH), max_workers=SHADOW_WORKERS, max_queue=SHADOW_QUEUE_SIZE
+        )
+    variant_router = router
 
 def load_model():
     """Load the trained model on startup"""
-    global model
     try:
-        model = joblib.load(MODEL_PATH)
-        print(f"✓ Model loaded successfully from {MODEL_PATH}")
-        return True
+        registry.load_now()
     except Exception as e:
         print(f"✗ Failed to load model: {e}")
         return False
+    if VARIANTS_PATH:
+        try:
+            load_variants()
+        except Exception as e:
+            print(f"✗ Failed to load model variants from {VARIANTS_PATH}: {e}")
+    return True
+
+def create_app():
+    """
+    Application factory for production servers
+    
+    gunicorn runs `inference_api:create_app()`; see gunicorn.conf.py for
+    whether the model is loaded once in the master or once per worker.
+    With the model preloaded this runs in the master only, and each worker
+    starts its own watcher from the post_fork hook.
+    """
+    if registry.active is None and not load_model():
+        print("Warning: Running without model. /predict endpoint will fail.")
+    registry.start_watching()
+    return app
+
+def submit_predict(features: np.ndarray, handle: ModelHandle) -> Future:
+    """
+    Schedule a predict of feature rows with `handle` on the prediction pool
+    
+    With sharding enabled, a large batch is split across the shard
+    workers from there. Raises ServerOverloaded when the pool's queue is
+    full.
+    """
+    PREDICT_ROWS.observe(len(features))
+    if shard_pool is not None and handle.spec is not None:
+        return predict_executor.submit(
+            shard_pool.predict, handle.spec, features, handle.predict, len(handle.outputs or [None])
+        )
+    return predict_executor.submit(handle.predict, features)
+
+def model_predict(features: np.ndarray, handle: ModelHandle) -> np.ndarray:
+    """Predict feature rows with `handle` on the prediction pool and wait for them; see submit_predict()"""
+    return submit_predict(features, handle).result()
+
+def coalesced_predict(features: np.ndarray, handle: ModelHandle) -> np.ndarray:
+    """Predict rows through the micro-batcher when it is enabled"""
+    if micro_batcher is None:
+        return model_predict(features, handle)
+    return micro_batcher.predict(features, key=handle)
+
+def cached_predict(features: np.ndarray, handle: ModelHandle, predict_fn=None) -> np.ndarray:
+    """
+    Predict feature rows, serving repeated rows from the prediction cache
+    
+    Only the rows that miss the cache are sent to `predict_fn` (default
+    model_predict), in one call.
+    """
+    predict_fn = predict_fn or model_predict
+    if not prediction_cache.enabled:
+        return predict_fn(features, handle)
+    
+    keys = [PredictionCache.key(row, handle.version) for row in features]
+    predictions = [None] * len(keys)
+    misses = []
+    for i, key in enumerate(keys):
+        value = prediction_cache.get(key)
+        if value is None:
+            misses.append(i)
+        else:
+            predictions[i] = value
+    
+    if misses:
+        predicted = predict_fn(features[misses], handle)
+        for i, value in zip(misses, predicted):
+            # A multi-output model's row is copied so the batch array can be freed
+            value = value.copy() if np.ndim(value) else float(value)
+            predictions[i] = value
+            prediction_cache.put(keys[i], value)
+    
+    return np.array(predictions)
+
+def wants_explanation(data: Dict[str, Any]) -> bool:
+    """Whether a request body opted in to per-vendor explanations with "explain": true"""
+    explain = data.get('explain')
+    return explain is True or (isinstance(explain, str) and explain.lower() == 'true')
+
+def explain_rows(features: np.ndarray, handle: ModelHandle) -> List[Dict[str, Any]]:
+    """
+    "explanation" response field for each feature row, computed on the prediction pool
+    
+    Each row's contributions add up with baseScore to its overall score.
+    A model that cannot be explained (no compiled engine, or an artifact
+    saved without node covers) still serves its scores; its rows get an
+    explanation carrying only the error.
+    """
+    try:
+        base_score, contributions = predict_executor.run(handle.explain, features)
+    except ValueError as e:
+        return [{'error': str(e)} for _ in range(len(features))]
+    base_score = round(base_score, 4)
+    return [
+        {
+            'baseScore': base_score,
+            'contributions': {name: round(value, 4) for name, value in zip(FEATURE_NAMES, row)}
+        }
+        for row in contributions.tolist()
+    ]
 
 def extract_features(vendor_data: Dict[str, Any]) -> np.ndarray:
     """
     Extract features from vendor data for model prediction
     
-    Expected vendor_data structure:
-    {
-        "internalRecords": [{"deliverySuccessRate": 95, "qualityScore": 90, ...}],
-        "externalReviews": [{"rating": 4.5, "sentiment": "positive"}],
-        "features": [{"certifications": [...], "yearsInBusiness": 10, "teamSize": 50}],
-        "risks": [{"riskLevel": "LOW", "severity": 2}]
-    }
+    Returns a (1, 11) feature row; see feature_extraction for the layout
+    and the expected vendor_data structure.
+    """
+    matrix, _, errors = vendor_feature_matrix([vendor_data])
+    if errors:
+        raise ValueError(errors[0])
+    return matrix
+
+def extract_feature_matrix(vendors: List[Dict[str, Any]]):
     """
+    Extract one feature matrix for a batch of vendors
     
-    # Initialize default values
-    features = {
-        'avg_delivery_rate': 0.0,
-        'avg_quality_score': 0.0,
-        'avg_cost_efficiency': 0.0,
-        'avg_compliance_score': 0.0,
-        'avg_rating': 0.0,
-        'positive_sentiment_ratio': 0.0,
-        'certification_count': 0,
-        'years_in_business': 0,
-        'team_size': 0,
-        'risk_level_numeric': 0.0,
-        'active_risk_count': 0
-    }
+    Returns the stacked feature rows, the index of each row in `vendors`,
+    and a dict mapping the index of every vendor that failed extraction
+    to its error message.
+    """
+    if all(type(vendor) is dict for vendor in vendors):
+        # The usual case: the decoded vendors go straight to the extractor
+        # and its row indices are already indices into `vendors`
+        return vendor_feature_matrix([vendor.get('data') for vendor in vendors])
+    
+    vendor_datas = []
+    data_index = []
+    errors = {}
+    
+    for i, vendor in enumerate(vendors):
+        try:
+            vendor_datas.append(vendor.get('data'))
+            data_index.append(i)
+        except Exception as e:
+            errors[i] = str(e)
     
-    # Process internal records
-    internal = vendor_data.get('internalRecords', [])
-    if internal:
-        features['avg_delivery_rate'] = np.mean([r.get('deliverySuccessRate', 0) for r in internal])
-        features['avg_quality_score'] = np.mean([r.get('qualityScore', 0) for r in internal])
-        features['avg_cost_efficiency'] = np.mean([r.get('costEfficiency', 0) for r in internal])
-        features['avg_compliance_score'] = np.mean([r.get('complianceScore', 0) for r in internal])
-    
-    # Process external reviews
-    reviews = vendor_data.get('externalReviews', [])
-    if reviews:
-        features['avg_rating'] = np.mean([r.get('rating', 0) for r in reviews])
-        sentiments = [r.get('sentiment') for r in reviews if r.get('sentiment')]
-        if sentiments:
-            features['positive_sentiment_ratio'] = sum(1 for s in sentiments if s == 'positive') / len(sentiments)
-    
-    # Process vendor features
-    vendor_features = vendor_data.get('features', [])
-    if vendor_features:
-        feat = vendor_features[0]  # Use first feature record
-        features['certification_count'] = len(feat.get('certifications', []))
-        features['years_in_business'] = feat.get('yearsInBusiness', 0) or 0
-        features['team_size'] = feat.get('teamSize', 0) or 0
-    
-    # Process risks
-    risks = vendor_data.get('risks', [])
-    if risks:
-        risk_map = {'LOW': 1, 'MEDIUM': 2, 'HIGH': 3, 'CRITICAL': 4}
-        risk_values = [risk_map.get(r.get('riskLevel', 'LOW'), 1) for r in risks]
-        features['risk_level_numeric'] = np.mean(risk_values)
-        features['active_risk_count'] = len([r for r in risks if r.get('status') == 'ACTIVE'])
-    
-    # Return as numpy array in the correct order
-    feature_array = np.array([
-        features['avg_delivery_rate'],
-        features['avg_quality_score'],
-        features['avg_cost_efficiency'],
-        features['avg_compliance_score'],
-        features['avg_rating'],
-        features['positive_sentiment_ratio'],
-        features['certification_count'],
-        features['years_in_business'],
-        features['team_size'],
-        features['risk_level_numeric'],
-        features['active_risk_count']
-    ]).reshape(1, -1)
-    
-    return feature_array
+    matrix, row_index, data_errors = vendor_feature_matrix(vendor_datas)
+    row_index = [data_index[j] for j in row_index]
+    errors.update({data_index[j]: message for j, message in data_errors.items()})
+    
+    return matrix, row_index, errors
+
+def _predict_chunks(matrix, row_index, handle, chunk_size, predictions, errors):
+    """Fill `predictions` chunk by chunk, falling back to single rows when a chunk fails"""
+    for start in range(0, len(row_index), chunk_size):
+        chunk = matrix[start:start + chunk_size]
+        chunk_index = row_index[start:start + chunk_size]
+        try:
+            predictions.update(zip(chunk_index, cached_predict(chunk, handle)))
+        except ServerOverloaded:
+            raise
+        except Exception:
+            for i, row in zip(chunk_index, chunk):
+                try:
+                    predictions[i] = cached_predict(row.reshape(1, -1), handle)[0]
+                except ServerOverloaded:
+                    raise
+                except Exception as e:
+                    errors[i] = str(e)
+
+def _vendor_keys(vendors, matrix, row_index):
+    """Routing key per feature row: the vendor id, or the row's bytes for a vendor without one"""
+    keys = []
+    for j, i in enumerate(row_index):
+        vendor_id = vendors[i].get('id') if isinstance(vendors[i], dict) else None
+        keys.append(matrix[j].tobytes() if vendor_id is None else vendor_id)
+    return keys
+
+def predict_batch(vendors: List[Dict[str, Any]], handle: ModelHandle,
+                  chunk_size: int = BATCH_CHUNK_SIZE, explain: bool = False) -> List[Dict[str, Any]]:
+    """
+    Score a batch of vendors with one model.predict call per chunk
+    
+    Errors are reported per vendor: a vendor whose data cannot be turned
+    into features fails on its own, and if a whole chunk fails to predict
+    its rows are retried one at a time so only the offending vendors fail.
+    
+    With model variants loaded, features are still extracted once: the
+    rows are split between the primary model and the A/B variants by
+    vendor hash, and the same rows are handed to the shadow scorer.
+    
+    With `explain`, every scored vendor also gets the "explanation" of
+    the model that served it, computed from the same feature rows.
+    """
+    with STAGE_SECONDS.labels('batch_predict', 'extract').time():
+        matrix, row_index, errors = extract_feature_matrix(vendors)
+    chunk_size = max(1, chunk_size)
+    
+    keys = buckets = None
+    groups = [(None, None)]
+    if variant_router:
+        keys = _vendor_keys(vendors, matrix, row_index)
+        buckets = variant_router.buckets(keys)
+        if variant_router.variants:
+            groups = variant_router.route(buckets)
+    
+    # Overall score and serving model per vendor index; each model's total
+    # column is taken at once and converted in one tolist()
+    totals = {}
+    served_by = {}
+    to_explain = []
+    with STAGE_SECONDS.labels('batch_predict', 'predict').time():
+        for variant, positions in groups:
+            group_handle = handle if variant is None else variant.handle
+            group_index = row_index if positions is None else [row_index[j] for j in positions]
+            group_matrix = matrix if positions is None else matrix[positions]
+            predictions = {}
+            _predict_chunks(group_matrix, group_index, group_handle, chunk_size, predictions, errors)
+            if explain and predictions:
+                scored = [j for j, i in enumerate(group_index) if i in predictions]
+                to_explain.append((group_handle, group_matrix[scored], [group_index[j] for j in scored]))
+            if predictions:
+                scores = group_handle.total_scores(list(predictions.values()))
+                totals.update(zip(predictions, scores.tolist()))
+            if variant_router.variants:
+                name = PRIMARY if variant is None else variant.name
+                served_by.update(dict.fromkeys(group_index, name))
+                VARIANT_VENDORS.labels(name).inc(len(predictions))
+    
+    # Explanations for the scored vendors, a few rows per job on the prediction pool
+    explanations = {}
+    if to_explain:
+        with STAGE_SECONDS.labels('batch_predict', 'explain').time():
+            for group_handle, group_matrix, group_index in to_explain:
+                for start in range(0, len(group_index), EXPLAIN_CHUNK_SIZE):
+                    explained = explain_rows(group_matrix[start:start + EXPLAIN_CHUNK_SIZE], group_handle)
+                    explanations.update(zip(group_index[start:start + EXPLAIN_CHUNK_SIZE], explained))
+    
+    if shadow_scorer is not None and row_index:
+        served = np.array([totals.get(i, np.nan) for i in row_index])
+        shadow_scorer.submit(
+            matrix, keys, buckets, served, [served_by.get(i, PRIMARY) for i in row_index], 'batch_predict'
+        )
+    
+    results = []
+    for i, vendor in enumerate(vendors):
+        vendor_id = vendor.get('id') if isinstance(vendor, dict) else None
+        if i in totals:
+            result = {
+                'vendorId': vendor_id,
+                'totalScore': round(totals[i], 2),
+                'success': True
+            }
+            if served_by:
+                result['modelVariant'] = served_by[i]
+            if i in explanations:
+                result['explanation'] = explanations[i]
+            results.append(result)
+        else:
+            results.append({
+                'vendorId': vendor_id,
+                'error': errors.get(i, 'Prediction failed'),
+                'success': False
+            })
+    
+    return results
+
+@app.before_request
+def ensure_model_watcher():
+    """Watch for new models in this process, which may be a worker forked after startup"""
+    registry.start_watching()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    profiler.begin_request()
+
+@app.after_request
+def record_request(response):
+    """Count the request and observe its latency, labeled by endpoint"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        duration = time.perf_counter() - start
+        endpoint = request.endpoint or 'unmatched'
+        REQUESTS.labels(endpoint, response.status_code).inc()
+        REQUEST_SECONDS.labels(endpoint).observe(duration)
+        profiler.end_request(duration)
+    return response
+
+@app.errorhandler(ServerOverloaded)
+def handle_overloaded(e):
+    """Reject work when the prediction queue is full"""
+    response = json_response({'error': str(e)}, 503)
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    handle = registry.active
     return jsonify({
         'status': 'healthy',
-        'model_loaded': model is not None
+        'model_loaded': handle is not None,
+        'model_version': handle.version if handle else None,
+        'registry': registry.stats(),
+        'cache': prediction_cache.stats(),
+        'executor': predict_executor.stats(),
+        'sharding': shard_pool.stats() if shard_pool else None,
+        'microbatch': micro_batcher.stats() if micro_batcher else None,
+        'variants': {variant.name: variant.traffic for variant in variant_router.variants},
+        'shadow': shadow_scorer.stats() if shadow_scorer else None
     }), 200
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint for this worker's metrics"""
+    return Response(metrics_registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+def profiler_status():
+    """
+    Sampling profiler control; registered only when PROFILER_CONTROL=true
+    
+    GET returns the collapsed stacks of slow requests as text, or the
+    profiler's settings and counters with ?format=json. POST takes
+    {"enabled": bool, "interval_ms": float, "slow_ms": float, "reset": bool}.
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        if body.get('reset'):
+            profiler.reset()
+        if body.get('enabled') is False:
+            profiler.stop()
+        elif body.get('enabled') or 'interval_ms' in body or 'slow_ms' in body:
+            interval = body.get('interval_ms')
+            slow = body.get('slow_ms')
+            profiler.start(
+                interval=None if interval is None else float(interval) / 1000.0,
+                slow_threshold=None if slow is None else float(slow) / 1000.0
+            )
+        return jsonify(profiler.stats()), 200
+    
+    if request.args.get('format') == 'json':
+        return jsonify(profiler.stats()), 200
+    return Response(profiler.collapsed(), content_type='text/plain; charset=utf-8')
+
+if PROFILER_CONTROL:
+    app.add_url_rule('/debug/profiler', view_func=profiler_status, methods=['GET', 'POST'])
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """
@@ -121,6 +618,7 @@ def predict():
     
     Request body:
     {
+        "vendorId": "v1",
         "vendorData": {
             "internalRecords": [...],
             "externalReviews": [...],
@@ -129,6 +627,14 @@ def predict():
         }
     }
     
+    vendorId is optional; with A/B variants loaded it decides which model
+    serves the vendor (the features decide when it is missing) and the
+    response names that model in "modelVariant".
+    
+    With "explain": true the response also has an "explanation": the
+    model's base score and each feature's contribution to totalScore,
+    which add up to it (exact TreeSHAP values).
+    
     Response:
     {
         "totalScore": 85.5,
@@ -142,50 +648,82 @@ def predict():
     }
     """
     
-    if model is None:
-        return jsonify({'error': 'Model not loaded'}), 500
+    # Use one model for the whole request, even if a reload swaps it meanwhile
+    handle = registry.active
+    if handle is None:
+        return json_response({'error': 'Model not loaded'}, 500)
     
     try:
-        data = request.json
+        with STAGE_SECONDS.labels('predict', 'parse').time():
+            data = request_json()
         vendor_data = data.get('vendorData')
         
         if not vendor_data:
-            return jsonify({'error': 'vendorData is required'}), 400
+            return json_response({'error': 'vendorData is required'}, 400)
         
         # Extract features
-        features = extract_features(vendor_data)
+        with STAGE_SECONDS.labels('predict', 'extract').time():
+            features = extract_features(vendor_data)
+        
+        # Route to an A/B variant by vendor hash
+        served_by = PRIMARY
+        if variant_router:
+            key = data.get('vendorId')
+            key = features[0].tobytes() if key is None else key
+            buckets = variant_router.buckets([key])
+            variant = variant_router.route(buckets)[0][0]
+            if variant is not None:
+                handle = variant.handle
+                served_by = variant.name
         
         # Make prediction
-        prediction = model.predict(features)[0]
+        with STAGE_SECONDS.labels('predict', 'predict').time():
+            prediction = cached_predict(features, handle, predict_fn=coalesced_predict)[0]
         
         # Get prediction confidence if available
         confidence = 0.85  # Default confidence
-        if hasattr(model, 'predict_proba'):
-            proba = model.predict_proba(features)
+        if hasattr(handle.model, 'predict_proba'):
+            proba = handle.model.predict_proba(features)
             confidence = float(np.max(proba))
         
-        # Calculate component scores (if model supports it)
-        # For now, derive from total score with some variation
-        total_score = float(prediction)
+        total_score = handle.total_score(prediction)
         
-        # Simulate component scores based on total score
-        # In production, these would come from a multi-output model
-        response = {
-            'totalScore': round(total_score, 2),
-            'reliabilityScore': round(total_score * 1.05, 2),
-            'costScore': round(total_score * 0.95, 2),
-            'capabilityScore': round(total_score * 1.02, 2),
-            'performanceScore': round(total_score * 1.08, 2),
-            'reputationScore': round(total_score * 0.98, 2),
-            'riskScore': round((100 - total_score) * 0.3, 2),
-            'confidence': round(confidence, 3),
-            'modelVersion': '1.0.0'
-        }
+        if handle.outputs:
+            # A multi-output model predicts every component score in the
+            # same tree traversal as the total
+            response = {
+                f'{name}Score': round(float(value), 2) for name, value in zip(handle.outputs, prediction)
+            }
+        else:
+            # Single-output model: derive component scores from the total
+            response = {
+                'totalScore': round(total_score, 2),
+                'reliabilityScore': round(total_score * 1.05, 2),
+                'costScore': round(total_score * 0.95, 2),
+                'capabilityScore': round(total_score * 1.02, 2),
+                'performanceScore': round(total_score * 1.08, 2),
+                'reputationScore': round(total_score * 0.98, 2),
+                'riskScore': round((100 - total_score) * 0.3, 2),
+            }
+        response['confidence'] = round(confidence, 3)
+        response['modelVersion'] = '1.0.0'
+        if variant_router.variants:
+            response['modelVariant'] = served_by
+            VARIANT_VENDORS.labels(served_by).inc()
+        if shadow_scorer is not None:
+            shadow_scorer.submit(features, [key], buckets, np.array([total_score]), [served_by], 'predict')
+        if wants_explanation(data):
+            with STAGE_SECONDS.labels('predict', 'explain').time():
+                response['explanation'] = explain_rows(features, handle)[0]
         
-        return jsonify(response), 200
+        with STAGE_SECONDS.labels('predict', 'serialize').time():
+            body = json_response(response)
+        return body, 200
         
+    except ServerOverloaded:
+        raise
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @app.route('/batch-predict', methods=['POST'])
 def batch_predict():
@@ -197,50 +735,129 @@ def batch_predict():
         "vendors": [
             {"id": "v1", "data": {...}},
             {"id": "v2", "data": {...}}
-        ]
+        ],
+        "explain": false
     }
+    
+    "explain": true adds each scored vendor's "explanation", as for /predict.
     """
     
-    if model is None:
-        return jsonify({'error': 'Model not loaded'}), 500
+    handle = registry.active
+    if handle is None:
+        return json_response({'error': 'Model not loaded'}, 500)
     
     try:
-        data = request.json
+        with STAGE_SECONDS.labels('batch_predict', 'parse').time():
+            data = request_json()
         vendors = data.get('vendors', [])
         
         if not vendors:
-            return jsonify({'error': 'vendors array is required'}), 400
+            return json_response({'error': 'vendors array is required'}, 400)
         
-        results = []
-        for vendor in vendors:
-            vendor_id = vendor.get('id')
-            vendor_data = vendor.get('data')
-            
-            try:
-                features = extract_features(vendor_data)
-                prediction = model.predict(features)[0]
-                
-                results.append({
-                    'vendorId': vendor_id,
-                    'totalScore': round(float(prediction), 2),
-                    'success': True
-                })
-            except Exception as e:
-                results.append({
-                    'vendorId': vendor_id,
-                    'error': str(e),
-                    'success': False
-                })
+        BATCH_VENDORS.observe(len(vendors))
+        results = predict_batch(vendors, handle, chunk_size=BATCH_CHUNK_SIZE, explain=wants_explanation(data))
         
-        return jsonify({'results': results}), 200
+        with STAGE_SECONDS.labels('batch_predict', 'serialize').time():
+            body = json_response({'results': results})
+        return body, 200
         
+    except ServerOverloaded:
+        raise
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
+
+def read_ndjson(stream, max_line_bytes=STREAM_MAX_LINE_BYTES):
+    """
+    Yield (line_number, record, error) for every non-blank line of an NDJSON stream
+    
+    Lines are read one at a time, so memory is bounded by the longest
+    accepted line; longer lines are skipped and reported as errors.
+    """
+    line_number = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        line_number += 1
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line_bytes + 1)
+            yield line_number, None, f'Line longer than {max_line_bytes} bytes'
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield line_number, codec.loads(line), None
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+
+def _score_stream_chunk(chunk, handle):
+    """NDJSON result lines for a chunk of (line_number, record, error), in input order"""
+    vendors = [record for _, record, error in chunk if error is None]
+    for attempt in range(STREAM_OVERLOAD_RETRIES + 1):
+        try:
+            scored = iter(predict_batch(vendors, handle, chunk_size=BATCH_CHUNK_SIZE))
+            break
+        except ServerOverloaded as e:
+            if attempt == STREAM_OVERLOAD_RETRIES:
+                scored = iter([{'vendorId': None, 'error': str(e), 'success': False}] * len(vendors))
+            else:
+                # Holding the stream here stops reading input until the pool has room
+                time.sleep(e.retry_after)
+    
+    lines = []
+    for line_number, record, error in chunk:
+        if error is None:
+            result = next(scored)
+        else:
+            result = {'vendorId': None, 'error': error, 'success': False}
+        result['line'] = line_number
+        lines.append(codec.dumps(result))
+    return b'\n'.join(lines) + b'\n'
+
+@app.route('/batch-predict/stream', methods=['POST'])
+def batch_predict_stream():
+    """
+    Score newline-delimited vendors, streaming newline-delimited results
+    
+    Request body (application/x-ndjson), one vendor per line:
+        {"id": "v1", "data": {...}}
+        {"id": "v2", "data": {...}}
+    
+    Response (application/x-ndjson), one result per non-blank input line
+    in input order, written as each chunk of STREAM_CHUNK_SIZE vendors is
+    scored:
+        {"vendorId": "v1", "totalScore": 85.5, "success": true, "line": 1}
+        {"vendorId": null, "error": "Invalid JSON: ...", "success": false, "line": 2}
+    
+    Input is read only as fast as results are written, so a worker holds
+    one chunk of vendors at a time and a slow client slows down the
+    reading. Clients sending large bodies must therefore read the
+    response while still sending (as `curl -T -` does). Request metrics
+    record the time to the start of the stream.
+    """
+    
+    handle = registry.active
+    if handle is None:
+        return json_response({'error': 'Model not loaded'}, 500)
+    
+    def generate(stream):
+        chunk = []
+        for entry in read_ndjson(stream):
+            chunk.append(entry)
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield _score_stream_chunk(chunk, handle)
+                chunk = []
+        if chunk:
+            yield _score_stream_chunk(chunk, handle)
+    
+    return Response(stream_with_context(generate(request.stream)), content_type='application/x-ndjson')
 
 if __name__ == '__main__':
     # Load model on startup
     if not load_model():
         print("Warning: Running without model. /predict endpoint will fail.")
+    registry.start_watching()
     
     # Run the server
     port = int(os.getenv('PORT', 5000))
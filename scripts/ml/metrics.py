@@ -0,0 +1,179 @@
+"""
+Lightweight in-process metrics for the inference API
+Histograms and counters with optional labels, rendered in the Prometheus
+text exposition format by MetricsRegistry
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Request and stage latencies, in seconds
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class Histogram:
+    """
+    Fixed-bucket histogram
+
+    `buckets` are inclusive upper bounds; values above the last bound land
+    in an implicit +Inf bucket. Snapshots report cumulative counts per
+    bound, the same convention Prometheus uses.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        """Observe the wall-clock seconds spent in the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets + ['+Inf'], counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {'buckets': cumulative, 'count': running, 'sum': total}
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+class MetricFamily:
+    """
+    A named metric with one child per combination of label values
+
+    labels(*values) returns the child Histogram or Counter for those
+    values, creating it on first use; an unlabeled family has a single
+    child reached with labels().
+    """
+
+    def __init__(self, name, help_text, kind, labelnames=(), factory=None):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}, got {values}')
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def adopt(self, child, *values):
+        """Expose an existing Histogram or Counter under these label values"""
+        with self._lock:
+            self._children[tuple(str(value) for value in values)] = child
+
+    def _label_text(self, values, extra=None):
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            if self.kind == 'histogram':
+                snapshot = child.snapshot()
+                for bound, count in snapshot['buckets'].items():
+                    lines.append(f'{self.name}_bucket{self._label_text(values, ("le", bound))} {count}')
+                lines.append(f'{self.name}_sum{self._label_text(values)} {snapshot["sum"]}')
+                lines.append(f'{self.name}_count{self._label_text(values)} {snapshot["count"]}')
+            else:
+                lines.append(f'{self.name}{self._label_text(values)} {child.value}')
+        return lines
+
+class CallbackMetric:
+    """A gauge or counter whose value is read from `fn` at scrape time"""
+
+    def __init__(self, name, help_text, kind, fn):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.fn = fn
+
+    def render(self):
+        try:
+            value = float(self.fn())
+        except Exception:
+            return []
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}', f'{self.name} {value}']
+
+class MetricsRegistry:
+    """
+    The metrics exposed on /metrics
+
+    Recording is a dict lookup plus a locked increment, so instrumenting
+    the hot path costs a few microseconds per request. Every gunicorn
+    worker has its own registry; a scrape sees the worker that served it.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(MetricFamily(name, help_text, 'counter', labelnames, Counter))
+
+    def histogram(self, name, help_text, buckets, labelnames=()):
+        return self._add(MetricFamily(name, help_text, 'histogram', labelnames, lambda: Histogram(buckets)))
+
+    def gauge_callback(self, name, help_text, fn):
+        return self._add(CallbackMetric(name, help_text, 'gauge', fn))
+
+    def counter_callback(self, name, help_text, fn):
+        return self._add(CallbackMetric(name, help_text, 'counter', fn))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
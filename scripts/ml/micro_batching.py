@@ -0,0 +1,164 @@
+"""
+Dynamic micro-batching for single-row predictions
+Coalesces concurrent /predict calls into one model call on a shared matrix
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import Histogram
+from serving import ServerOverloaded
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+QUEUE_WAIT_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1]
+
+def _settle(futures, batch_future):
+    """Give every row's Future its row of the batch result, or the batch's exception"""
+    error = batch_future.exception()
+    if error is not None:
+        for future in futures:
+            future.set_exception(error)
+        return
+    for future, prediction in zip(futures, batch_future.result()):
+        future.set_result(prediction)
+
+class MicroBatcher:
+    """
+    Request coalescer in front of a batch predict function
+
+    Callers submit one feature row and get a Future. A background thread
+    flushes the queue as a single matrix once it holds `max_batch_size`
+    rows or the oldest row has waited `max_wait_ms` and hands it to
+    submit_fn(matrix, key), which schedules the predict (on the API's
+    prediction pool) and returns a Future. The thread goes back to
+    collecting right away; when the batch's Future is done each caller
+    gets its own row of the result. Rows beyond `max_queue` are rejected
+    with ServerOverloaded, and a row whose Future was cancelled before
+    its batch was flushed is left out of it.
+
+    Each row carries a key that is passed to submit_fn, and a batch only
+    holds rows with the same key. The API uses the model handle as the
+    key, so rows queued before a model swap are still predicted by the
+    model their request started with.
+
+    The flush thread starts on the first submit, so a batcher created at
+    import time is safe to fork with gunicorn's preload_app.
+    """
+
+    def __init__(self, submit_fn, max_batch_size=64, max_wait_ms=2.0, max_queue=1024):
+        self.submit_fn = submit_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_waits = Histogram(QUEUE_WAIT_BUCKETS)
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, row, key=None):
+        """Queue one feature row and return a Future for its prediction"""
+        future = Future()
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                raise ServerOverloaded()
+            self._ensure_thread()
+            self._queue.append((np.asarray(row, dtype=np.float64), key, future, time.perf_counter()))
+            if len(self._queue) == 1 or len(self._queue) >= self.max_batch_size:
+                self._cond.notify()
+        return future
+
+    def predict(self, features, key=None):
+        """
+        Predict a (n, n_features) matrix row by row through the queue
+
+        If the queue fills up part way through, the rows already queued
+        are withdrawn before ServerOverloaded is raised.
+        """
+        futures = []
+        try:
+            for row in features:
+                futures.append(self.submit(row, key))
+        except ServerOverloaded:
+            self._withdraw(futures)
+            raise
+        return np.array([future.result() for future in futures])
+
+    def _withdraw(self, futures):
+        """Drop the rows of `futures` that are still queued and cancel them"""
+        withdrawn = set(futures)
+        with self._cond:
+            self._queue = deque(item for item in self._queue if item[2] not in withdrawn)
+        for future in futures:
+            # A row already flushed cannot be cancelled; its result is just not read
+            future.cancel()
+
+    def _ensure_thread(self):
+        # A thread started before a fork does not exist in the child
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._thread.start()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = self._queue[0][3] + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # Take the oldest row's key and every queued row sharing it
+            key = self._queue[0][1]
+            batch = []
+            rest = deque()
+            while self._queue:
+                item = self._queue.popleft()
+                if item[1] is key and len(batch) < self.max_batch_size:
+                    batch.append(item)
+                else:
+                    rest.append(item)
+            self._queue = rest
+            return key, batch
+
+    def _run(self):
+        while True:
+            key, batch = self._next_batch()
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            flushed_at = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+            for _, _, _, enqueued_at in batch:
+                self.queue_waits.observe(flushed_at - enqueued_at)
+
+            futures = [future for _, _, future, _ in batch]
+            try:
+                batch_future = self.submit_fn(np.vstack([row for row, _, _, _ in batch]), key)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            batch_future.add_done_callback(functools.partial(_settle, futures))
+
+    def stats(self):
+        """Configuration, queue depth and histograms for the /health endpoint"""
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queued': queued,
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_wait_seconds': self.queue_waits.snapshot(),
+        }
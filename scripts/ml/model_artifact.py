@@ -0,0 +1,150 @@
+"""
+Memory-mapped model artifacts
+Stores a compiled tree ensemble as a JSON header followed by contiguous
+binary arrays, so worker processes can np.memmap the file and share its
+page-cache pages instead of each unpickling a private copy of the model
+"""
+
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+from compact_model import CompactEnsemble
+from tree_engine import CompiledEnsemble
+
+ARTIFACT_MAGIC = b'VSMODEL\x00'
+ARTIFACT_FORMAT_VERSION = 1
+# Array offsets are aligned so memory-mapped views are aligned for any dtype
+ARRAY_ALIGNMENT = 64
+
+class ArtifactError(Exception):
+    """Raised when a model artifact is malformed or fails verification"""
+
+def _aligned(offset):
+    return (offset + ARRAY_ALIGNMENT - 1) // ARRAY_ALIGNMENT * ARRAY_ALIGNMENT
+
+def _data_start(header_len):
+    return _aligned(len(ARTIFACT_MAGIC) + 8 + header_len)
+
+def file_sha256(path):
+    """SHA-256 of a file, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def save_artifact(ensemble, path, model_version):
+    """
+    Write a compiled ensemble to `path`
+
+    Layout: 8-byte magic, little-endian uint64 header length, JSON header,
+    then the data section starting at the next 64-byte boundary. Each array
+    sits at the 64-byte aligned offset into the data section recorded in
+    the header.
+
+    Returns the artifact description stored in model_metadata.json.
+    """
+    params, arrays = ensemble.to_state()
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _aligned(offset)
+        layout[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+        }
+        offset += array.nbytes
+
+    header = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'model_version': model_version,
+        'params': params,
+        'arrays': layout,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _data_start(len(header_bytes))
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(ARTIFACT_MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.write(b'\x00' * (data_start + layout[name]['offset'] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+    return {
+        'path': os.path.basename(path),
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'model_version': model_version,
+        'sha256': file_sha256(path),
+        'size_bytes': os.path.getsize(path),
+    }
+
+def read_header(path):
+    """Read and validate the JSON header of an artifact"""
+    with open(path, 'rb') as f:
+        magic = f.read(len(ARTIFACT_MAGIC))
+        if magic != ARTIFACT_MAGIC:
+            raise ArtifactError(f'{path} is not a model artifact')
+        (header_len,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_len).decode('utf-8'))
+    header['data_start'] = _data_start(header_len)
+
+    if header.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported artifact format version {header.get('format_version')}")
+    return header
+
+def load_artifact(path, metadata_path=None, verify=True, metadata_key='artifact'):
+    """
+    Memory-map an artifact and return the ensemble backed by it
+
+    The node arrays are read-only views into one np.memmap of the file,
+    so nothing is copied. When `metadata_path` is given, the file checksum
+    and model version are checked against its `metadata_key` entry
+    ('artifact' from save_model(), 'compact_artifact' from
+    compact_model.compact_artifact()); `verify=False` skips the checksum
+    for a faster start. Compact artifacts load as a CompactEnsemble.
+    """
+    header = read_header(path)
+
+    if metadata_path is not None:
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        expected = metadata.get(metadata_key)
+        if not expected:
+            raise ArtifactError(f'{metadata_path} has no {metadata_key} entry')
+        if header['model_version'] != metadata.get('version'):
+            raise ArtifactError(
+                f"Artifact version {header['model_version']} does not match "
+                f"metadata version {metadata.get('version')}"
+            )
+        if verify and file_sha256(path) != expected['sha256']:
+            raise ArtifactError(f'Checksum mismatch for {path}')
+
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        offset = header['data_start'] + spec['offset']
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        arrays[name] = (
+            buffer[offset:offset + count * dtype.itemsize]
+            .view(dtype)
+            .reshape(spec['shape'])
+        )
+
+    if header['params'].get('engine') == 'compact':
+        ensemble = CompactEnsemble.from_state(header['params'], arrays)
+    else:
+        ensemble = CompiledEnsemble.from_state(header['params'], arrays)
+    ensemble.model_version = header['model_version']
+    return ensemble
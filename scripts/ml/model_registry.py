@@ -0,0 +1,323 @@
+"""
+Model registry with hot reload
+Watches the model files written by save_model(), loads and warms a new
+model in the background, checks it on canary inputs and swaps it in
+atomically while in-flight requests finish on the model they started with
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+from model_artifact import load_artifact
+from tree_engine import compile_model
+from tree_explainer import TreeExplainer
+
+def model_fingerprint(version, source):
+    """
+    `version` plus the inode, mtime and size of the file the model was loaded from
+
+    Saved models can keep their version (the artifact's is fixed by
+    train_model.MODEL_VERSION), so the file is what tells a reloaded model
+    from the one it replaces. Artifacts are replaced by a rename, which
+    gives every save a new inode even within one mtime tick.
+    """
+    try:
+        stat = os.stat(source)
+    except (OSError, TypeError):
+        return version
+    return f'{version}@{stat.st_ino}:{stat.st_mtime_ns}:{stat.st_size}'
+
+class ModelHandle:
+    """
+    A loaded model plus its compiled engine and version
+
+    `outputs` names the columns of a multi-output model, one of them
+    'total'; it is None for a model that predicts the overall score only.
+    `loader` is an optional (function, args) pair that loads the same
+    model again in another process; it gives the handle a `spec` for
+    sharded_predict.ShardPool, keyed on the handle's `fingerprint`.
+    """
+
+    def __init__(self, model, version, engine=None, source=None, outputs=None, loader=None):
+        self.model = model
+        self.engine = engine
+        self.version = version
+        self.source = source
+        self.outputs = list(outputs) if outputs else None
+        self.total_index = self.outputs.index('total') if self.outputs else None
+        self.loaded_at = datetime.now().isoformat()
+        self.fingerprint = model_fingerprint(version, source)
+        self.spec = (loader[0], tuple(loader[1]), 'predict', self.fingerprint) if loader else None
+        self._explainer = None
+        self._explainer_lock = threading.Lock()
+
+    def predict(self, features):
+        """Predict with the compiled engine, or sklearn if the model could not be compiled"""
+        if self.engine is not None:
+            return self.engine.predict(features)
+        return self.model.predict(features)
+
+    def total_score(self, prediction):
+        """Overall score from one row of predict() output"""
+        if self.total_index is None:
+            return float(prediction)
+        return float(prediction[self.total_index])
+
+    def total_scores(self, predictions):
+        """Overall scores, one per row, from a whole predict() output"""
+        predictions = np.asarray(predictions, dtype=np.float64)
+        if self.total_index is None:
+            return predictions.reshape(-1)
+        return predictions[:, self.total_index]
+
+    def explain(self, features):
+        """
+        (base score, per-feature contributions) for the overall score of each row
+
+        The contributions of a row add up with the base score to its overall
+        score. The TreeExplainer is built on the first call and kept for the
+        life of the handle.
+        """
+        if self._explainer is None:
+            with self._explainer_lock:
+                if self._explainer is None:
+                    if self.engine is None:
+                        raise ValueError('Explanations need a compiled model')
+                    self._explainer = TreeExplainer(self.engine, output=self.total_index or 0)
+        return self._explainer.expected_value, self._explainer.shap_values(features)
+
+def _pickle_version(model_path, metadata_path):
+    """Model version for a pickle: the metadata version plus the file's mtime"""
+    version = 'unknown'
+    try:
+        with open(metadata_path) as f:
+            version = json.load(f).get('version', version)
+    except (OSError, ValueError):
+        pass
+    return f"{version}@{os.path.getmtime(model_path):.0f}"
+
+def _model_outputs(n_outputs, metadata_path):
+    """Output names of a multi-output model from the metadata; None for a single output"""
+    if n_outputs == 1:
+        return None
+    outputs = None
+    try:
+        with open(metadata_path) as f:
+            outputs = json.load(f).get('outputs')
+    except (OSError, ValueError):
+        pass
+    if not outputs or len(outputs) != n_outputs or 'total' not in outputs:
+        raise ValueError(f"Model has {n_outputs} outputs but {metadata_path} does not name them, including 'total'")
+    return outputs
+
+def load_model_handle(model_path, artifact_path, metadata_path, compact_path=None, verify=True):
+    """
+    Load the memory-mapped artifact, or the pickle if the artifact is missing or invalid
+
+    A compact artifact, when one is given and exists, comes before both.
+    `verify` checks artifacts against their metadata checksums. The handle's
+    loader is this function, so shard workers can load the model without
+    importing the API.
+    """
+    loader = (load_model_handle, (model_path, artifact_path, metadata_path, compact_path, verify))
+    if compact_path and os.path.exists(compact_path):
+        try:
+            engine = load_artifact(compact_path, metadata_path=metadata_path, verify=verify,
+                                   metadata_key='compact_artifact')
+            print(f"✓ Compact {engine.mode} model {engine.model_version} memory-mapped from {compact_path}")
+            return ModelHandle(engine, engine.model_version, engine=engine, source=compact_path,
+                               outputs=_model_outputs(engine.n_outputs, metadata_path), loader=loader)
+        except Exception as e:
+            print(f"✗ Failed to load compact model, falling back to {artifact_path}: {e}")
+
+    if os.path.exists(artifact_path):
+        try:
+            engine = load_artifact(artifact_path, metadata_path=metadata_path, verify=verify)
+            print(f"✓ Model artifact {engine.model_version} memory-mapped from {artifact_path}")
+            return ModelHandle(engine, engine.model_version, engine=engine, source=artifact_path,
+                               outputs=_model_outputs(engine.n_outputs, metadata_path), loader=loader)
+        except Exception as e:
+            print(f"✗ Failed to load model artifact, falling back to {model_path}: {e}")
+
+    model = joblib.load(model_path)
+    engine = compile_model(model)
+    print(f"✓ Model loaded successfully from {model_path}")
+    if engine is not None:
+        print(f"  Compiled {engine.n_trees} trees for fast inference")
+    outputs = _model_outputs(getattr(model, 'n_outputs_', 1), metadata_path)
+    return ModelHandle(model, _pickle_version(model_path, metadata_path), engine=engine, source=model_path,
+                       outputs=outputs, loader=loader)
+
+class CanaryCheckFailed(Exception):
+    """Raised when a candidate model gives unusable predictions on the canary set"""
+
+class ModelRegistry:
+    """
+    Holds the active ModelHandle and replaces it when the model files change
+
+    Request handlers read `registry.active` once and use that handle for
+    the whole request, so a swap never changes the model under a request
+    that is already running; the old handle is released once the last such
+    request drops it.
+
+    A change is picked up once the watched files' (mtime, size) signature
+    has been identical for two consecutive polls, so a model that is still
+    being written is not loaded half-way.
+    """
+
+    def __init__(self, loader, watch_paths=(), canary_features=None, score_range=(0.0, 100.0),
+                 poll_interval=30.0, on_swap=None):
+        self.loader = loader
+        self.watch_paths = list(watch_paths)
+        self.canary_features = canary_features
+        self.score_range = score_range
+        self.poll_interval = poll_interval
+        self.on_swap = on_swap
+        self.active = None
+        self.pending_version = None
+        self.last_error = None
+        self.reloads = 0
+        self.rejected = 0
+        self._active_signature = None
+        self._candidate_signature = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._watch_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _signature(self):
+        signature = []
+        for path in self.watch_paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def check_canary(self, handle):
+        """Warm the candidate on the canary rows and reject unusable predictions"""
+        if self.canary_features is None or len(self.canary_features) == 0:
+            return
+        # The first call pages in memory-mapped arrays and warms caches
+        handle.predict(self.canary_features)
+        predictions = np.asarray(handle.predict(self.canary_features), dtype=np.float64)
+
+        if predictions.shape[0] != len(self.canary_features):
+            raise CanaryCheckFailed(f'Expected {len(self.canary_features)} canary predictions, got {predictions.shape}')
+        if not np.all(np.isfinite(predictions)):
+            raise CanaryCheckFailed('Canary predictions contain NaN or infinity')
+        low, high = self.score_range
+        if predictions.min() < low or predictions.max() > high:
+            raise CanaryCheckFailed(
+                f'Canary predictions {predictions.min():.2f}..{predictions.max():.2f} '
+                f'outside [{low}, {high}]'
+            )
+
+    def activate(self, handle):
+        """Atomically make `handle` the model used by new requests"""
+        with self._lock:
+            self.active = handle
+        if self.on_swap is not None:
+            self.on_swap(handle)
+
+    def load_now(self):
+        """Load, check and activate the model synchronously; raises on failure"""
+        signature = self._signature()
+        handle = self.loader()
+        self.check_canary(handle)
+        self.activate(handle)
+        self._active_signature = signature
+        self._candidate_signature = None
+        return handle
+
+    def check_for_update(self):
+        """
+        One watcher step: reload if the files changed and have settled
+
+        Returns True when a new model was swapped in.
+        """
+        signature = self._signature()
+        if signature == self._active_signature:
+            self._candidate_signature = None
+            return False
+        if signature != self._candidate_signature:
+            # Changed since the last poll; wait for the writer to finish
+            self._candidate_signature = signature
+            return False
+
+        self.pending_version = 'loading'
+        try:
+            handle = self.loader()
+            self.pending_version = handle.version
+            self.check_canary(handle)
+        except Exception as e:
+            self.rejected += 1
+            self.last_error = f'{type(e).__name__}: {e}'
+            print(f"✗ Model reload rejected: {self.last_error}")
+            # Do not retry the same files; a new write changes the signature
+            self._active_signature = signature
+            return False
+        finally:
+            self.pending_version = None
+
+        previous = self.active.version if self.active else None
+        self.activate(handle)
+        self._active_signature = signature
+        self._candidate_signature = None
+        self.reloads += 1
+        self.last_error = None
+        print(f"✓ Model reloaded: {previous} -> {handle.version}")
+        return True
+
+    def start_watching(self):
+        """
+        Start the background watcher thread (once per process)
+
+        Cheap enough to call on every request: a process forked from one
+        that was already watching, like a gunicorn worker of a preloading
+        master, gets no copy of the thread and starts its own here.
+        """
+        if self.poll_interval <= 0:
+            return
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._watch_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check_for_update()
+            except Exception as e:
+                self.last_error = f'{type(e).__name__}: {e}'
+
+    def stats(self):
+        """Active and pending versions for the /health endpoint"""
+        active = self.active
+        return {
+            'active_version': active.version if active else None,
+            'active_source': active.source if active else None,
+            'loaded_at': active.loaded_at if active else None,
+            'pending_version': self.pending_version,
+            'reloads': self.reloads,
+            'rejected': self.rejected,
+            'last_error': self.last_error,
+            'watching': self._thread is not None and self._thread.is_alive(),
+            'poll_interval_seconds': self.poll_interval,
+        }
@@ -0,0 +1,411 @@
+"""
+Parallel model selection for vendor scoring training
+Fits the candidate models and their cross-validation folds as independent
+tasks on a process pool that reads the scaled training data from
+memory-mapped .npy files instead of receiving a pickled copy, and tunes
+the candidates' hyperparameters by successive halving on the same files
+"""
+
+import math
+import os
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold
+
+CV_FOLDS = 5
+SHARED_ARRAYS = ('X_train', 'y_train', 'X_test', 'y_test')
+# CV fold of every training row, written once next to the shared arrays
+FOLD_IDS = 'fold_ids'
+
+# Values sampled for each candidate in successive_halving(); the tree
+# count is the budget that the halving rounds grow, not a searched value
+SEARCH_SPACES = {
+    'RandomForest': {
+        'max_depth': [8, 12, 15, 20, None],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4],
+        'max_features': [1.0, 0.6, 'sqrt'],
+    },
+    'ExtraTrees': {
+        'max_depth': [8, 12, 15, 20, None],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4],
+        'max_features': [1.0, 0.6, 'sqrt'],
+    },
+    'GradientBoosting': {
+        'max_depth': [3, 4, 5, 6],
+        'learning_rate': [0.05, 0.1, 0.2],
+        'subsample': [0.7, 0.85, 1.0],
+        'min_samples_leaf': [1, 5, 20],
+    },
+}
+SEARCH_RESOURCES = ('trees', 'rows')
+
+def default_candidates(multi_output=False):
+    """
+    The models train_model() chooses between
+
+    Each task fits one model, so the forests are single-threaded here and
+    the pool provides the parallelism. Gradient boosting holds out 10% of
+    its training rows and stops once 10 rounds pass without improvement.
+    It only predicts one output, so with `multi_output` the candidates are
+    the two forests, whose trees predict every output in one traversal.
+    """
+    forest_params = dict(
+        n_estimators=200,
+        max_depth=15,
+        min_samples_split=5,
+        min_samples_leaf=2,
+        random_state=42,
+        n_jobs=1
+    )
+    if multi_output:
+        return {
+            'RandomForest': RandomForestRegressor(**forest_params),
+            'ExtraTrees': ExtraTreesRegressor(**forest_params),
+        }
+    return {
+        'RandomForest': RandomForestRegressor(**forest_params),
+        'GradientBoosting': GradientBoostingRegressor(
+            n_estimators=150,
+            max_depth=5,
+            learning_rate=0.1,
+            validation_fraction=0.1,
+            n_iter_no_change=10,
+            random_state=42
+        ),
+    }
+
+def _cpu_seconds():
+    """User + system CPU of this process and its reaped children"""
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+def _load_shared(data_dir):
+    return {name: np.load(os.path.join(data_dir, f'{name}.npy'), mmap_mode='r') for name in SHARED_ARRAYS + (FOLD_IDS,)}
+
+@contextmanager
+def shared_training_data(X_train, y_train, X_test, y_test):
+    """
+    Write the scaled splits and the CV fold of each training row to a temporary directory
+
+    Yields the directory for select_model() and successive_halving(), so
+    a search followed by the final selection saves the arrays and splits
+    the folds once; the directory is removed on exit.
+    """
+    data_dir = tempfile.mkdtemp(prefix='model-selection-')
+    try:
+        for name, values in zip(SHARED_ARRAYS, (X_train, y_train, X_test, y_test)):
+            np.save(os.path.join(data_dir, f'{name}.npy'), np.ascontiguousarray(values, dtype=np.float64))
+        fold_ids = np.empty(len(X_train), dtype=np.int32)
+        for fold, (_, val_rows) in enumerate(KFold(n_splits=CV_FOLDS).split(X_train)):
+            fold_ids[val_rows] = fold
+        np.save(os.path.join(data_dir, f'{FOLD_IDS}.npy'), fold_ids)
+        yield data_dir
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def _fold_rows(data, fold):
+    """Training and validation rows of a cached CV fold, as KFold(CV_FOLDS).split() gives them"""
+    return np.flatnonzero(data[FOLD_IDS] != fold), np.flatnonzero(data[FOLD_IDS] == fold)
+
+def _run_task(data_dir, name, estimator, fold):
+    """
+    Fit one model in a worker
+
+    `fold` None fits on the whole training split and scores the test
+    split; otherwise fits fold `fold` of a KFold(CV_FOLDS) over the
+    training split, matching cross_val_score(cv=CV_FOLDS). For 2-D
+    targets the scores are those of the first output, the overall score,
+    and the holdout fit also reports R² per output.
+    """
+    data = _load_shared(data_dir)
+    start = time.perf_counter()
+
+    if fold is None:
+        model = clone(estimator).fit(data['X_train'], data['y_train'])
+        predictions = model.predict(data['X_test'])
+        y_test = np.asarray(data['y_test'])
+        result = {'model': model}
+        if y_test.ndim == 2:
+            result['output_r2'] = [float(r2_score(y_test[:, i], predictions[:, i])) for i in range(y_test.shape[1])]
+            y_test, predictions = y_test[:, 0], predictions[:, 0]
+        result.update({
+            'rmse': float(np.sqrt(mean_squared_error(y_test, predictions))),
+            'r2': float(r2_score(y_test, predictions)),
+            'mae': float(mean_absolute_error(y_test, predictions)),
+            'n_estimators': int(getattr(model, 'n_estimators_', getattr(model, 'n_estimators', 0))),
+        })
+    else:
+        train_rows, val_rows = _fold_rows(data, fold)
+        model = clone(estimator).fit(data['X_train'][train_rows], data['y_train'][train_rows])
+        y_val = data['y_train'][val_rows]
+        predictions = model.predict(data['X_train'][val_rows])
+        if y_val.ndim == 2:
+            y_val, predictions = y_val[:, 0], predictions[:, 0]
+        result = {'r2': float(r2_score(y_val, predictions))}
+
+    result.update({'name': name, 'fold': fold, 'fit_seconds': time.perf_counter() - start})
+    return result
+
+def _run_tasks(pool, fn, data_dir, tasks):
+    """fn(data_dir, *task) for every task, on the pool when there is one, in task order"""
+    if pool is None:
+        return [fn(data_dir, *task) for task in tasks]
+    futures = [pool.submit(fn, data_dir, *task) for task in tasks]
+    return [future.result() for future in futures]
+
+def select_model(X_train, y_train, X_test, y_test, candidates=None, max_workers=None, data_dir=None):
+    """
+    Fit the candidates and their CV folds concurrently and pick the best
+
+    The winner is the candidate with the highest holdout R², as before;
+    its model is the one fitted on the full training split. Workers load
+    the arrays from .npy memmaps in `data_dir`, written by
+    shared_training_data() (a temporary one when not given). Returns
+    (name, model, report) where report holds per-candidate scores and the
+    wall-clock / CPU figures of the run.
+    """
+    if data_dir is None:
+        with shared_training_data(X_train, y_train, X_test, y_test) as data_dir:
+            return select_model(X_train, y_train, X_test, y_test, candidates, max_workers, data_dir)
+
+    candidates = candidates or default_candidates(multi_output=np.ndim(y_train) == 2)
+    max_workers = max_workers or os.cpu_count() or 1
+    holdout_tasks = [(name, estimator, None) for name, estimator in candidates.items()]
+    # With enough workers, cross-validating every candidate alongside the
+    # holdout fits finishes sooner than waiting for a winner; with few
+    # workers the extra folds cost more than the barrier, so only the
+    # winner is cross-validated, as the sequential pipeline did
+    cv_all = max_workers >= 2 * len(candidates)
+
+    wall_start = time.perf_counter()
+    cpu_start = _cpu_seconds()
+    pool = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    try:
+        def run(tasks):
+            return _run_tasks(pool, _run_task, data_dir, tasks)
+
+        if cv_all:
+            tasks = holdout_tasks + [
+                (name, estimator, fold) for name, estimator in candidates.items() for fold in range(CV_FOLDS)
+            ]
+            results = run(tasks)
+        else:
+            results = run(holdout_tasks)
+            winner = max(results, key=lambda r: r['r2'])['name']
+            tasks = holdout_tasks + [(winner, candidates[winner], fold) for fold in range(CV_FOLDS)]
+            results += run(tasks[len(holdout_tasks):])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    wall_seconds = time.perf_counter() - wall_start
+    cpu_seconds = _cpu_seconds() - cpu_start
+
+    summary = {}
+    models = {}
+    for result in results:
+        entry = summary.setdefault(result['name'], {'cv_scores': [], 'fit_seconds': 0.0})
+        entry['fit_seconds'] += result['fit_seconds']
+        if result['fold'] is None:
+            models[result['name']] = result['model']
+            entry.update({key: result[key] for key in ('rmse', 'r2', 'mae', 'n_estimators', 'output_r2') if key in result})
+        else:
+            entry['cv_scores'].append(result['r2'])
+    for entry in summary.values():
+        scores = np.array(entry['cv_scores'])
+        entry['cv_mean'] = float(scores.mean()) if scores.size else None
+        entry['cv_std'] = float(scores.std()) if scores.size else None
+        entry['fit_seconds'] = round(entry['fit_seconds'], 3)
+
+    best_name = max(summary, key=lambda name: summary[name]['r2'])
+    n_cpus = os.cpu_count() or 1
+    report = {
+        'candidates': summary,
+        'workers': max_workers,
+        'tasks': len(tasks),
+        'cross_validated': 'all' if cv_all else 'winner',
+        'wall_seconds': round(wall_seconds, 3),
+        'cpu_seconds': round(cpu_seconds, 3),
+        'cpu_utilization': round(cpu_seconds / (wall_seconds * n_cpus), 3) if wall_seconds > 0 else 0.0,
+    }
+    return best_name, models[best_name], report
+
+def sample_configs(space, n_configs, rng):
+    """Up to `n_configs` distinct parameter dicts drawn uniformly from `space`"""
+    names = sorted(space)
+    n_configs = min(n_configs, math.prod(len(space[name]) for name in names))
+    seen = set()
+    configs = []
+    while len(configs) < n_configs:
+        choice = tuple(int(rng.integers(len(space[name]))) for name in names)
+        if choice not in seen:
+            seen.add(choice)
+            configs.append({name: space[name][i] for name, i in zip(names, choice)})
+    return configs
+
+def _run_search_task(data_dir, estimator, params, resource, budget, fold):
+    """
+    Fit one configuration on one cached CV fold and score it
+
+    `budget` is the number of trees for resource 'trees' and the number
+    of training rows of the fold for 'rows'; the row subsample is seeded
+    by the fold, so every configuration at a budget sees the same rows.
+    """
+    data = _load_shared(data_dir)
+    start = time.perf_counter()
+    train_rows, val_rows = _fold_rows(data, fold)
+    model = clone(estimator).set_params(**params)
+    if resource == 'trees':
+        model.set_params(n_estimators=budget)
+    elif budget < len(train_rows):
+        train_rows = np.sort(np.random.default_rng(fold).choice(train_rows, budget, replace=False))
+    model.fit(data['X_train'][train_rows], data['y_train'][train_rows])
+    y_val = data['y_train'][val_rows]
+    predictions = model.predict(data['X_train'][val_rows])
+    if y_val.ndim == 2:
+        y_val, predictions = y_val[:, 0], predictions[:, 0]
+    return {'r2': float(r2_score(y_val, predictions)), 'fit_seconds': time.perf_counter() - start}
+
+def successive_halving(X_train, y_train, candidates, n_configs=27, eta=3, resource='trees', min_budget=None,
+                       max_workers=None, seed=42, data_dir=None):
+    """
+    Tune each candidate's hyperparameters by successive halving
+
+    `n_configs` configurations per candidate are drawn from SEARCH_SPACES
+    and scored by mean R² over the cached CV folds with a small budget: a
+    fraction of the candidate's n_estimators (`resource` 'trees') or of
+    each fold's training rows ('rows'). After each round the best 1/eta
+    of every candidate's configurations move on to an eta times larger
+    budget, until the last survivors are scored at the full budget. Each
+    round's fits, for all candidates, run together on one process pool;
+    candidates without a search space are passed through as they are.
+
+    Returns (tuned, report): `tuned` maps each candidate name to an
+    unfitted estimator with its best configuration at the full budget,
+    ready for select_model(), and `report` holds every round, each
+    configuration's scores and the time-versus-accuracy figures.
+    """
+    if resource not in SEARCH_RESOURCES:
+        raise ValueError(f'Unknown search resource {resource!r}; expected one of {SEARCH_RESOURCES}')
+    if eta < 2:
+        raise ValueError(f'eta must be at least 2, got {eta}')
+    if data_dir is None:
+        with shared_training_data(X_train, y_train, X_train[:0], y_train[:0]) as data_dir:
+            return successive_halving(X_train, y_train, candidates, n_configs, eta, resource, min_budget,
+                                      max_workers, seed, data_dir)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    rng = np.random.default_rng(seed)
+    searched = {name: estimator for name, estimator in candidates.items() if name in SEARCH_SPACES}
+    configs = {
+        name: [{'params': params, 'rounds': []} for params in sample_configs(SEARCH_SPACES[name], n_configs, rng)]
+        for name in searched
+    }
+    # Rounds needed to narrow the largest candidate pool down to one configuration
+    largest = max((len(pool_configs) for pool_configs in configs.values()), default=1)
+    n_rounds = 1 + int(math.log(largest, eta) + 1e-9)
+    fold_rows = len(X_train) - int(math.ceil(len(X_train) / CV_FOLDS))
+
+    def budget(name, fraction):
+        if resource == 'trees':
+            full = searched[name].get_params()['n_estimators']
+            return min(full, max(min_budget or 10, int(round(full * fraction))))
+        return min(fold_rows, max(min_budget or 100, int(round(fold_rows * fraction))))
+
+    rounds = []
+    alive = {name: list(pool) for name, pool in configs.items()}
+    wall_start = time.perf_counter()
+    cpu_start = _cpu_seconds()
+    pool = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    try:
+        for round_index in range(n_rounds):
+            fraction = float(eta) ** (round_index - n_rounds + 1)
+            budgets = {name: budget(name, fraction) for name in alive}
+            tasks = []
+            owners = []
+            for name, pool_configs in alive.items():
+                for config in pool_configs:
+                    for fold in range(CV_FOLDS):
+                        tasks.append((searched[name], config['params'], resource, budgets[name], fold))
+                        owners.append(config)
+            round_start = time.perf_counter()
+            results = _run_tasks(pool, _run_search_task, data_dir, tasks)
+
+            scores = {}
+            for config, result in zip(owners, results):
+                scores.setdefault(id(config), []).append(result)
+            for name, pool_configs in alive.items():
+                for config in pool_configs:
+                    folds = scores[id(config)]
+                    config['rounds'].append({
+                        'budget': budgets[name],
+                        'cv_mean': float(np.mean([fold['r2'] for fold in folds])),
+                        'fit_seconds': round(sum(fold['fit_seconds'] for fold in folds), 3),
+                    })
+                pool_configs.sort(key=lambda config: config['rounds'][-1]['cv_mean'], reverse=True)
+
+            rounds.append({
+                'round': round_index,
+                'budget': budgets,
+                'configs': {name: len(pool_configs) for name, pool_configs in alive.items()},
+                'fits': len(tasks),
+                'wall_seconds': round(time.perf_counter() - round_start, 3),
+                'elapsed_seconds': round(time.perf_counter() - wall_start, 3),
+                'best_cv_r2': {name: pool_configs[0]['rounds'][-1]['cv_mean'] for name, pool_configs in alive.items()},
+            })
+            if round_index < n_rounds - 1:
+                alive = {name: pool_configs[:max(1, math.ceil(len(pool_configs) / eta))]
+                         for name, pool_configs in alive.items()}
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    wall_seconds = time.perf_counter() - wall_start
+    cpu_seconds = _cpu_seconds() - cpu_start
+
+    tuned = dict(candidates)
+    best = {}
+    for name, pool_configs in alive.items():
+        winner = pool_configs[0]
+        tuned[name] = clone(searched[name]).set_params(**winner['params'])
+        best[name] = {'params': winner['params'], **winner['rounds'][-1]}
+
+    # What scoring every configuration at the full budget would have cost,
+    # extrapolating each one's fit time linearly from its last round
+    exhaustive_seconds = 0.0
+    for name, pool_configs in configs.items():
+        full_budget = budget(name, 1.0)
+        for config in pool_configs:
+            last = config['rounds'][-1]
+            exhaustive_seconds += last['fit_seconds'] * full_budget / last['budget']
+    fit_seconds = sum(r['fit_seconds'] for pool_configs in configs.values() for c in pool_configs for r in c['rounds'])
+
+    report = {
+        'resource': resource,
+        'eta': eta,
+        'configs_per_candidate': {name: len(pool_configs) for name, pool_configs in configs.items()},
+        'best': best,
+        'rounds': rounds,
+        'configs': {
+            name: [{'params': config['params'], 'rounds': config['rounds']} for config in pool_configs]
+            for name, pool_configs in configs.items()
+        },
+        'workers': max_workers,
+        'wall_seconds': round(wall_seconds, 3),
+        'cpu_seconds': round(cpu_seconds, 3),
+        'fit_seconds': round(fit_seconds, 3),
+        'exhaustive_fit_seconds_estimate': round(exhaustive_seconds, 3),
+    }
+    return tuned, report
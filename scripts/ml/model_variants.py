@@ -0,0 +1,199 @@
+"""
+A/B and shadow model variants for the inference API
+Routes each vendor to the primary model or an A/B variant by a stable hash
+of its id, and scores shadow variants on the same extracted features off
+the request path, logging their predictions next to the served ones
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+import codec
+from metrics import LATENCY_BUCKETS, Histogram
+from serving import PredictionExecutor, ServerOverloaded
+
+PRIMARY = 'primary'
+MODES = ('ab', 'shadow')
+
+def vendor_bucket(key):
+    """
+    Stable position in [0, 1) for a vendor key
+
+    Keys are vendor ids, or the feature row bytes for vendors sent
+    without one. blake2b rather than hash() so every worker process and
+    restart routes a vendor the same way.
+    """
+    if not isinstance(key, bytes):
+        key = str(key).encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big') / 2.0 ** 64
+
+class Variant:
+    """
+    A model scored next to the primary one
+
+    An 'ab' variant serves the vendors whose bucket falls in its
+    `traffic`-wide share of [0, 1); the shares of all A/B variants are
+    laid out one after another, and the primary model serves the rest. A
+    'shadow' variant scores the vendors with a bucket below `traffic`,
+    but its predictions are only logged.
+    """
+
+    def __init__(self, name, handle, mode='shadow', traffic=1.0):
+        if mode not in MODES:
+            raise ValueError(f'Unknown variant mode {mode!r}; expected one of {MODES}')
+        if not 0.0 <= traffic <= 1.0:
+            raise ValueError(f'Variant {name!r} traffic must be in [0, 1], got {traffic}')
+        if name == PRIMARY:
+            raise ValueError(f'{PRIMARY!r} is reserved for the primary model')
+        self.name = name
+        self.handle = handle
+        self.mode = mode
+        self.traffic = traffic
+        self.latencies = Histogram(LATENCY_BUCKETS)
+
+class VariantRouter:
+    """Splits the vendors of a request between the primary model and the A/B variants"""
+
+    def __init__(self, variants):
+        self.variants = [variant for variant in variants if variant.mode == 'ab']
+        self.shadows = [variant for variant in variants if variant.mode == 'shadow']
+        names = [variant.name for variant in variants]
+        if len(set(names)) != len(names):
+            raise ValueError(f'Variant names must be unique, got {names}')
+        self.bounds = np.cumsum([variant.traffic for variant in self.variants])
+        if len(self.bounds) and self.bounds[-1] > 1.0 + 1e-9:
+            raise ValueError(f'A/B variant traffic adds up to {self.bounds[-1]:.3f}, more than 1')
+
+    def __bool__(self):
+        return bool(self.variants or self.shadows)
+
+    def buckets(self, keys):
+        return np.fromiter((vendor_bucket(key) for key in keys), dtype=np.float64, count=len(keys))
+
+    def route(self, buckets):
+        """
+        (variant, positions) for every model that serves some of `buckets`
+
+        `variant` is None for the primary model; positions index into
+        `buckets`.
+        """
+        if not self.variants:
+            return [(None, np.arange(len(buckets)))]
+        choice = np.searchsorted(self.bounds, buckets, side='right')
+        groups = []
+        for k, variant in enumerate(self.variants + [None]):
+            positions = np.flatnonzero(choice == k)
+            if len(positions):
+                groups.append((variant, positions))
+        return groups
+
+class ShadowLog:
+    """
+    Append-only NDJSON log of shadow predictions
+
+    Each batch of records is one write() on a file opened with O_APPEND,
+    so lines from concurrent threads and gunicorn workers never interleave.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def write(self, records):
+        if records:
+            os.write(self._fd, b''.join(codec.dumps(record) + b'\n' for record in records))
+
+    def close(self):
+        os.close(self._fd)
+
+class ShadowScorer:
+    """
+    Scores shadow variants in the background on features a request already extracted
+
+    Jobs run on their own bounded pool, separate from the one serving
+    requests; when its queue is full the job is dropped and counted
+    rather than delaying or failing the request.
+    """
+
+    def __init__(self, shadows, log, max_workers=1, max_queue=32):
+        self.shadows = list(shadows)
+        self.log = log
+        self.executor = PredictionExecutor(max_workers=max_workers, max_queue=max_queue)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, features, keys, buckets, served, served_by, endpoint):
+        """
+        Queue every shadow variant on its share of the rows
+
+        `served` holds the overall score each vendor was answered with
+        (NaN where it failed) and `served_by` the variant name that served it.
+        """
+        for variant in self.shadows:
+            rows = np.flatnonzero(buckets < variant.traffic)
+            if not len(rows):
+                continue
+            job = (
+                variant, features[rows], [keys[i] for i in rows], served[rows],
+                [served_by[i] for i in rows], endpoint
+            )
+            try:
+                self.executor.submit(self._score, *job)
+            except ServerOverloaded:
+                with self._lock:
+                    self.dropped += 1
+                continue
+            with self._lock:
+                self.submitted += 1
+
+    def _score(self, variant, features, keys, served, served_by, endpoint):
+        start = time.perf_counter()
+        try:
+            predictions = variant.handle.predict(features)
+            totals = variant.handle.total_scores(predictions)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            self.log.write([{'ts': round(time.time(), 3), 'variant': variant.name, 'endpoint': endpoint, 'error': str(e)}])
+            return
+        latency = time.perf_counter() - start
+        variant.latencies.observe(latency)
+
+        ts = round(time.time(), 3)
+        latency_ms = round(latency * 1000.0, 3)
+        self.log.write([
+            {
+                'ts': ts,
+                'variant': variant.name,
+                'version': variant.handle.version,
+                'endpoint': endpoint,
+                'vendor': key if not isinstance(key, bytes) else None,
+                'score': score,
+                'served': None if math.isnan(served_score) else served_score,
+                'served_by': by,
+                'rows': len(keys),
+                'latency_ms': latency_ms,
+            }
+            for key, score, served_score, by in zip(keys, totals.tolist(), served.tolist(), served_by)
+        ])
+
+    def stats(self):
+        """Counters for the /health endpoint"""
+        with self._lock:
+            return {
+                'variants': [variant.name for variant in self.shadows],
+                'log_path': self.log.path,
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'in_flight': self.executor.in_flight,
+            }
@@ -0,0 +1,96 @@
+"""
+Prediction cache for the inference API
+Maps a fingerprint of an extracted feature row plus the model version to
+the model output, with LRU eviction and a per-entry TTL
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of model predictions
+
+    Keys hash the exact float64 bytes of a feature row together with the
+    model version, so any change in the extracted features or a new model
+    produces a different key. Entries older than `ttl_seconds` are treated
+    as misses and dropped. A `max_entries` of 0 disables the cache.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=300.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(features, model_version):
+        """Stable fingerprint of one feature row and the model version"""
+        row = np.ascontiguousarray(features, dtype=np.float64)
+        digest = hashlib.blake2b(row.tobytes(), digest_size=16)
+        digest.update(str(model_version).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store `value`, evicting the least recently used entries beyond max_entries"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. when a new model is loaded"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for the /health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
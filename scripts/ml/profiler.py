@@ -0,0 +1,142 @@
+"""
+Opt-in sampling profiler for slow inference requests
+Samples the stacks of threads that are serving a request and keeps the
+samples of requests slower than a threshold as collapsed stacks, the
+input format of flamegraph.pl and speedscope
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+def _fold(frame):
+    """Root-first 'module:function:line;...' string for a frame's stack"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        names.append(f'{module}:{code.co_name}:{code.co_firstlineno}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+class SamplingProfiler:
+    """
+    Per-request stack sampler that can be switched on and off at runtime
+
+    While enabled, request threads register themselves with
+    begin_request() and a background thread samples their stacks every
+    `interval` seconds. Work the request hands to another thread is
+    sampled with it when submitted through bind(). end_request() keeps a
+    request's samples only when it took at least `slow_threshold` seconds. When disabled, begin and
+    end are a single attribute check.
+    """
+
+    def __init__(self, interval=0.005, slow_threshold=0.1):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.enabled = False
+        self.slow_requests = 0
+        self.samples = 0
+        self._stacks = Counter()
+        self._requests = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self, interval=None, slow_threshold=None):
+        """Enable sampling, optionally with a new interval and slow threshold"""
+        if interval is not None:
+            self.interval = max(0.001, float(interval))
+        if slow_threshold is not None:
+            self.slow_threshold = max(0.0, float(slow_threshold))
+        self.enabled = True
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Disable sampling; collected stacks are kept until reset()"""
+        self.enabled = False
+        with self._lock:
+            self._requests.clear()
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.slow_requests = 0
+            self.samples = 0
+
+    def begin_request(self):
+        if not self.enabled:
+            return
+        if self._pid != os.getpid():
+            # Enabled before a fork; the sampler thread did not survive it
+            self.start()
+        with self._lock:
+            self._requests[threading.get_ident()] = Counter()
+
+    def bind(self, fn):
+        """
+        Wrap `fn` so that, wherever it runs, its thread is sampled as part
+        of the calling thread's request; `fn` itself outside a request
+        """
+        if not self._requests:
+            return fn
+        samples = self._requests.get(threading.get_ident())
+        if samples is None:
+            return fn
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            ident = threading.get_ident()
+            with self._lock:
+                self._requests[ident] = samples
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    if self._requests.get(ident) is samples:
+                        del self._requests[ident]
+        return run
+
+    def end_request(self, duration):
+        if not self._requests:
+            return
+        with self._lock:
+            samples = self._requests.pop(threading.get_ident(), None)
+            if samples and duration >= self.slow_threshold:
+                self._stacks.update(samples)
+                self.slow_requests += 1
+
+    def _run(self):
+        own = threading.get_ident()
+        while self.enabled:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._requests.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != own:
+                        samples[_fold(frame)] += 1
+                        self.samples += 1
+            del frames
+
+    def collapsed(self):
+        """Collapsed stacks of the slow requests, one 'stack count' per line"""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'interval_seconds': self.interval,
+            'slow_threshold_seconds': self.slow_threshold,
+            'slow_requests': self.slow_requests,
+            'samples': self.samples,
+            'distinct_stacks': len(self._stacks),
+        }
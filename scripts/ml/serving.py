@@ -0,0 +1,82 @@
+"""
+Bounded execution of model predictions for the inference API
+Runs CPU-bound predict calls on a fixed-size pool and rejects work once
+the queue in front of it is full, so overload turns into fast 503s
+instead of unbounded latency
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class ServerOverloaded(Exception):
+    """Raised when the prediction queue is full; mapped to 503 + Retry-After"""
+
+    def __init__(self, retry_after=1):
+        super().__init__('Prediction queue is full, retry later')
+        self.retry_after = retry_after
+
+class PredictionExecutor:
+    """
+    Thread pool with admission control
+
+    At most `max_workers` predictions run at once and at most `max_queue`
+    more wait for a free worker; anything beyond that raises
+    ServerOverloaded immediately. NumPy releases the GIL inside the tree
+    traversal, so threads give real parallelism without a per-process
+    copy of the model.
+
+    `wrap_task`, if given, wraps every task on the submitting thread; the
+    API passes the profiler's bind() so a request's predictions are
+    sampled with it.
+    """
+
+    def __init__(self, max_workers=4, max_queue=64, retry_after=1, wrap_task=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.wrap_task = wrap_task
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='predict')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule fn(*args, **kwargs), or raise ServerOverloaded if the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ServerOverloaded(self.retry_after)
+        with self._lock:
+            self.in_flight += 1
+        try:
+            if self.wrap_task is not None:
+                fn = self.wrap_task(fn)
+            future = self._pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Run fn on the pool and wait for its result"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _release(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        """Counters for the /health endpoint"""
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,223 @@
+"""
+Row-sharded batch prediction on a persistent process pool
+Splits a large feature matrix into row shards scored at once by worker
+processes that each keep the model loaded, with the calling process
+scoring a shard of its own. Rows and predictions pass through
+multiprocessing.shared_memory, so only a few names and offsets are
+pickled per shard
+
+A model is named by a spec, a tuple (loader, args, method, fingerprint):
+loader(*args) loads it in a worker, getattr(model, method) predicts, and
+a fingerprint other than None must match the loaded model's
+`fingerprint`, which changes whenever the model files do.
+"""
+
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# A shard smaller than this costs more to hand to a worker than to score in-process
+MIN_SHARD_ROWS = int(os.getenv('SHARD_MIN_ROWS', 2000))
+# Models each worker keeps loaded: the current one plus those it serves
+# next to (A/B variants), least recently used dropped first
+WORKER_MODELS = 4
+# Workers are forked from a clean server process rather than from the
+# (possibly multi-threaded) caller
+START_METHOD = os.getenv('SHARD_START_METHOD', 'forkserver')
+
+def default_workers():
+    """Worker processes that keep every CPU busy alongside the calling process"""
+    return max(0, (os.cpu_count() or 1) - 1)
+
+class ModelUnavailable(Exception):
+    """Raised in a worker whose model for a spec failed to load or loaded another fingerprint"""
+
+# Per-worker process state
+_models = OrderedDict()
+
+def _worker_model(spec):
+    """The predict method for `spec`, loading the model on first use in this worker"""
+    predict = _models.get(spec)
+    if predict is not None:
+        _models.move_to_end(spec)
+        return predict
+
+    loader, args, method, fingerprint = spec
+    try:
+        model = loader(*args)
+    except Exception as e:
+        raise ModelUnavailable(f'Could not load the model: {e}') from e
+    if fingerprint is not None and model.fingerprint != fingerprint:
+        raise ModelUnavailable(f'Expected model {fingerprint}, loaded {model.fingerprint}')
+    # The same files loaded again mean the model was reloaded; the old one is not used again
+    for stale in [cached for cached in _models if cached[:3] == spec[:3]]:
+        del _models[stale]
+    # One core per worker: an n_jobs pickled with an sklearn model would
+    # oversubscribe the pool
+    estimator = getattr(model, 'model', None)
+    if hasattr(estimator, 'n_jobs'):
+        estimator.n_jobs = 1
+    predict = _models[spec] = getattr(model, method)
+    while len(_models) > WORKER_MODELS:
+        _models.popitem(last=False)
+    return predict
+
+def _preload(specs):
+    """Pool initializer: load the models each worker should start with"""
+    for spec in specs:
+        try:
+            _worker_model(spec)
+        except Exception as e:
+            print(f"✗ Shard worker {os.getpid()} could not preload a model: {e}")
+
+def _predict_shard(spec, input_name, output_name, shape, n_outputs, start, stop):
+    """Score rows start:stop of the shared input matrix into the shared output matrix"""
+    predict = _worker_model(spec)
+    inputs = shared_memory.SharedMemory(name=input_name)
+    outputs = shared_memory.SharedMemory(name=output_name)
+    X = out = None
+    try:
+        X = np.ndarray(shape, dtype=np.float64, buffer=inputs.buf)
+        out = np.ndarray((shape[0], n_outputs), dtype=np.float64, buffer=outputs.buf)
+        out[start:stop] = np.asarray(predict(X[start:stop]), dtype=np.float64).reshape(stop - start, n_outputs)
+    finally:
+        # The views must go before the segments can be closed
+        X = out = None
+        inputs.close()
+        outputs.close()
+
+class ShardPool:
+    """
+    Persistent worker processes scoring row shards of large batches
+
+    predict() cuts a batch into at most workers + 1 shards of at least
+    `min_shard_rows` rows; smaller batches are scored in-process without
+    touching the pool. Workers start on the first sharded batch, each
+    loading the `preload` specs once, and load any other spec on its
+    first shard. A pool inherited across fork() is replaced, so a pool
+    created before a server forks its workers is safe to use in each.
+
+    When a shard fails the caller scores it in-process. A spec whose
+    model a worker could not load, or found with another fingerprint
+    because the files changed since, is not sent to the workers again.
+    """
+
+    def __init__(self, workers=None, min_shard_rows=MIN_SHARD_ROWS, preload=()):
+        self.workers = default_workers() if workers is None else workers
+        self.min_shard_rows = max(1, min_shard_rows)
+        self.preload = list(preload)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._unavailable = set()
+        self.sharded_batches = 0
+        self.fallbacks = 0
+
+    @property
+    def batch_rows(self):
+        """Rows that give every worker and the caller a full-size shard"""
+        return self.min_shard_rows * (self.workers + 1)
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(START_METHOD),
+                    initializer=_preload,
+                    initargs=(self.preload,)
+                )
+                self._pid = os.getpid()
+            return self._pool
+
+    def _bounds(self, n_rows):
+        """(start, stop) of each shard; the first is the caller's"""
+        count = max(1, min(self.workers + 1, n_rows // self.min_shard_rows))
+        edges = np.linspace(0, n_rows, count + 1).astype(int).tolist()
+        return list(zip(edges[:-1], edges[1:]))
+
+    def predict(self, spec, X, local, n_outputs=1):
+        """
+        Predictions for X, as local(X) returns them
+
+        `local` is the caller's own predict function for the model `spec`
+        names; `n_outputs` is its number of output columns.
+        """
+        bounds = self._bounds(len(X)) if self.workers > 0 and spec not in self._unavailable else []
+        if len(bounds) < 2:
+            return local(X)
+
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        inputs = shared_memory.SharedMemory(create=True, size=X.nbytes)
+        outputs = shared_memory.SharedMemory(create=True, size=len(X) * n_outputs * 8)
+        shared = out = None
+        try:
+            shared = np.ndarray(X.shape, dtype=np.float64, buffer=inputs.buf)
+            shared[:] = X
+            out = np.ndarray((len(X), n_outputs), dtype=np.float64, buffer=outputs.buf)
+            pending = []
+            try:
+                pool = self._executor()
+                for start, stop in bounds[1:]:
+                    future = pool.submit(
+                        _predict_shard, spec, inputs.name, outputs.name, X.shape, n_outputs, start, stop
+                    )
+                    pending.append((start, stop, future))
+            except BrokenProcessPool as e:
+                print(f"✗ Shard pool is broken, scoring in-process: {e}")
+                self._reset()
+
+            start, stop = bounds[0]
+            out[start:stop] = np.asarray(local(X[start:stop]), dtype=np.float64).reshape(stop - start, n_outputs)
+            failed = bounds[1 + len(pending):]
+            for start, stop, future in pending:
+                try:
+                    future.result()
+                except Exception as e:
+                    failed.append((start, stop))
+                    if isinstance(e, ModelUnavailable):
+                        self._unavailable.add(spec)
+                    elif isinstance(e, BrokenProcessPool):
+                        self._reset()
+                    print(f"✗ Shard of rows {start}:{stop} failed, scoring it in-process: {e}")
+            for start, stop in failed:
+                out[start:stop] = np.asarray(local(X[start:stop]), dtype=np.float64).reshape(stop - start, n_outputs)
+            self.fallbacks += len(failed)
+            self.sharded_batches += 1
+            result = out.copy() if n_outputs > 1 else out[:, 0].copy()
+        finally:
+            # The views must go before the segments can be closed
+            shared = out = None
+            inputs.close()
+            inputs.unlink()
+            outputs.close()
+            outputs.unlink()
+        return result
+
+    def _reset(self):
+        """Drop a broken pool; the next sharded batch starts a new one"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def stats(self):
+        """Counters for the /health endpoint"""
+        return {
+            'workers': self.workers,
+            'min_shard_rows': self.min_shard_rows,
+            'sharded_batches': self.sharded_batches,
+            'fallbacks': self.fallbacks,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=True)
+            self._pool = None
@@ -0,0 +1,188 @@
+"""
+Vectorized synthetic vendor training data for scale testing
+Draws whole columns per block of vendors with a seeded np.random.Generator
+and writes them in chunks as CSV or as a columnar .npy directory
+
+Usage:
+    python synthetic_data.py --vendors 1000000 --output data/vendor_training_data.csv
+    python synthetic_data.py --vendors 5000000 --projects 1 40 --distribution poisson \\
+        --format npy --output data/vendor_training_npy
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from training_data import CACHE_FORMAT_VERSION, CACHE_MANIFEST, TRAINING_DTYPES, VENDOR_IDS_FILE
+
+# Vendors per generated block; fixed so the output for a seed does not
+# depend on how it is written
+VENDORS_PER_BLOCK = 100_000
+DISTRIBUTIONS = ('uniform', 'poisson')
+# Rows formatted per CSV write; bounds the Python strings alive at once
+CSV_ROWS_PER_WRITE = 50_000
+
+def _block_rng(seed, block):
+    return np.random.default_rng([seed, block])
+
+def _project_counts(rng, n_vendors, projects, distribution):
+    """Projects per vendor: uniform in [min, max], or Poisson around their midpoint clipped to the range"""
+    low, high = projects
+    if distribution == 'uniform':
+        return rng.integers(low, high + 1, n_vendors)
+    if distribution == 'poisson':
+        return np.clip(rng.poisson((low + high) / 2, n_vendors), low, high)
+    raise ValueError(f'Unknown project distribution {distribution!r}; expected one of {DISTRIBUTIONS}')
+
+def vendor_ids(first_vendor, n_vendors, id_width=3):
+    """VENDOR_000-style ids, zero-padded to at least `id_width` digits"""
+    numbers = np.arange(first_vendor, first_vendor + n_vendors).astype(str)
+    return np.char.add('VENDOR_', np.char.zfill(numbers, id_width))
+
+def _blocks(n_vendors):
+    for block, first_vendor in enumerate(range(0, n_vendors, VENDORS_PER_BLOCK)):
+        yield block, first_vendor, min(VENDORS_PER_BLOCK, n_vendors - first_vendor)
+
+def generate_block(seed, block, first_vendor, n_vendors, projects=(2, 9), distribution='uniform', id_width=3):
+    """
+    Project rows for one block of vendors
+
+    Every column has the shape generate_sample_data() always used: a
+    per-vendor base quality in [60, 95] drives delivery, quality and cost,
+    the rest are independent per project. vendor_id is categorical.
+    """
+    rng = _block_rng(seed, block)
+    counts = _project_counts(rng, n_vendors, projects, distribution)
+    base_quality = rng.uniform(60, 95, n_vendors)
+    codes = np.repeat(np.arange(n_vendors, dtype=np.int32), counts)
+    base = base_quality[codes]
+    n = len(codes)
+
+    return pd.DataFrame({
+        'vendor_id': pd.Categorical.from_codes(codes, categories=vendor_ids(first_vendor, n_vendors, id_width)),
+        'delivery_success_rate': np.clip(rng.normal(base, 10), 50, 100),
+        'quality_score': np.clip(rng.normal(base, 8), 50, 100),
+        'cost_efficiency': np.clip(rng.normal(base - 5, 12), 40, 100),
+        'compliance_score': np.clip(rng.normal(90, 5, n), 70, 100),
+        'contract_value': rng.uniform(50000, 500000, n),
+        'response_time_hours': rng.uniform(1, 48, n),
+        'incident_count': rng.poisson(1, n),
+        'external_rating': np.clip(rng.normal(4.2, 0.5, n), 2.5, 5.0),
+        'review_count': rng.integers(10, 500, n),
+        'certification_count': rng.integers(1, 8, n),
+        'years_in_business': rng.integers(3, 25, n),
+        'team_size': rng.integers(10, 500, n),
+        'high_risk_flag': (rng.random(n) < 0.15).astype(np.int64),
+        'compliance_issue': (rng.random(n) < 0.1).astype(np.int64),
+    })
+
+def iter_training_data(n_vendors, seed=42, projects=(2, 9), distribution='uniform'):
+    """Yield the generated project rows one block of vendors at a time"""
+    id_width = max(3, len(str(max(n_vendors - 1, 0))))
+    for block, first_vendor, block_vendors in _blocks(n_vendors):
+        yield generate_block(seed, block, first_vendor, block_vendors, projects, distribution, id_width)
+
+def _count_rows(n_vendors, seed, projects, distribution):
+    """Total project rows, by redrawing only the per-block project counts"""
+    return sum(
+        int(_project_counts(_block_rng(seed, block), block_vendors, projects, distribution).sum())
+        for block, _, block_vendors in _blocks(n_vendors)
+    )
+
+def format_csv_rows(batch):
+    """
+    CSV lines for a generated batch, floats with 6 decimals
+
+    Formatting column lists with str.format and zipping them into lines
+    is about 3x faster than DataFrame.to_csv for these frames.
+    """
+    columns = []
+    for column in batch.columns:
+        values = batch[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            columns.append(np.asarray(values.cat.categories)[values.cat.codes.to_numpy()].tolist())
+        elif values.dtype.kind == 'f':
+            columns.append(list(map('{:.6f}'.format, values.tolist())))
+        else:
+            columns.append(list(map(str, values.tolist())))
+    return ''.join(line + '\n' for line in map(','.join, zip(*columns)))
+
+def write_csv(path, n_vendors, seed=42, projects=(2, 9), distribution='uniform'):
+    """Write the generated rows to one CSV, a block at a time; returns the row count"""
+    tmp_path = f'{path}.tmp'
+    n_rows = 0
+    with open(tmp_path, 'w', newline='') as f:
+        f.write(','.join(TRAINING_DTYPES) + '\n')
+        for batch in iter_training_data(n_vendors, seed, projects, distribution):
+            for start in range(0, len(batch), CSV_ROWS_PER_WRITE):
+                f.write(format_csv_rows(batch.iloc[start:start + CSV_ROWS_PER_WRITE]))
+            n_rows += len(batch)
+    os.replace(tmp_path, path)
+    return n_rows
+
+def write_npy(path, n_vendors, seed=42, projects=(2, 9), distribution='uniform'):
+    """
+    Write the generated rows as a columnar .npy directory; returns the row count
+
+    The layout is the one training_data uses for its CSV cache (one .npy
+    per column with the compact training dtypes, vendor codes plus
+    vendor_ids.npy), so iter_training_chunks() reads the directory directly.
+    """
+    os.makedirs(path, exist_ok=True)
+    n_rows = _count_rows(n_vendors, seed, projects, distribution)
+    columns = {}
+    for column, dtype in TRAINING_DTYPES.items():
+        dtype = np.int32 if column == 'vendor_id' else dtype
+        columns[column] = np.lib.format.open_memmap(
+            os.path.join(path, f'{column}.npy'), mode='w+', dtype=dtype, shape=(n_rows,)
+        )
+
+    ids = []
+    offset = 0
+    first_code = 0
+    for batch in iter_training_data(n_vendors, seed, projects, distribution):
+        stop = offset + len(batch)
+        for column, out in columns.items():
+            if column == 'vendor_id':
+                out[offset:stop] = batch[column].cat.codes.to_numpy().astype(np.int32) + first_code
+            else:
+                out[offset:stop] = batch[column].to_numpy()
+        ids.append(np.asarray(batch['vendor_id'].cat.categories, dtype=str))
+        first_code += len(ids[-1])
+        offset = stop
+    for out in columns.values():
+        out.flush()
+    del columns
+
+    np.save(os.path.join(path, VENDOR_IDS_FILE), np.concatenate(ids) if ids else np.zeros(0, dtype=str))
+    generator = {'vendors': n_vendors, 'seed': seed, 'projects': list(projects), 'distribution': distribution}
+    with open(os.path.join(path, CACHE_MANIFEST), 'w') as f:
+        json.dump({'format_version': CACHE_FORMAT_VERSION, 'source': {'generator': generator}, 'rows': n_rows}, f, indent=2)
+    return n_rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic vendor training data')
+    parser.add_argument('--vendors', type=int, default=50)
+    parser.add_argument('--projects', type=int, nargs=2, default=[2, 9], metavar=('MIN', 'MAX'),
+                        help='projects per vendor, inclusive')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='uniform')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', choices=('csv', 'npy'), default='csv')
+    parser.add_argument('--output', default='data/vendor_training_data.csv')
+    args = parser.parse_args()
+    if not 0 <= args.projects[0] <= args.projects[1]:
+        parser.error('--projects MIN MAX needs 0 <= MIN <= MAX')
+
+    parent = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(parent, exist_ok=True)
+    start = time.perf_counter()
+    writer = write_csv if args.format == 'csv' else write_npy
+    n_rows = writer(args.output, args.vendors, args.seed, tuple(args.projects), args.distribution)
+    print(f"✓ Generated {n_rows} rows for {args.vendors} vendors in {time.perf_counter() - start:.1f}s -> {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Shared set-up for the scripts/ml tests
+
+    python -m pytest -q scripts/ml/tests
+
+The modules under test are flat scripts in scripts/ml, imported the way
+the API and the benchmarks import them.
+"""
+
+import os
+import sys
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ML_DIR not in sys.path:
+    sys.path.insert(0, ML_DIR)
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestRegressor
+
+N_FEATURES = 6
+
+def make_regression(n_rows, seed=0, n_outputs=1):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 100, size=(n_rows, N_FEATURES))
+    y = X[:, 0] * 0.4 + X[:, 1] * 0.3 + np.sin(X[:, 2] / 10) * 5 + rng.normal(0, 2, n_rows)
+    if n_outputs > 1:
+        y = np.column_stack([y * (1 + k / 10) for k in range(n_outputs)])
+    return X, y
+
+def with_missing(X, fraction, seed=1):
+    """Copy of X with about `fraction` of its values set to NaN"""
+    X = X.copy()
+    X[np.random.default_rng(seed).random(X.shape) < fraction] = np.nan
+    return X
+
+@pytest.fixture(scope='session')
+def test_rows():
+    """Rows across and beyond the training range, with NaN in about a quarter of them"""
+    X, _ = make_regression(400, seed=7)
+    X[:50] *= 1.5
+    return with_missing(X, 0.05, seed=8)
+
+@pytest.fixture(scope='session')
+def models():
+    """Fitted sklearn ensembles by name, small enough to keep the tests fast"""
+    X, y = make_regression(1000)
+    _, y_multi = make_regression(1000, n_outputs=3)
+    return {
+        'RandomForest': RandomForestRegressor(n_estimators=15, max_depth=8, random_state=0).fit(X, y),
+        'RandomForest-missing': RandomForestRegressor(n_estimators=15, max_depth=8, random_state=0).fit(
+            with_missing(X, 0.1), y
+        ),
+        'ExtraTrees': ExtraTreesRegressor(n_estimators=15, max_depth=8, random_state=0).fit(with_missing(X, 0.1), y),
+        'RandomForest-multi': RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0).fit(X, y_multi),
+        'GradientBoosting': GradientBoostingRegressor(n_estimators=30, max_depth=4, random_state=0).fit(X, y),
+    }
+
+def finite_rows(model, X):
+    """X itself, or its NaN-free rows for a model whose predict rejects NaN"""
+    if isinstance(model, GradientBoostingRegressor):
+        return X[~np.isnan(X).any(axis=1)]
+    return X
+
+def training_frame(n_rows, n_vendors=40, seed=0):
+    """Project rows with the vendor_training_data.csv columns, some values missing"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'vendor_id': np.char.add('VENDOR_', rng.integers(0, n_vendors, n_rows).astype(str)),
+        'delivery_success_rate': rng.uniform(50, 100, n_rows),
+        'quality_score': rng.uniform(50, 100, n_rows),
+        'cost_efficiency': rng.uniform(40, 100, n_rows),
+        'compliance_score': rng.uniform(70, 100, n_rows),
+        'contract_value': rng.uniform(50000, 500000, n_rows),
+        'response_time_hours': rng.uniform(1, 48, n_rows),
+        'incident_count': rng.poisson(1, n_rows),
+        'external_rating': rng.uniform(2.5, 5.0, n_rows),
+        'review_count': rng.integers(10, 500, n_rows),
+        'certification_count': rng.integers(1, 8, n_rows),
+        'years_in_business': rng.integers(3, 25, n_rows),
+        'team_size': rng.integers(10, 500, n_rows),
+        'high_risk_flag': (rng.random(n_rows) < 0.15).astype(np.int64),
+        'compliance_issue': (rng.random(n_rows) < 0.1).astype(np.int64),
+    })
+    df.loc[rng.random(n_rows) < 0.05, 'quality_score'] = np.nan
+    df.loc[rng.random(n_rows) < 0.05, 'response_time_hours'] = np.nan
+    return df
@@ -0,0 +1,75 @@
+"""CompactEnsemble must reach the same leaves as the CompiledEnsemble it was compacted from"""
+
+import numpy as np
+import pytest
+
+from compact_model import CompactEnsemble, compact
+from conftest import finite_rows
+from tree_engine import CompiledEnsemble
+
+# uint8 is exact only while every feature has at most 254 distinct
+# thresholds, which the small boosted model keeps to
+EXACT_CASES = [
+    ('RandomForest', 'float32'),
+    ('RandomForest', 'uint16'),
+    ('RandomForest-missing', 'uint16'),
+    ('ExtraTrees', 'float32'),
+    ('RandomForest-multi', 'uint16'),
+    ('GradientBoosting', 'uint8'),
+    ('GradientBoosting', 'float32'),
+]
+
+def leaf_values(ensemble, X):
+    """Leaf value reached in every tree, which only matches if the routing does"""
+    return np.asarray(ensemble.value, dtype=np.float32)[ensemble.apply(X)]
+
+@pytest.mark.parametrize('name, mode', EXACT_CASES)
+def test_same_leaves_as_full_model(models, test_rows, name, mode):
+    full = CompiledEnsemble.from_sklearn(models[name])
+    compacted = compact(full, mode)
+    X = finite_rows(models[name], test_rows)
+    np.testing.assert_array_equal(leaf_values(compacted, X), leaf_values(full, X))
+    # Only the float32 leaf values change the predictions
+    np.testing.assert_allclose(compacted.predict(X), full.predict(X), rtol=1e-5)
+    batch = compacted.predict(X)
+    for i in range(20):
+        np.testing.assert_array_equal(compacted.predict(X[i:i + 1])[0], batch[i])
+
+def test_uint8_stays_close_when_it_merges_thresholds(models, test_rows):
+    full = CompiledEnsemble.from_sklearn(models['RandomForest'])
+    compacted = compact(full, 'uint8')
+    assert np.diff(compacted.edge_offsets).max() == 254
+    error = np.abs(compacted.predict(test_rows) - full.predict(test_rows))
+    assert error.mean() < 0.05 * np.abs(full.predict(test_rows)).mean()
+
+@pytest.mark.parametrize('mode', ['float32', 'uint16'])
+def test_nan_rows_follow_sklearn(models, test_rows, mode):
+    model = models['RandomForest-missing']
+    compacted = compact(CompiledEnsemble.from_sklearn(model), mode)
+    X = test_rows[np.isnan(test_rows).any(axis=1)]
+    np.testing.assert_allclose(compacted.predict(X), model.predict(X), rtol=1e-5)
+
+def test_boosting_rejects_nan(models):
+    compacted = compact(CompiledEnsemble.from_sklearn(models['GradientBoosting']), 'uint16')
+    X = np.full((1, compacted.n_features), 50.0)
+    X[0, 1] = np.nan
+    with pytest.raises(ValueError, match='NaN'):
+        compacted.predict(X)
+
+def test_folded_scaler_bins_raw_rows_like_scaled_ones(models, test_rows):
+    # Thresholds of a model trained on rows scaled by (x - mean) / scale
+    mean = np.linspace(10, 60, test_rows.shape[1])
+    scale = np.linspace(2, 30, test_rows.shape[1])
+    compacted = compact(CompiledEnsemble.from_sklearn(models['RandomForest-missing']), 'uint16')
+    folded = compacted.fold_scaler(mean, scale)
+    raw = test_rows * scale + mean
+    np.testing.assert_array_equal(folded.predict(raw), compacted.predict((raw - mean) / scale))
+    with pytest.raises(ValueError):
+        compact(CompiledEnsemble.from_sklearn(models['RandomForest']), 'float32').fold_scaler(mean, scale)
+
+@pytest.mark.parametrize('mode', ['float32', 'uint8'])
+def test_state_round_trip(models, test_rows, mode):
+    compacted = compact(CompiledEnsemble.from_sklearn(models['RandomForest-missing']), mode)
+    restored = CompactEnsemble.from_state(*compacted.to_state())
+    np.testing.assert_array_equal(restored.predict(test_rows), compacted.predict(test_rows))
+    assert restored.nbytes == compacted.nbytes
@@ -0,0 +1,49 @@
+"""extract_feature_matrix must match extract_vendor_features vendor by vendor"""
+
+import numpy as np
+
+from feature_extraction import extract_feature_matrix, extract_vendor_features
+
+def vendor(delivery=90, rating=4.2, years=8):
+    return {
+        'internalRecords': [
+            {'deliverySuccessRate': delivery, 'qualityScore': 80, 'costEfficiency': 70, 'complianceScore': 95},
+            {'deliverySuccessRate': 70, 'qualityScore': 85, 'costEfficiency': 75, 'complianceScore': 90},
+        ],
+        'externalReviews': [{'rating': rating, 'sentiment': 'positive'}, {'rating': 3.0, 'sentiment': 'neutral'}],
+        'features': [{'certifications': ['ISO9001'], 'yearsInBusiness': years, 'teamSize': 40}],
+        'risks': [{'riskLevel': 'HIGH', 'status': 'ACTIVE'}, {'riskLevel': 'LOW', 'status': 'CLOSED'}],
+    }
+
+def assert_matches_reference(vendors):
+    matrix, row_index, errors = extract_feature_matrix(vendors)
+    for row, i in zip(matrix, row_index):
+        np.testing.assert_array_equal(row, extract_vendor_features(vendors[i])[0])
+    return matrix, row_index, errors
+
+def test_regular_vendors_match_reference():
+    vendors = [vendor(delivery=d, rating=r, years=y) for d, r, y in [(90, 4.2, 8), (55.5, 1.0, 0), (100, 5, 30)]]
+    vendors.append({})
+    _, row_index, errors = assert_matches_reference(vendors)
+    assert row_index == [0, 1, 2, 3]
+    assert errors == {}
+
+def single_record(delivery):
+    return {'internalRecords': [
+        {'deliverySuccessRate': delivery, 'qualityScore': 80, 'costEfficiency': 70, 'complianceScore': 95}
+    ]}
+
+def test_list_valued_field_only_affects_its_vendor():
+    # One vendor sending a list is scored like the reference scores it
+    # (the list's mean); ragged values fail that vendor alone
+    vendors = [vendor(), single_record([1, 2]), vendor(delivery=[1, 2]), vendor(rating=[3, [4, 5]]), vendor(years=None)]
+    matrix, row_index, errors = assert_matches_reference(vendors)
+    assert row_index == [0, 1, 4]
+    assert matrix[1, 0] == 1.5
+    assert sorted(errors) == [2, 3]
+
+def test_every_value_a_list_is_not_taken_as_numeric():
+    matrix, row_index, errors = assert_matches_reference([single_record([1, 2]), single_record([3, 4])])
+    assert row_index == [0, 1]
+    assert errors == {}
+    np.testing.assert_array_equal(matrix[:, 0], [1.5, 3.5])
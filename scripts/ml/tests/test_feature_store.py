@@ -0,0 +1,78 @@
+"""The incremental feature store must rebuild the frame engineer_features() computes from scratch"""
+
+import numpy as np
+import pandas as pd
+
+from conftest import training_frame
+from feature_store import VendorAggregateStore, update_from_csv
+from train_model import engineer_features
+from training_data import iter_training_chunks
+
+def assert_matches_engineer_features(store, df):
+    expected_X, expected_y = engineer_features(df)
+    X, y = store.feature_frame()
+    assert list(X.columns) == list(expected_X.columns)
+    for column in X.columns:
+        # Means are accumulated in a different order, so the last bits may differ
+        assert X[column].dtype == expected_X[column].dtype, column
+        np.testing.assert_allclose(X[column], expected_X[column], rtol=1e-12, atol=0, err_msg=column)
+    np.testing.assert_array_equal(y.to_numpy(), expected_y.to_numpy())
+
+def test_batches_match_full_recompute():
+    df = training_frame(3000)
+    # One vendor whose quality score is never known keeps a NaN mean
+    df.loc[df['vendor_id'] == 'VENDOR_0', 'quality_score'] = np.nan
+    store = VendorAggregateStore()
+    for rows in np.array_split(np.arange(len(df)), 7):
+        store.update(df.iloc[rows])
+    assert store.rows_seen == len(df)
+    assert_matches_engineer_features(store, df)
+
+def test_saved_store_takes_new_vendors_and_rows(tmp_path):
+    history = training_frame(2000, n_vendors=30, seed=1)
+    delta = training_frame(300, n_vendors=50, seed=2)
+    path = str(tmp_path / 'store.npz')
+    VendorAggregateStore().update(history).save(path)
+    store = VendorAggregateStore.load(path).update(delta)
+    assert store.n_vendors == 50
+    assert_matches_engineer_features(store, pd.concat([history, delta], ignore_index=True))
+
+def test_update_from_csv_reads_only_appended_rows(tmp_path):
+    csv_path = str(tmp_path / 'vendor_training_data.csv')
+    store_path = str(tmp_path / 'store.npz')
+    history = training_frame(1500, seed=3)
+    delta = training_frame(200, seed=4)
+    history.to_csv(csv_path, index=False)
+    update_from_csv(store_path, csv_path, chunksize=400)
+    delta.to_csv(csv_path, mode='a', header=False, index=False)
+
+    store = update_from_csv(store_path, csv_path, chunksize=400)
+    assert store.rows_seen == len(history) + len(delta)
+    # Compared with the CSV as training reads it, with its column types
+    full = pd.concat(iter_training_chunks(csv_path), ignore_index=True)
+    assert_matches_engineer_features(store, full)
+
+def test_update_from_csv_rebuilds_a_rewritten_csv(tmp_path):
+    csv_path = str(tmp_path / 'vendor_training_data.csv')
+    store_path = str(tmp_path / 'store.npz')
+    training_frame(1500, seed=5).to_csv(csv_path, index=False)
+    update_from_csv(store_path, csv_path, chunksize=400)
+
+    # Same row count and more bytes, but not the rows the store has seen
+    rewritten = training_frame(1600, seed=6)
+    rewritten.to_csv(csv_path, index=False)
+    store = update_from_csv(store_path, csv_path, chunksize=400)
+    assert store.rows_seen == len(rewritten)
+    assert_matches_engineer_features(store, pd.concat(iter_training_chunks(csv_path), ignore_index=True))
+
+def test_update_from_csv_rebuilds_a_truncated_csv(tmp_path):
+    csv_path = str(tmp_path / 'vendor_training_data.csv')
+    store_path = str(tmp_path / 'store.npz')
+    df = training_frame(1500, seed=7)
+    df.to_csv(csv_path, index=False)
+    update_from_csv(store_path, csv_path, chunksize=400)
+
+    df.iloc[:1000].to_csv(csv_path, index=False)
+    store = update_from_csv(store_path, csv_path, chunksize=400)
+    assert store.rows_seen == 1000
+    assert_matches_engineer_features(store, pd.concat(iter_training_chunks(csv_path), ignore_index=True))
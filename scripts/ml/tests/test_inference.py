@@ -0,0 +1,84 @@
+"""VendorScorer with the scaler folded in must score exactly like scaler.transform + model.predict"""
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from inference import FEATURE_DEFAULTS, VendorScorer
+
+N_FEATURES = len(FEATURE_DEFAULTS)
+DEFAULTS = np.array([default for _, default in FEATURE_DEFAULTS], dtype=np.float64)
+
+def raw_rows(n, seed):
+    rng = np.random.default_rng(seed)
+    return DEFAULTS * rng.uniform(0.2, 2.0, size=(n, N_FEATURES)) + rng.normal(0, 1, size=(n, N_FEATURES))
+
+def save_scorer(tmp_path, model, scaler, missing=0.0):
+    """Fit scaler and model on the same rows and load them back as a VendorScorer"""
+    X = raw_rows(600, seed=0)
+    y = 50 + 10 * np.tanh((X[:, 0] - 80) / 20) + 5 * np.tanh((X[:, 8] - 4) / 2) + X[:, 13]
+    X[np.random.default_rng(5).random(X.shape) < missing] = np.nan
+    model.fit(scaler.fit_transform(X), y)
+    joblib.dump(model, tmp_path / 'model.pkl')
+    joblib.dump(scaler, tmp_path / 'scaler.pkl')
+    scorer = VendorScorer(str(tmp_path / 'model.pkl'), str(tmp_path / 'scaler.pkl'),
+                          artifact_path=str(tmp_path / 'missing.bin'), metadata_path=str(tmp_path / 'missing.json'))
+    assert scorer.raw_engine is not None
+    return scorer, model, scaler
+
+SCALERS = {
+    'standard': lambda: StandardScaler(),
+    'without-mean': lambda: StandardScaler(with_mean=False),
+    'without-std': lambda: StandardScaler(with_std=False),
+}
+
+@pytest.mark.parametrize('scaler', SCALERS)
+def test_folded_scaler_matches_transform_then_predict(tmp_path, scaler):
+    scorer, model, scaler = save_scorer(
+        tmp_path, RandomForestRegressor(n_estimators=10, max_depth=8, random_state=0), SCALERS[scaler]()
+    )
+    X = raw_rows(300, seed=1)
+    np.testing.assert_array_equal(scorer.predict_raw(X), model.predict(scaler.transform(X)))
+
+def test_nan_rows_score_like_the_unfolded_model(tmp_path):
+    scorer, model, scaler = save_scorer(
+        tmp_path, RandomForestRegressor(n_estimators=10, max_depth=8, random_state=0), StandardScaler()
+    )
+    X = raw_rows(50, seed=2)
+    X[::3, 0] = np.nan
+    np.testing.assert_array_equal(scorer.predict_raw(X), model.predict(scaler.transform(X)))
+
+    # A feature sent as None reaches the model as NaN
+    vendor = dict(zip([name for name, _ in FEATURE_DEFAULTS], X[1]))
+    vendor['avg_delivery_success'] = None
+    row = X[1:2].copy()
+    row[0, 0] = np.nan
+    assert scorer.score_vendor(vendor)['score'] == model.predict(scaler.transform(row))[0]
+    base_score, contributions = scorer.explain_raw(row)
+    assert base_score + contributions.sum() == pytest.approx(scorer.predict_raw(row)[0], abs=1e-9)
+
+def test_model_trained_with_missing_values_folds(tmp_path):
+    # Such trees split missing from present values at an infinite threshold
+    scorer, model, scaler = save_scorer(
+        tmp_path, RandomForestRegressor(n_estimators=10, max_depth=8, random_state=0), StandardScaler(),
+        missing=0.1
+    )
+    assert np.isinf(scorer.engine.threshold).any()
+    X = raw_rows(100, seed=4)
+    X[::4, 2] = np.nan
+    np.testing.assert_array_equal(scorer.raw_engine.predict(X[1::4]), model.predict(scaler.transform(X[1::4])))
+    np.testing.assert_array_equal(scorer.predict_raw(X), model.predict(scaler.transform(X)))
+
+@pytest.mark.parametrize('value', [np.nan, np.inf])
+def test_rows_the_model_rejects_are_still_rejected(tmp_path, value):
+    scorer, model, scaler = save_scorer(
+        tmp_path, GradientBoostingRegressor(n_estimators=20, max_depth=3, random_state=0), StandardScaler()
+    )
+    X = raw_rows(3, seed=3)
+    X[1, 4] = value
+    with pytest.raises(ValueError):
+        model.predict(scaler.transform(X))
+    with pytest.raises(ValueError):
+        scorer.predict_raw(X)
@@ -0,0 +1,78 @@
+"""MicroBatcher must keep collecting while batches predict and must not leave rows behind on overload"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from micro_batching import MicroBatcher
+from serving import ServerOverloaded
+
+class BlockingPool:
+    """submit_fn whose predictions (row sums) wait until released, recording every batch"""
+
+    def __init__(self):
+        self.batches = []
+        self.submitted = threading.Semaphore(0)
+        self.release = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=4)
+
+    def __call__(self, matrix, key):
+        self.batches.append(matrix.copy())
+        self.submitted.release()
+        return self._pool.submit(self._predict, matrix)
+
+    def _predict(self, matrix):
+        assert self.release.wait(5)
+        return matrix.sum(axis=1)
+
+    def shutdown(self):
+        self.release.set()
+        self._pool.shutdown()
+
+@pytest.fixture
+def pool():
+    pool = BlockingPool()
+    yield pool
+    pool.shutdown()
+
+def test_batches_are_flushed_while_earlier_ones_predict(pool):
+    batcher = MicroBatcher(pool, max_batch_size=2, max_wait_ms=1000)
+    first = [batcher.submit([1.0, 2.0]), batcher.submit([3.0, 4.0])]
+    assert pool.submitted.acquire(timeout=5)
+    second = [batcher.submit([5.0, 6.0]), batcher.submit([7.0, 8.0])]
+    # The second batch goes out while the first is still predicting
+    assert pool.submitted.acquire(timeout=5)
+    assert not any(future.done() for future in first + second)
+
+    pool.release.set()
+    assert [future.result(timeout=5) for future in first + second] == [3.0, 7.0, 11.0, 15.0]
+
+def test_predict_withdraws_its_rows_when_the_queue_fills(pool):
+    batcher = MicroBatcher(pool, max_batch_size=64, max_wait_ms=60_000, max_queue=3)
+    with pytest.raises(ServerOverloaded):
+        batcher.predict(np.ones((5, 2)))
+    assert batcher.stats()['queued'] == 0
+    assert pool.batches == []
+
+def test_cancelled_rows_are_left_out_of_the_batch(pool):
+    batcher = MicroBatcher(pool, max_batch_size=3, max_wait_ms=1000)
+    cancelled = batcher.submit([1.0, 1.0])
+    assert cancelled.cancel()
+    kept = [batcher.submit([2.0, 2.0]), batcher.submit([3.0, 3.0])]
+    batcher.submit([4.0, 4.0]).cancel()
+    assert pool.submitted.acquire(timeout=5)
+    pool.release.set()
+    assert [future.result(timeout=5) for future in kept] == [4.0, 6.0]
+    np.testing.assert_array_equal(pool.batches[0], [[2.0, 2.0], [3.0, 3.0]])
+
+def test_submit_errors_reach_every_caller():
+    def overloaded(matrix, key):
+        raise ServerOverloaded()
+
+    batcher = MicroBatcher(overloaded, max_batch_size=2, max_wait_ms=1000)
+    futures = [batcher.submit([1.0]), batcher.submit([2.0])]
+    for future in futures:
+        with pytest.raises(ServerOverloaded):
+            future.result(timeout=5)
@@ -0,0 +1,101 @@
+"""Hot reload, including in worker processes forked from a master that loaded the model"""
+
+import importlib
+import os
+import pickle
+import runpy
+import subprocess
+import sys
+import time
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.dummy import DummyRegressor
+
+from conftest import ML_DIR
+
+N_API_FEATURES = 11
+
+def save_constant_model(path, score):
+    model = DummyRegressor(strategy='constant', constant=score).fit(np.zeros((2, N_API_FEATURES)), [score, score])
+    joblib.dump(model, path)
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """inference_api imported fresh, serving a constant-40 model that is polled every 50 ms"""
+    model_path = str(tmp_path / 'vendor_score_model.pkl')
+    save_constant_model(model_path, 40.0)
+    monkeypatch.setenv('MODEL_PATH', model_path)
+    monkeypatch.setenv('MODEL_RELOAD_INTERVAL', '0.05')
+    sys.modules.pop('inference_api', None)
+    module = importlib.import_module('inference_api')
+    module.create_app()
+    yield module
+    module.registry.stop_watching()
+    sys.modules.pop('inference_api', None)
+
+def in_worker(api, start_worker, wait=5.0):
+    """
+    Fork a 'worker', replace the model once it is running and return the
+    score the worker then serves, as gunicorn's workers would see it
+    """
+    ready_read, ready_write = os.pipe()
+    result_read, result_write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            start_worker()
+            os.write(ready_write, b'1')
+            deadline = time.monotonic() + wait
+            while api.registry.reloads == 0 and time.monotonic() < deadline:
+                time.sleep(0.02)
+            score = api.registry.active.predict(np.zeros((1, N_API_FEATURES)))[0]
+            os.write(result_write, f'{score}'.encode())
+            status = 0
+        finally:
+            os._exit(status)
+
+    # Closed here, a worker that died early gives EOF instead of a hang
+    os.close(ready_write)
+    os.close(result_write)
+    assert os.read(ready_read, 1) == b'1', 'worker failed to start'
+    # Quiet the master's watcher; the worker has no copy of that thread
+    api.registry.stop_watching()
+    model_path = os.environ['MODEL_PATH']
+    save_constant_model(model_path, 60.0)
+    os.utime(model_path, (time.time() + 5, time.time() + 5))
+    result = os.read(result_read, 64)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    return float(result)
+
+def test_worker_started_by_post_fork_reloads(api):
+    config = runpy.run_path(os.path.join(ML_DIR, 'gunicorn.conf.py'))
+    assert config['preload_app']
+    assert in_worker(api, lambda: config['post_fork'](None, None)) == 60.0
+
+def test_worker_reloads_after_first_request(api):
+    client = api.app.test_client()
+    assert in_worker(api, lambda: client.get('/health')) == 60.0
+
+def test_without_a_watcher_the_worker_keeps_the_old_model(api):
+    assert in_worker(api, lambda: None, wait=0.5) == 40.0
+
+def test_shard_spec_loads_without_the_api(api, tmp_path):
+    """A shard worker unpickles the spec in a fresh interpreter; that must not import the Flask app"""
+    spec_path = tmp_path / 'spec.pkl'
+    with open(spec_path, 'wb') as f:
+        pickle.dump(api.registry.active.spec, f)
+    script = (
+        'import pickle, sys\n'
+        f'sys.path.insert(0, {ML_DIR!r})\n'
+        f'loader, args, method, fingerprint = pickle.load(open({str(spec_path)!r}, "rb"))\n'
+        'handle = loader(*args)\n'
+        'assert handle.fingerprint == fingerprint\n'
+        'print(sorted(name for name in ("inference_api", "flask") if name in sys.modules))\n'
+    )
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1] == '[]'
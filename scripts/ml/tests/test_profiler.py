@@ -0,0 +1,52 @@
+"""SamplingProfiler must sample a request's predictions on the pool threads they run on"""
+
+import time
+
+import pytest
+
+from conftest import finite_rows
+from profiler import SamplingProfiler
+from serving import PredictionExecutor
+from tree_engine import CompiledEnsemble
+
+@pytest.fixture
+def profiler():
+    profiler = SamplingProfiler(interval=0.001, slow_threshold=0.0)
+    profiler.start()
+    yield profiler
+    profiler.stop()
+
+def predict_for(ensemble, X, seconds):
+    """Predict `X` over and over for `seconds`, as a slow request's model call"""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        ensemble.predict(X)
+
+def engine_stacks(profiler):
+    return [line for line in profiler.collapsed().splitlines() if 'tree_engine:predict' in line]
+
+def test_pool_predictions_are_sampled_with_their_request(models, test_rows, profiler):
+    ensemble = CompiledEnsemble.from_sklearn(models['RandomForest'])
+    X = finite_rows(models['RandomForest'], test_rows)
+    executor = PredictionExecutor(max_workers=1, wrap_task=profiler.bind)
+    try:
+        profiler.begin_request()
+        executor.run(predict_for, ensemble, X, 0.2)
+        profiler.end_request(0.2)
+    finally:
+        executor.shutdown()
+    stacks = engine_stacks(profiler)
+    assert stacks
+    assert all(line.startswith('threading:') and 'predict_for' in line for line in stacks)
+    # The pool thread is no longer sampled once its task is done
+    assert profiler._requests == {}
+
+def test_pool_predictions_outside_a_request_are_not_sampled(models, test_rows, profiler):
+    ensemble = CompiledEnsemble.from_sklearn(models['RandomForest'])
+    X = finite_rows(models['RandomForest'], test_rows)
+    executor = PredictionExecutor(max_workers=1, wrap_task=profiler.bind)
+    try:
+        executor.run(predict_for, ensemble, X, 0.05)
+    finally:
+        executor.shutdown()
+    assert profiler.samples == 0
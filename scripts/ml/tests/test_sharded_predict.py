@@ -0,0 +1,92 @@
+"""ShardPool must predict what the model predicts in-process, also after the model files are replaced"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+import sharded_predict
+from conftest import make_regression
+from model_artifact import load_artifact, save_artifact
+from model_registry import ModelHandle
+from sharded_predict import ModelUnavailable, ShardPool
+from tree_engine import CompiledEnsemble
+
+MODEL_VERSION = 'v1.0.0'
+
+def load_handle(artifact_path, metadata_path):
+    """Loader the workers run, as model_registry.load_model_handle() loads an artifact"""
+    engine = load_artifact(artifact_path, metadata_path=metadata_path)
+    return ModelHandle(engine, engine.model_version, engine=engine, source=artifact_path,
+                       loader=(load_handle, (artifact_path, metadata_path)))
+
+def save_model(directory, seed):
+    """Train and save a forest under the same paths and version every time, as train_model.py does"""
+    X, y = make_regression(500, seed=seed)
+    model = RandomForestRegressor(n_estimators=8, max_depth=6, random_state=seed).fit(X, y)
+    artifact_path = os.path.join(directory, 'vendor_score_model.bin')
+    metadata_path = os.path.join(directory, 'model_metadata.json')
+    info = save_artifact(CompiledEnsemble.from_sklearn(model), artifact_path, MODEL_VERSION)
+    with open(metadata_path, 'w') as f:
+        json.dump({'version': MODEL_VERSION, 'artifact': info}, f)
+    return load_handle(artifact_path, metadata_path)
+
+@pytest.fixture
+def pool():
+    pool = ShardPool(1, min_shard_rows=100)
+    yield pool
+    pool.shutdown()
+
+def test_sharded_matches_local_before_and_after_reload(tmp_path, pool):
+    X = make_regression(400, seed=9)[0]
+    old = save_model(str(tmp_path), seed=1)
+    np.testing.assert_array_equal(pool.predict(old.spec, X, old.predict), old.predict(X))
+
+    new = save_model(str(tmp_path), seed=2)
+    assert new.version == old.version
+    assert new.spec != old.spec
+    assert not np.array_equal(new.predict(X), old.predict(X))
+    np.testing.assert_array_equal(pool.predict(new.spec, X, new.predict), new.predict(X))
+    assert (pool.sharded_batches, pool.fallbacks) == (2, 0)
+
+    # An in-flight request on the old model finds its files gone and is scored in-process
+    np.testing.assert_array_equal(pool.predict(old.spec, X, old.predict), old.predict(X))
+    assert pool.fallbacks == 1
+
+class FakeModel:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+
+    def predict(self, X):
+        return self.fingerprint
+
+# Fingerprint of the model files behind each fake model name
+FAKE_FILES = {}
+
+def fake_loader(name):
+    return FakeModel(FAKE_FILES[name])
+
+def fake_spec(name, fingerprint):
+    return (fake_loader, (name,), 'predict', fingerprint)
+
+@pytest.fixture
+def worker(monkeypatch):
+    """This process standing in for a shard worker, with an empty model cache"""
+    monkeypatch.setattr(sharded_predict, '_models', sharded_predict.OrderedDict())
+    monkeypatch.setattr(sys.modules[__name__], 'FAKE_FILES', {'primary': 'a@1', 'variant': 'b@1'})
+    return sharded_predict
+
+def test_worker_drops_the_model_a_reload_replaced(worker):
+    worker._worker_model(fake_spec('primary', 'a@1'))
+    worker._worker_model(fake_spec('variant', 'b@1'))
+    FAKE_FILES['primary'] = 'a@2'
+    assert worker._worker_model(fake_spec('primary', 'a@2'))(None) == 'a@2'
+    assert list(worker._models) == [fake_spec('variant', 'b@1'), fake_spec('primary', 'a@2')]
+
+def test_worker_refuses_a_model_whose_files_changed(worker):
+    FAKE_FILES['primary'] = 'a@2'
+    with pytest.raises(ModelUnavailable, match='Expected model a@1, loaded a@2'):
+        worker._worker_model(fake_spec('primary', 'a@1'))
@@ -0,0 +1,68 @@
+"""The typed training loader must read what an untyped pd.read_csv reads, in its compact dtypes"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import training_frame
+from training_data import INTEGER_COLUMNS, TRAINING_DTYPES, iter_training_chunks, read_training_csv
+
+@pytest.fixture
+def sparse_csv(tmp_path):
+    """A training CSV whose rows 0:100 are complete and whose later rows leave some counts blank"""
+    df = training_frame(300, seed=11)
+    df.loc[150, 'incident_count'] = np.nan
+    df.loc[[160, 250], 'high_risk_flag'] = np.nan
+    path = str(tmp_path / 'vendor_training_data.csv')
+    # Integer columns with a blank are written as whole numbers, as an export would
+    df.to_csv(path, index=False, float_format='%.6g')
+    return path
+
+def assert_reads_like_untyped_csv(df, path):
+    expected = pd.read_csv(path)
+    for column in TRAINING_DTYPES:
+        if column == 'vendor_id':
+            assert df[column].astype(str).tolist() == expected[column].tolist()
+        else:
+            np.testing.assert_allclose(df[column].to_numpy(np.float64), expected[column], rtol=1e-6, err_msg=column)
+
+def test_blank_count_cells_read_as_nan(sparse_csv):
+    df = read_training_csv(sparse_csv)
+    assert_reads_like_untyped_csv(df, sparse_csv)
+    assert df['incident_count'].dtype == np.float32
+    assert df['high_risk_flag'].dtype == np.float32
+    assert np.isnan(df.loc[150, 'incident_count'])
+    for column in set(INTEGER_COLUMNS) - {'incident_count', 'high_risk_flag'}:
+        assert df[column].dtype == TRAINING_DTYPES[column], column
+
+def test_only_chunks_with_blanks_widen(sparse_csv):
+    chunks = list(read_training_csv(sparse_csv, chunksize=100))
+    assert [chunk['incident_count'].dtype for chunk in chunks] == [np.int16, np.float32, np.int16]
+    assert [chunk['high_risk_flag'].dtype for chunk in chunks] == [np.int8, np.float32, np.float32]
+
+def test_fractional_counts_are_not_truncated(tmp_path):
+    df = training_frame(20, seed=12)
+    df['years_in_business'] = df['years_in_business'].astype(float)
+    df.loc[3, 'years_in_business'] = 7.5
+    path = str(tmp_path / 'vendor_training_data.csv')
+    df.to_csv(path, index=False)
+    assert read_training_csv(path).loc[3, 'years_in_business'] == 7.5
+
+def test_cache_keeps_blank_counts(sparse_csv, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    parsed = pd.concat(iter_training_chunks(sparse_csv, chunksize=100, cache_dir=cache_dir))
+    cached = pd.concat(iter_training_chunks(sparse_csv, chunksize=100, cache_dir=cache_dir))
+    assert np.load(f'{cache_dir}/incident_count.npy').dtype == np.float32
+    assert np.load(f'{cache_dir}/team_size.npy').dtype == np.int32
+    assert_reads_like_untyped_csv(parsed, sparse_csv)
+    assert_reads_like_untyped_csv(cached, sparse_csv)
+    assert cached.index.equals(pd.RangeIndex(0, 300))
+
+def test_start_row_skips_data_rows(sparse_csv):
+    df = read_training_csv(sparse_csv)
+    chunks = list(iter_training_chunks(sparse_csv, chunksize=100, start_row=140))
+    assert [chunk.index[0] for chunk in chunks] == [140, 240]
+    tail = pd.concat(chunks)
+    assert tail.index.equals(pd.RangeIndex(140, 300))
+    pd.testing.assert_frame_equal(tail.drop(columns='vendor_id'), df.iloc[140:].drop(columns='vendor_id'), check_dtype=False)
+    assert tail['vendor_id'].astype(str).tolist() == df['vendor_id'].astype(str).iloc[140:].tolist()
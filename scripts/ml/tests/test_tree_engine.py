@@ -0,0 +1,67 @@
+"""CompiledEnsemble must predict exactly what the sklearn model it was compiled from predicts"""
+
+import numpy as np
+import pytest
+
+from conftest import finite_rows
+from tree_engine import CompiledEnsemble, compile_model
+
+MODEL_NAMES = ['RandomForest', 'RandomForest-missing', 'ExtraTrees', 'RandomForest-multi', 'GradientBoosting']
+
+@pytest.mark.parametrize('name', MODEL_NAMES)
+def test_batch_matches_sklearn(models, test_rows, name):
+    model = models[name]
+    X = finite_rows(model, test_rows)
+    np.testing.assert_allclose(CompiledEnsemble.from_sklearn(model).predict(X), model.predict(X), rtol=0, atol=1e-9)
+
+@pytest.mark.parametrize('name', MODEL_NAMES)
+def test_single_rows_match_sklearn(models, test_rows, name):
+    model = models[name]
+    ensemble = CompiledEnsemble.from_sklearn(model)
+    X = finite_rows(model, test_rows)[:40]
+    for row in X:
+        np.testing.assert_allclose(ensemble.predict(row[None]), model.predict(row[None]), rtol=0, atol=1e-9)
+
+@pytest.mark.parametrize('name', ['RandomForest', 'RandomForest-missing', 'ExtraTrees'])
+def test_nan_follows_each_split_like_sklearn(models, test_rows, name):
+    # Leaves, not just predictions, so a NaN sent the wrong way cannot hide
+    model = models[name]
+    ensemble = CompiledEnsemble.from_sklearn(model)
+    X = test_rows[np.isnan(test_rows).any(axis=1)]
+    assert len(X)
+    expected = np.array([tree.apply(X.astype(np.float32)) for tree in model.estimators_])
+    offsets = ensemble.roots[:, None]
+    np.testing.assert_array_equal(ensemble.apply(X) - offsets, expected)
+
+def test_boosting_rejects_nan_like_sklearn(models):
+    model = models['GradientBoosting']
+    X = np.full((1, model.n_features_in_), 50.0)
+    X[0, 2] = np.nan
+    with pytest.raises(ValueError):
+        model.predict(X)
+    with pytest.raises(ValueError, match='NaN'):
+        CompiledEnsemble.from_sklearn(model).predict(X)
+
+@pytest.mark.filterwarnings('ignore:overflow encountered in cast')
+@pytest.mark.parametrize('value', [np.inf, -np.inf, 1e300])
+def test_infinity_rejected(models, value):
+    X = np.full((2, models['RandomForest'].n_features_in_), 50.0)
+    X[1, 0] = value
+    with pytest.raises(ValueError, match='infinity'):
+        CompiledEnsemble.from_sklearn(models['RandomForest']).predict(X)
+
+def test_state_round_trip_keeps_missing_routing(models, test_rows):
+    ensemble = CompiledEnsemble.from_sklearn(models['RandomForest-missing'])
+    restored = CompiledEnsemble.from_state(*ensemble.to_state())
+    np.testing.assert_array_equal(restored.predict(test_rows), ensemble.predict(test_rows))
+
+def test_state_without_missing_routing_rejects_nan(models, test_rows):
+    # Artifacts saved before missing_left was exported cannot route NaN
+    params, arrays = CompiledEnsemble.from_sklearn(models['RandomForest']).to_state()
+    del arrays['missing_left']
+    with pytest.raises(ValueError, match='NaN'):
+        CompiledEnsemble.from_state(params, arrays).predict(test_rows)
+
+def test_unsupported_model_is_not_compiled():
+    from sklearn.linear_model import LinearRegression
+    assert compile_model(LinearRegression().fit(np.eye(3), np.arange(3))) is None
@@ -0,0 +1,105 @@
+"""TreeExplainer values must add up to the prediction and match Shapley values computed the slow way"""
+
+import itertools
+import math
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from compact_model import compact
+from conftest import finite_rows, make_regression, with_missing
+from tree_engine import CompiledEnsemble
+from tree_explainer import TreeExplainer
+
+MODEL_NAMES = ['RandomForest', 'RandomForest-missing', 'ExtraTrees', 'RandomForest-multi', 'GradientBoosting']
+
+@pytest.mark.parametrize('name', MODEL_NAMES)
+def test_values_add_up_to_prediction(models, test_rows, name):
+    model = models[name]
+    ensemble = CompiledEnsemble.from_sklearn(model)
+    X = finite_rows(model, test_rows)
+    prediction = ensemble.predict(X)
+    for output in range(ensemble.n_outputs):
+        explainer = TreeExplainer(ensemble, output=output)
+        values = explainer.shap_values(X)
+        expected = prediction if prediction.ndim == 1 else prediction[:, output]
+        np.testing.assert_allclose(explainer.expected_value + values.sum(axis=1), expected, rtol=0, atol=1e-9)
+
+def test_single_rows_match_batch(models, test_rows):
+    explainer = TreeExplainer(CompiledEnsemble.from_sklearn(models['RandomForest-missing']))
+    batch = explainer.shap_values(test_rows[:30])
+    for i in range(30):
+        np.testing.assert_allclose(explainer.shap_values(test_rows[i:i + 1])[0], batch[i], rtol=0, atol=1e-12)
+
+@pytest.mark.parametrize('mode', ['float32', 'uint16'])
+def test_compact_model_explains_like_the_full_one(models, test_rows, mode):
+    ensemble = CompiledEnsemble.from_sklearn(models['RandomForest-missing'])
+    compacted = compact(ensemble, mode)
+    values = TreeExplainer(compacted).shap_values(test_rows)
+    # Covers and leaf values are float32 in the compact model
+    np.testing.assert_allclose(values, TreeExplainer(ensemble).shap_values(test_rows), rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(TreeExplainer(compacted).expected_value + values.sum(axis=1),
+                               compacted.predict(test_rows), rtol=0, atol=1e-9)
+
+def brute_force_shap(model, x):
+    """
+    Shapley values of the path-dependent tree expectation, subset by subset
+
+    A feature outside the subset follows both children, weighted by the
+    training samples that went each way.
+    """
+    n_features = len(x)
+    x32 = x.astype(np.float32)
+
+    def expectation(tree, node, subset):
+        if tree.children_left[node] < 0:
+            return tree.value[node, 0, 0]
+        left, right = tree.children_left[node], tree.children_right[node]
+        feature = tree.feature[node]
+        if feature in subset:
+            if np.isnan(x32[feature]):
+                goes_left = tree.missing_go_to_left[node]
+            else:
+                goes_left = x32[feature] <= tree.threshold[node]
+            return expectation(tree, left if goes_left else right, subset)
+        weights = tree.weighted_n_node_samples
+        return (weights[left] * expectation(tree, left, subset) +
+                weights[right] * expectation(tree, right, subset)) / weights[node]
+
+    def value(subset):
+        return np.mean([expectation(estimator.tree_, 0, subset) for estimator in model.estimators_])
+
+    phi = np.zeros(n_features)
+    for i in range(n_features):
+        others = [j for j in range(n_features) if j != i]
+        for size in range(n_features):
+            weight = math.factorial(size) * math.factorial(n_features - size - 1) / math.factorial(n_features)
+            for subset in itertools.combinations(others, size):
+                phi[i] += weight * (value(set(subset) | {i}) - value(set(subset)))
+    return value(set()), phi
+
+def test_matches_brute_force_shapley_values():
+    X, y = make_regression(400, seed=3)
+    model = RandomForestRegressor(n_estimators=4, max_depth=5, random_state=0).fit(with_missing(X, 0.1), y)
+    explainer = TreeExplainer(CompiledEnsemble.from_sklearn(model))
+    rows = with_missing(make_regression(6, seed=4)[0], 0.2, seed=5)
+    values = explainer.shap_values(rows)
+    for row, row_values in zip(rows, values):
+        expected_value, phi = brute_force_shap(model, row)
+        assert explainer.expected_value == pytest.approx(expected_value, abs=1e-9)
+        np.testing.assert_allclose(row_values, phi, rtol=0, atol=1e-9)
+
+def test_model_without_covers_is_refused(models):
+    ensemble = CompiledEnsemble.from_sklearn(models['RandomForest'])
+    params, arrays = ensemble.to_state()
+    del arrays['cover']
+    with pytest.raises(ValueError, match='covers'):
+        TreeExplainer(CompiledEnsemble.from_state(params, arrays))
+
+def test_boosting_rejects_nan(models):
+    explainer = TreeExplainer(CompiledEnsemble.from_sklearn(models['GradientBoosting']))
+    X = np.full((1, explainer.n_features), 50.0)
+    X[0, 0] = np.nan
+    with pytest.raises(ValueError, match='NaN'):
+        explainer.shap_values(X)
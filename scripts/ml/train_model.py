@@ -5,12 +5,21 @@ This script trains machine learning models to predict vendor performance scores
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import joblib
 import json
+import os
+from feature_store import (
+    aggregate_groups, aggregate_training_csv, compute_target, integer_columns, update_from_csv,
+    vendor_feature_table
+)
+from training_data import read_training_csv
+from compact_model import compact_artifact
+from model_artifact import save_artifact
+from model_selection import default_candidates, select_model, shared_training_data, successive_halving
+from synthetic_data import iter_training_data
+from tree_engine import CompiledEnsemble
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
@@ -18,56 +27,78 @@ warnings.filterwarnings('ignore')
 # Configuration
 MODEL_VERSION = 'v1.0.0'
 MODEL_PATH = 'models/vendor_scoring_model.pkl'
+ARTIFACT_PATH = 'models/vendor_scoring_model.bin'
+COMPACT_PATH = 'models/vendor_scoring_model.compact.bin'
 SCALER_PATH = 'models/feature_scaler.pkl'
 METADATA_PATH = 'models/model_metadata.json'
+DATA_PATH = 'data/vendor_training_data.csv'
+# Set to e.g. models/vendor_feature_store.npz to aggregate only rows appended since the last run
+FEATURE_STORE_PATH = os.environ.get('FEATURE_STORE_PATH', '')
+# Rows parsed per chunk, and an optional directory for a columnar cache of the CSV
+TRAINING_CHUNK_ROWS = int(os.environ.get('TRAINING_CHUNK_ROWS', '1000000'))
+TRAINING_CACHE_DIR = os.environ.get('TRAINING_CACHE_DIR', '') or None
+# Processes for fitting candidate models and CV folds; 0 uses every CPU
+MODEL_SELECTION_WORKERS = int(os.environ.get('MODEL_SELECTION_WORKERS', '0'))
+# Opt in to one multi-output model for the overall and component scores.
+# Off by default: the component targets are still being validated, the
+# candidates then exclude GradientBoosting, and the API's component scores
+# change (see "Calculate Vendor Score" in API_DOCUMENTATION.md)
+COMPONENT_MODEL = os.environ.get('COMPONENT_MODEL', 'false').lower() == 'true'
+# Tune each candidate by successive halving before the final selection:
+# configurations per candidate, the promotion factor, and whether early
+# rounds get fewer trees or fewer training rows
+HYPERPARAMETER_SEARCH = os.environ.get('HYPERPARAMETER_SEARCH', 'false').lower() == 'true'
+SEARCH_CONFIGS = int(os.environ.get('SEARCH_CONFIGS', '27'))
+SEARCH_ETA = int(os.environ.get('SEARCH_ETA', '3'))
+SEARCH_RESOURCE = os.environ.get('SEARCH_RESOURCE', 'trees')
+# Also write a quantized copy of the artifact: float32, uint16 or uint8 thresholds (see compact_model.py)
+MODEL_COMPACTION = os.environ.get('MODEL_COMPACTION', '')
 
-def load_data(csv_path='data/vendor_training_data.csv'):
+# Display names for the candidate models
+MODEL_LABELS = {'RandomForest': 'Random Forest', 'GradientBoosting': 'Gradient Boosting', 'ExtraTrees': 'Extra Trees'}
+
+def load_data(csv_path=DATA_PATH):
     """Load and prepare training data"""
     print("Loading training data...")
-    df = pd.read_csv(csv_path)
+    df = read_training_csv(csv_path)
     return df
 
+def engineer_vendor_features(df):
+    """
+    Per-vendor feature table, one row per vendor in order of first appearance
+    
+    vendor_id is factorized once and every mean/sum/max/count aggregate is
+    computed from the codes in a single grouped pass (see
+    feature_store.aggregate_groups). Returns the table and the row codes.
+    """
+    codes, vendor_ids = pd.factorize(df['vendor_id'])
+    aggregates = aggregate_groups(df, codes, len(vendor_ids))
+    table = vendor_feature_table(
+        aggregates['rows'], aggregates['sum'], aggregates['non_null'], aggregates['max'],
+        integer_columns(df)
+    )
+    table.index = pd.Index(vendor_ids, name='vendor_id')
+    return table, codes
+
 def engineer_features(df):
     """Create features for ML model"""
     print("Engineering features...")
     
-    features = pd.DataFrame()
-    
-    # Performance metrics
-    features['avg_delivery_success'] = df.groupby('vendor_id')['delivery_success_rate'].transform('mean')
-    features['avg_quality_score'] = df.groupby('vendor_id')['quality_score'].transform('mean')
-    features['avg_cost_efficiency'] = df.groupby('vendor_id')['cost_efficiency'].transform('mean')
-    features['avg_compliance_score'] = df.groupby('vendor_id')['compliance_score'].transform('mean')
-    
-    # Project complexity indicators
-    features['avg_contract_value'] = df.groupby('vendor_id')['contract_value'].transform('mean')
-    features['total_projects'] = df.groupby('vendor_id')['vendor_id'].transform('count')
-    features['incident_rate'] = df.groupby('vendor_id')['incident_count'].transform('mean')
-    
-    # Time-based features
-    features['avg_response_time'] = df.groupby('vendor_id')['response_time_hours'].transform('mean')
-    
-    # External review features
-    features['avg_external_rating'] = df.groupby('vendor_id')['external_rating'].transform('mean')
-    features['total_reviews'] = df.groupby('vendor_id')['review_count'].transform('sum')
+    # Performance, complexity, response time, reviews, capability and risk
+    # aggregates per vendor; see feature_store.VENDOR_AGGREGATES
+    table, codes = engineer_vendor_features(df)
     
-    # Capability features
-    features['cert_count'] = df.groupby('vendor_id')['certification_count'].transform('max')
-    features['years_in_business'] = df.groupby('vendor_id')['years_in_business'].transform('max')
-    features['team_size'] = df.groupby('vendor_id')['team_size'].transform('max')
-    
-    # Risk indicators
-    features['high_risk_incidents'] = df.groupby('vendor_id')['high_risk_flag'].transform('sum')
-    features['compliance_issues'] = df.groupby('vendor_id')['compliance_issue'].transform('sum')
+    # Broadcast back to one row per project
+    features = table.reset_index(drop=True)
+    if codes.size and codes.min() < 0:
+        # Rows without a vendor_id get NaN, as groupby().transform() gives them
+        features.loc[len(features)] = np.nan
+        codes = np.where(codes < 0, len(features) - 1, codes)
+    features = features.take(codes)
+    features.index = df.index
     
     # Target variable: Overall vendor score
-    target = (
-        df['delivery_success_rate'] * 0.35 +
-        df['quality_score'] * 0.25 +
-        df['cost_efficiency'] * 0.20 +
-        df['compliance_score'] * 0.10 +
-        df['external_rating'] * 20 * 0.10  # Convert 0-5 to 0-100
-    )
+    target = compute_target(df)
     
     return features, target
 
@@ -85,62 +116,45 @@ def train_model(X, y):
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
     
-    # Train Random Forest model
-    print("Training Random Forest...")
-    rf_model = RandomForestRegressor(
-        n_estimators=200,
-        max_depth=15,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        random_state=42,
-        n_jobs=-1
-    )
-    rf_model.fit(X_train_scaled, y_train)
-    
-    # Train Gradient Boosting model
-    print("Training Gradient Boosting...")
-    gb_model = GradientBoostingRegressor(
-        n_estimators=150,
-        max_depth=5,
-        learning_rate=0.1,
-        random_state=42
-    )
-    gb_model.fit(X_train_scaled, y_train)
+    # Fit the candidates, each with its CV folds, in parallel; a target
+    # frame trains one multi-output forest for every score
+    outputs = list(y.columns) if isinstance(y, pd.DataFrame) else None
+    candidates = default_candidates(multi_output=outputs is not None)
+    labels = {name: MODEL_LABELS.get(name, name) for name in candidates}
+    search = None
+    # The scaled splits and CV folds are written once and shared by the
+    # search and the final selection
+    with shared_training_data(X_train_scaled, np.asarray(y_train), X_test_scaled, np.asarray(y_test)) as data_dir:
+        if HYPERPARAMETER_SEARCH:
+            candidates, search = search_hyperparameters(X_train_scaled, np.asarray(y_train), candidates, labels, data_dir)
+        print(f"Training {' and '.join(labels.values())} ({MODEL_SELECTION_WORKERS or 'all'} workers)...")
+        model_type, best_model, report = select_model(
+            X_train_scaled, np.asarray(y_train), X_test_scaled, np.asarray(y_test),
+            candidates=candidates, max_workers=MODEL_SELECTION_WORKERS, data_dir=data_dir
+        )
     
     # Evaluate both models
     print("\nEvaluating models...")
-    rf_pred = rf_model.predict(X_test_scaled)
-    gb_pred = gb_model.predict(X_test_scaled)
-    
-    rf_rmse = np.sqrt(mean_squared_error(y_test, rf_pred))
-    gb_rmse = np.sqrt(mean_squared_error(y_test, gb_pred))
-    
-    rf_r2 = r2_score(y_test, rf_pred)
-    gb_r2 = r2_score(y_test, gb_pred)
-    
-    rf_mae = mean_absolute_error(y_test, rf_pred)
-    gb_mae = mean_absolute_error(y_test, gb_pred)
-    
-    print(f"Random Forest - RMSE: {rf_rmse:.2f}, R²: {rf_r2:.3f}, MAE: {rf_mae:.2f}")
-    print(f"Gradient Boosting - RMSE: {gb_rmse:.2f}, R²: {gb_r2:.3f}, MAE: {gb_mae:.2f}")
+    for name, label in labels.items():
+        scores = report['candidates'][name]
+        print(f"{label} - RMSE: {scores['rmse']:.2f}, R²: {scores['r2']:.3f}, MAE: {scores['mae']:.2f}")
+    if 'GradientBoosting' in report['candidates']:
+        print(f"Gradient Boosting stopped after {report['candidates']['GradientBoosting']['n_estimators']} rounds")
     
     # Select best model
-    if rf_r2 > gb_r2:
-        print("\nRandom Forest selected as best model")
-        best_model = rf_model
-        best_score = rf_r2
-        model_type = "RandomForest"
-    else:
-        print("\nGradient Boosting selected as best model")
-        best_model = gb_model
-        best_score = gb_r2
-        model_type = "GradientBoosting"
+    best = report['candidates'][model_type]
+    print(f"\n{labels[model_type]} selected as best model")
+    if outputs:
+        print("Holdout R² per output: " + ', '.join(f"{name} {r2:.3f}" for name, r2 in zip(outputs, best['output_r2'])))
     
     # Cross-validation
-    cv_scores = cross_val_score(best_model, X_train_scaled, y_train, cv=5, 
-                                 scoring='r2', n_jobs=-1)
-    print(f"Cross-validation R² scores: {cv_scores}")
-    print(f"Mean CV R²: {cv_scores.mean():.3f} (+/- {cv_scores.std() * 2:.3f})")
+    print(f"Cross-validation R² scores: {np.array(best['cv_scores'])}")
+    print(f"Mean CV R²: {best['cv_mean']:.3f} (+/- {best['cv_std'] * 2:.3f})")
+    print(
+        f"Model selection: {report['tasks']} fits on {report['workers']} workers in "
+        f"{report['wall_seconds']:.1f}s wall, {report['cpu_seconds']:.1f}s CPU "
+        f"({report['cpu_utilization']:.0%} of {os.cpu_count()} CPUs)"
+    )
     
     # Feature importance
     feature_importance = pd.DataFrame({
@@ -151,15 +165,47 @@ def train_model(X, y):
     print("\nTop 10 Feature Importances:")
     print(feature_importance.head(10))
     
-    return best_model, scaler, {
+    metrics = {
         'model_type': model_type,
-        'r2_score': float(best_score),
-        'rmse': float(rf_rmse if model_type == "RandomForest" else gb_rmse),
-        'mae': float(rf_mae if model_type == "RandomForest" else gb_mae),
-        'cv_mean': float(cv_scores.mean()),
-        'cv_std': float(cv_scores.std()),
-        'feature_importance': feature_importance.to_dict('records')[:20]
+        'r2_score': best['r2'],
+        'rmse': best['rmse'],
+        'mae': best['mae'],
+        'cv_mean': best['cv_mean'],
+        'cv_std': best['cv_std'],
+        'feature_importance': feature_importance.to_dict('records')[:20],
+        'model_selection': report
     }
+    if outputs:
+        metrics['outputs'] = outputs
+        metrics['output_r2'] = dict(zip(outputs, best['output_r2']))
+    if search:
+        metrics['best_config'] = search['best'][model_type]['params']
+        metrics['hyperparameter_search'] = search
+    return best_model, scaler, metrics
+
+def search_hyperparameters(X_train, y_train, candidates, labels, data_dir):
+    """Tune the candidates by successive halving and print how each round narrowed them down"""
+    print(
+        f"Searching {SEARCH_CONFIGS} configurations per model by successive halving "
+        f"(eta={SEARCH_ETA}, early rounds on fewer {SEARCH_RESOURCE})..."
+    )
+    tuned, search = successive_halving(
+        X_train, y_train, candidates, n_configs=SEARCH_CONFIGS, eta=SEARCH_ETA, resource=SEARCH_RESOURCE,
+        max_workers=MODEL_SELECTION_WORKERS, data_dir=data_dir
+    )
+    for entry in search['rounds']:
+        per_model = ', '.join(
+            f"{labels[name]} {entry['configs'][name]} at {entry['budget'][name]} -> {entry['best_cv_r2'][name]:.3f}"
+            for name in entry['configs']
+        )
+        print(f"  Round {entry['round'] + 1}: {per_model} ({entry['fits']} fits, {entry['wall_seconds']:.1f}s)")
+    for name, best in search['best'].items():
+        print(f"  Best {labels[name]}: {best['params']} (CV R² {best['cv_mean']:.3f})")
+    print(
+        f"  Search took {search['wall_seconds']:.1f}s wall, {search['fit_seconds']:.1f}s of fits; scoring every "
+        f"configuration at full size would take about {search['exhaustive_fit_seconds_estimate']:.1f}s of fits"
+    )
+    return tuned, search
 
 def save_model(model, scaler, metrics):
     """Save trained model and metadata"""
@@ -169,6 +215,10 @@ def save_model(model, scaler, metrics):
     joblib.dump(model, MODEL_PATH)
     print(f"Model saved to {MODEL_PATH}")
     
+    # Save the flattened trees as a memory-mappable artifact
+    artifact = save_artifact(CompiledEnsemble.from_sklearn(model), ARTIFACT_PATH, MODEL_VERSION)
+    print(f"Model artifact saved to {ARTIFACT_PATH}")
+    
     # Save scaler
     joblib.dump(scaler, SCALER_PATH)
     print(f"Scaler saved to {SCALER_PATH}")
@@ -177,46 +227,33 @@ def save_model(model, scaler, metrics):
     metadata = {
         'version': MODEL_VERSION,
         'trained_at': datetime.now().isoformat(),
-        'metrics': metrics
+        'metrics': metrics,
+        'artifact': artifact
     }
+    if 'outputs' in metrics:
+        # Names of the model's outputs, in column order, for the serving code
+        metadata['outputs'] = metrics['outputs']
     
     with open(METADATA_PATH, 'w') as f:
         json.dump(metadata, f, indent=2)
     print(f"Metadata saved to {METADATA_PATH}")
+    
+    if MODEL_COMPACTION:
+        report = compact_artifact(ARTIFACT_PATH, METADATA_PATH, MODEL_COMPACTION, COMPACT_PATH)
+        print(f"Compact {MODEL_COMPACTION} model saved to {COMPACT_PATH} "
+              f"({report['compact_bytes'] / 1e6:.1f} MB, max drift {report['max_abs_drift']:.2e})")
 
 def generate_sample_data():
     """Generate sample training data for demonstration"""
     print("Generating sample training data...")
     
-    np.random.seed(42)
+    # Same column distributions as synthetic_data.py at any scale
     n_vendors = 50
-    n_projects_per_vendor = np.random.randint(2, 10, n_vendors)
+    df = pd.concat(iter_training_data(n_vendors, seed=42), ignore_index=True)
+    df['vendor_id'] = df['vendor_id'].astype(str)
     
-    data = []
-    for vendor_id in range(n_vendors):
-        base_quality = np.random.uniform(60, 95)
-        
-        for _ in range(n_projects_per_vendor[vendor_id]):
-            data.append({
-                'vendor_id': f'VENDOR_{vendor_id:03d}',
-                'delivery_success_rate': np.clip(np.random.normal(base_quality, 10), 50, 100),
-                'quality_score': np.clip(np.random.normal(base_quality, 8), 50, 100),
-                'cost_efficiency': np.clip(np.random.normal(base_quality - 5, 12), 40, 100),
-                'compliance_score': np.clip(np.random.normal(90, 5), 70, 100),
-                'contract_value': np.random.uniform(50000, 500000),
-                'response_time_hours': np.random.uniform(1, 48),
-                'incident_count': np.random.poisson(1),
-                'external_rating': np.clip(np.random.normal(4.2, 0.5), 2.5, 5.0),
-                'review_count': np.random.randint(10, 500),
-                'certification_count': np.random.randint(1, 8),
-                'years_in_business': np.random.randint(3, 25),
-                'team_size': np.random.randint(10, 500),
-                'high_risk_flag': 1 if np.random.random() < 0.15 else 0,
-                'compliance_issue': 1 if np.random.random() < 0.1 else 0,
-            })
-    
-    df = pd.DataFrame(data)
-    df.to_csv('data/vendor_training_data.csv', index=False)
+    os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
+    df.to_csv(DATA_PATH, index=False)
     print(f"Generated {len(df)} training samples for {n_vendors} vendors")
     return df
 
@@ -227,14 +264,20 @@ def main():
     print("=" * 60)
     
     # Generate or load data
-    try:
-        df = load_data()
-    except FileNotFoundError:
+    if not os.path.exists(DATA_PATH):
         print("Training data not found. Generating sample data...")
-        df = generate_sample_data()
+        generate_sample_data()
     
-    # Engineer features
-    X, y = engineer_features(df)
+    # Engineer features, streaming the CSV through the per-vendor aggregates
+    print("Engineering features...")
+    if FEATURE_STORE_PATH:
+        # Fold only the rows appended since the last run into the stored aggregates
+        store = update_from_csv(FEATURE_STORE_PATH, DATA_PATH, chunksize=TRAINING_CHUNK_ROWS)
+    else:
+        store = aggregate_training_csv(DATA_PATH, chunksize=TRAINING_CHUNK_ROWS, cache_dir=TRAINING_CACHE_DIR)
+    X, y = store.feature_frame()
+    if COMPONENT_MODEL:
+        y = store.target_frame()
     
     print(f"\nFeature matrix shape: {X.shape}")
     print(f"Target vector shape: {y.shape}")
@@ -0,0 +1,223 @@
+"""
+Streaming loader for the vendor training CSV
+Reads vendor_training_data.csv in chunks with a compact explicit schema and
+can keep a columnar .npy cache next to it so repeat runs skip CSV parsing
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# float32 metrics, the smallest ints that hold counts and flags, and a
+# categorical vendor_id: about 45 bytes a row instead of ~170 with defaults
+TRAINING_DTYPES = {
+    'vendor_id': 'category',
+    'delivery_success_rate': np.float32,
+    'quality_score': np.float32,
+    'cost_efficiency': np.float32,
+    'compliance_score': np.float32,
+    'contract_value': np.float32,
+    'response_time_hours': np.float32,
+    'incident_count': np.int16,
+    'external_rating': np.float32,
+    'review_count': np.int32,
+    'certification_count': np.int16,
+    'years_in_business': np.int16,
+    'team_size': np.int32,
+    'high_risk_flag': np.int8,
+    'compliance_issue': np.int8,
+}
+
+# Counts and flags are parsed as float64 and narrowed chunk by chunk: a
+# blank cell reads as NaN, and a chunk with one keeps that column float32
+INTEGER_COLUMNS = [
+    column for column, dtype in TRAINING_DTYPES.items() if dtype != 'category' and np.issubdtype(dtype, np.integer)
+]
+PARSE_DTYPES = {column: np.float64 if column in INTEGER_COLUMNS else dtype for column, dtype in TRAINING_DTYPES.items()}
+
+CACHE_FORMAT_VERSION = 1
+CACHE_MANIFEST = 'manifest.json'
+VENDOR_IDS_FILE = 'vendor_ids.npy'
+
+def csv_columns(csv_path):
+    """Column names from the CSV header"""
+    return list(pd.read_csv(csv_path, nrows=0).columns)
+
+def read_training_csv(csv_path, chunksize=None, start_row=0, columns=None):
+    """
+    pd.read_csv with the compact training schema
+
+    Returns one DataFrame, or an iterator of DataFrames when `chunksize`
+    is given. `start_row` skips that many data rows after the header.
+    `csv_path` may also be an open file positioned past the header, with
+    the header's `columns` given. Integer columns with a blank cell come
+    back as float32 with NaN, as an untyped read would give them, instead
+    of failing the read.
+    """
+    if columns is None and not start_row:
+        reader = pd.read_csv(csv_path, dtype=PARSE_DTYPES, chunksize=chunksize)
+    else:
+        if columns is None:
+            columns = csv_columns(csv_path)
+            start_row += 1
+        # An integer skiprows is skipped by the C tokenizer; a range of rows
+        # to skip is looked up row by row in Python
+        reader = pd.read_csv(csv_path, dtype=PARSE_DTYPES, header=None, names=columns,
+                             skiprows=start_row or None, chunksize=chunksize)
+    if chunksize is None:
+        return _narrow_integers(reader)
+    return (_narrow_integers(chunk) for chunk in reader)
+
+def _narrow_integers(df):
+    """Give each integer column its TRAINING_DTYPES type, unless it has NaN or fractions"""
+    for column in INTEGER_COLUMNS:
+        values = df[column].to_numpy()
+        if np.isnan(values).any() or (values % 1).any():
+            df[column] = values.astype(np.float32)
+        else:
+            df[column] = values.astype(TRAINING_DTYPES[column])
+    return df
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'path': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, CACHE_MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def cache_is_valid(cache_dir, csv_path):
+    """True when `cache_dir` holds a complete cache of the current `csv_path`"""
+    manifest = _read_manifest(cache_dir)
+    return (
+        manifest is not None
+        and manifest.get('format_version') == CACHE_FORMAT_VERSION
+        and manifest.get('source') == _source_signature(csv_path)
+    )
+
+def _column_path(cache_dir, column):
+    return os.path.join(cache_dir, f'{column}.npy')
+
+def _iter_cache(cache_dir, chunksize, start_row):
+    """Yield DataFrame chunks backed by the memory-mapped cache columns"""
+    manifest = _read_manifest(cache_dir)
+    n_rows = manifest['rows']
+    columns = {
+        column: np.load(_column_path(cache_dir, column), mmap_mode='r')
+        for column in TRAINING_DTYPES
+    }
+    vendor_ids = np.load(os.path.join(cache_dir, VENDOR_IDS_FILE))
+    categories = pd.Index(vendor_ids.astype(object))
+
+    for start in range(start_row, n_rows, chunksize):
+        stop = min(start + chunksize, n_rows)
+        chunk = {}
+        for column, values in columns.items():
+            if column == 'vendor_id':
+                chunk[column] = pd.Categorical.from_codes(np.asarray(values[start:stop]), categories=categories)
+            else:
+                chunk[column] = np.asarray(values[start:stop])
+        yield pd.DataFrame(chunk, index=pd.RangeIndex(start, stop))
+
+def _iter_csv_writing_cache(csv_path, chunksize, cache_dir):
+    """
+    Stream the CSV and write the columnar cache as a side effect
+
+    Column data is appended to raw files while streaming; once the CSV has
+    been read to the end they are converted to .npy and the cache directory
+    is swapped in, so an interrupted run never leaves a half-written cache.
+    """
+    source = _source_signature(csv_path)
+    tmp_dir = f'{cache_dir}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    vendor_index = {}
+    files = {column: open(os.path.join(tmp_dir, f'{column}.raw'), 'wb') for column in TRAINING_DTYPES}
+    # Integer columns are staged as float64 until every chunk is known to be whole
+    raw_dtypes = {column: np.float64 if column in INTEGER_COLUMNS else dtype for column, dtype in TRAINING_DTYPES.items()}
+    final_dtypes = dict(TRAINING_DTYPES)
+    n_rows = 0
+    try:
+        for chunk in read_training_csv(csv_path, chunksize=chunksize):
+            chunk_codes = chunk['vendor_id'].cat.codes.to_numpy()
+            if (chunk_codes < 0).any():
+                raise ValueError('vendor_id is missing for some rows; the training cache needs every row to have one')
+            category_codes = np.array(
+                [vendor_index.setdefault(vendor_id, len(vendor_index)) for vendor_id in chunk['vendor_id'].cat.categories],
+                dtype=np.int32
+            )
+            codes = category_codes[chunk_codes]
+            files['vendor_id'].write(codes.tobytes())
+            for column, dtype in raw_dtypes.items():
+                if column != 'vendor_id':
+                    files[column].write(chunk[column].to_numpy(dtype=dtype).tobytes())
+                if column in INTEGER_COLUMNS and chunk[column].dtype == np.float32:
+                    final_dtypes[column] = np.float32
+            chunk.index = pd.RangeIndex(n_rows, n_rows + len(chunk))
+            n_rows += len(chunk)
+            yield chunk
+    finally:
+        for f in files.values():
+            f.close()
+
+    for column, dtype in final_dtypes.items():
+        raw_path = os.path.join(tmp_dir, f'{column}.raw')
+        dtype = np.int32 if column == 'vendor_id' else dtype
+        raw_dtype = np.int32 if column == 'vendor_id' else raw_dtypes[column]
+        # Copy into a .npy a chunk at a time so no column is ever fully in memory
+        out = np.lib.format.open_memmap(_column_path(tmp_dir, column), mode='w+', dtype=dtype, shape=(n_rows,))
+        if n_rows:
+            raw = np.memmap(raw_path, dtype=raw_dtype, mode='r', shape=(n_rows,))
+            for start in range(0, n_rows, chunksize):
+                out[start:start + chunksize] = raw[start:start + chunksize]
+            del raw
+        out.flush()
+        del out
+        os.remove(raw_path)
+    np.save(os.path.join(tmp_dir, VENDOR_IDS_FILE), np.asarray(list(vendor_index), dtype=str))
+    with open(os.path.join(tmp_dir, CACHE_MANIFEST), 'w') as f:
+        json.dump({'format_version': CACHE_FORMAT_VERSION, 'source': source, 'rows': n_rows}, f, indent=2)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    print(f"✓ Training data cache written to {cache_dir} ({n_rows} rows)")
+
+def iter_training_chunks(csv_path, chunksize=1_000_000, cache_dir=None, start_row=0):
+    """
+    Yield the training data as typed DataFrame chunks
+
+    With `cache_dir`, chunks come from the columnar cache when it matches
+    the CSV's size and mtime; otherwise the CSV is parsed and the cache is
+    (re)built on the way. A `csv_path` that is a directory is read as a
+    columnar dataset in the cache layout, such as synthetic_data.py
+    --format npy writes. Chunk indexes continue the CSV's row numbers.
+    """
+    if os.path.isdir(csv_path):
+        yield from _iter_cache(csv_path, chunksize, start_row)
+        return
+
+    if cache_dir is None:
+        offset = start_row
+        for chunk in read_training_csv(csv_path, chunksize=chunksize, start_row=start_row):
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk
+        return
+
+    if cache_is_valid(cache_dir, csv_path):
+        yield from _iter_cache(cache_dir, chunksize, start_row)
+        return
+
+    for chunk in _iter_csv_writing_cache(csv_path, chunksize, cache_dir):
+        if chunk.index.stop <= start_row:
+            continue
+        if chunk.index.start < start_row:
+            chunk = chunk.loc[start_row:]
+        yield chunk
@@ -0,0 +1,362 @@
+"""
+Compiled tree-ensemble inference
+Flattens fitted RandomForest / GradientBoosting regressors into packed NumPy
+node arrays and evaluates every tree for a whole batch at once
+"""
+
+import numpy as np
+
+ENGINE_FORMAT_VERSION = 1
+
+# Upper bound on (tree, row) pairs traversed at once; keeps the working set
+# of a large batch in cache and its temporaries bounded
+MAX_CHUNK_PAIRS = 65536
+
+# Node arrays that make up an ensemble, in on-disk order
+ARRAY_FIELDS = ('feature', 'threshold', 'children', 'value', 'roots', 'base_score')
+
+class CompiledEnsemble:
+    """
+    Packed node arrays for a tree ensemble
+
+    All trees share one set of node arrays:
+        feature   intp    split feature of each node (0 for leaves)
+        threshold float64 split threshold, rows with x <= threshold go left
+        children  intp    (n_nodes, 2) left/right child; leaves point to themselves
+        value     float64 (n_nodes, n_outputs) leaf value, pre-multiplied by
+                          the tree weight (the learning rate for boosting)
+        roots     intp    root node of each tree
+        cover     float64 training samples (weighted) that reached each node;
+                          optional, used by tree_explainer.TreeExplainer
+        missing_left bool whether NaN goes left at each node (True at
+                          leaves); None for models whose predict rejects NaN
+
+    Index arrays are stored as intp so np.take never has to convert them.
+
+    Inputs are rounded to float32 before comparison, as sklearn does,
+    except for ensembles whose thresholds were moved to raw feature space
+    by fold_scaler(), which compare the float64 inputs directly. Inputs
+    sklearn would reject are rejected too: infinity always, NaN unless
+    the trees record where it goes (RandomForest / ExtraTrees).
+
+    A prediction is (base_score + sum of leaf values) / divisor, which gives
+    the RandomForest average (divisor = n_trees) and the GradientBoosting
+    raw prediction (base_score = init estimator, divisor = 1).
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth,
+                 n_features, base_score, divisor, model_type, feature_importances=None,
+                 float32_inputs=True, cover=None, missing_left=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.base_score = base_score
+        self.divisor = float(divisor)
+        self.model_type = model_type
+        self.feature_importances = feature_importances
+        self.float32_inputs = float32_inputs
+        self.cover = cover
+        self.missing_left = missing_left
+        self._missing_right = None if missing_left is None else ~np.asarray(missing_left, dtype=bool)
+        # Set by model_artifact.load_artifact
+        self.model_version = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_outputs(self):
+        return self.value.shape[1]
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted RandomForestRegressor, ExtraTreesRegressor or GradientBoostingRegressor"""
+        # Imported here so loading a saved artifact does not pull in sklearn
+        from sklearn.dummy import DummyRegressor
+        from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestRegressor
+
+        if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+            # Both average their trees; they differ only in how splits are chosen
+            trees = [est.tree_ for est in model.estimators_]
+            weight = 1.0
+            base_score = np.zeros(model.n_outputs_)
+            divisor = len(trees)
+            model_type = 'RandomForest' if isinstance(model, RandomForestRegressor) else 'ExtraTrees'
+            # Forests predict NaN down the side each split recorded (sklearn >= 1.3)
+            routes_missing = all(hasattr(tree, 'missing_go_to_left') for tree in trees)
+        elif isinstance(model, GradientBoostingRegressor):
+            trees = [est.tree_ for est in model.estimators_[:, 0]]
+            weight = model.learning_rate
+            if isinstance(model.init_, str) and model.init_ == 'zero':
+                base_score = np.zeros(1)
+            elif isinstance(model.init_, DummyRegressor):
+                base_score = np.asarray(model.init_.constant_, dtype=np.float64).ravel()
+            else:
+                raise ValueError(f'Unsupported init estimator: {model.init_!r}')
+            divisor = 1
+            model_type = 'GradientBoosting'
+            # GradientBoostingRegressor.predict rejects NaN
+            routes_missing = False
+        else:
+            raise ValueError(f'Unsupported model type: {type(model).__name__}')
+
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        n_nodes = offsets[-1]
+        n_outputs = trees[0].value.shape[1]
+
+        feature = np.zeros(n_nodes, dtype=np.intp)
+        threshold = np.zeros(n_nodes, dtype=np.float64)
+        children = np.zeros((n_nodes, 2), dtype=np.intp)
+        value = np.zeros((n_nodes, n_outputs), dtype=np.float64)
+        cover = np.zeros(n_nodes, dtype=np.float64)
+        missing_left = np.ones(n_nodes, dtype=bool) if routes_missing else None
+
+        for tree, offset in zip(trees, offsets[:-1]):
+            nodes = slice(offset, offset + tree.node_count)
+            node_ids = np.arange(offset, offset + tree.node_count, dtype=np.intp)
+            is_leaf = tree.children_left < 0
+
+            feature[nodes] = np.where(is_leaf, 0, tree.feature)
+            threshold[nodes] = np.where(is_leaf, 0.0, tree.threshold)
+            children[nodes, 0] = np.where(is_leaf, node_ids, tree.children_left + offset)
+            children[nodes, 1] = np.where(is_leaf, node_ids, tree.children_right + offset)
+            value[nodes] = tree.value[:, :, 0] * weight
+            cover[nodes] = tree.weighted_n_node_samples
+            if routes_missing:
+                missing_left[nodes] = is_leaf | (np.asarray(tree.missing_go_to_left) != 0)
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            children=children,
+            value=value,
+            roots=offsets[:-1].astype(np.intp),
+            max_depth=max(tree.max_depth for tree in trees),
+            n_features=model.n_features_in_,
+            base_score=base_score,
+            divisor=divisor,
+            model_type=model_type,
+            feature_importances=np.asarray(model.feature_importances_, dtype=np.float64),
+            cover=cover,
+            missing_left=missing_left,
+        )
+
+    def _validate(self, X):
+        # sklearn compares float32 inputs against float64 thresholds
+        if self.float32_inputs:
+            X = np.asarray(X, dtype=np.float32)
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f'Expected input of shape (n, {self.n_features}), got {X.shape}')
+        check_finite(X, allow_nan=self.missing_left is not None)
+        return X
+
+    def _is_missing(self, X):
+        """Which validated inputs are NaN"""
+        return np.isnan(X)
+
+    def _has_missing(self, X):
+        """Whether validated rows hold NaN, which then takes the slower routing below"""
+        return self.missing_left is not None and bool(self._is_missing(X).any())
+
+    def _chunks(self, n_rows):
+        """Row ranges holding about MAX_CHUNK_PAIRS (tree, row) pairs each"""
+        step = max(1, MAX_CHUNK_PAIRS // self.n_trees)
+        for start in range(0, n_rows, step):
+            yield start, min(n_rows, start + step)
+
+    def _apply_rows(self, X, missing=False):
+        n_rows = X.shape[0]
+        flat_X = X.ravel()
+        flat_children = self.children.ravel()
+
+        # Level-by-level: every (tree, row) pair moves down one level per step;
+        # pairs already at a leaf loop back to the same node. NaN compares
+        # False, so it goes left unless `missing` sends it right where the
+        # split says so
+        if n_rows == 1:
+            node = self.roots
+            for _ in range(self.max_depth):
+                x = flat_X.take(self.feature.take(node))
+                go_right = x > self.threshold.take(node)
+                if missing:
+                    go_right |= np.isnan(x) & self._missing_right.take(node)
+                node = flat_children.take(2 * node + go_right)
+            return node.reshape(self.n_trees, 1)
+
+        row_offset = np.tile(np.arange(n_rows, dtype=np.intp) * self.n_features, self.n_trees)
+        node = np.repeat(self.roots, n_rows)
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offset + self.feature.take(node))
+            go_right = x > self.threshold.take(node)
+            if missing:
+                go_right |= np.isnan(x) & self._missing_right.take(node)
+            node = flat_children.take(2 * node + go_right)
+
+        return node.reshape(self.n_trees, n_rows)
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_trees, n_rows)"""
+        X = self._validate(X)
+        missing = self._has_missing(X)
+        leaves = np.empty((self.n_trees, X.shape[0]), dtype=np.intp)
+        for start, stop in self._chunks(X.shape[0]):
+            leaves[:, start:stop] = self._apply_rows(X[start:stop], missing)
+        return leaves
+
+    def predict(self, X):
+        """Predict a batch; returns shape (n_rows,) for single-output models"""
+        X = self._validate(X)
+        missing = self._has_missing(X)
+        prediction = np.empty((X.shape[0], self.n_outputs))
+        for start, stop in self._chunks(X.shape[0]):
+            leaves = self._apply_rows(X[start:stop], missing)
+            total = np.concatenate([
+                np.broadcast_to(self.base_score, (1, stop - start, self.n_outputs)),
+                self.value[leaves],
+            ]).sum(axis=0)
+            prediction[start:stop] = total / self.divisor
+        if self.n_outputs == 1:
+            return prediction[:, 0]
+        return prediction
+
+    def fold_scaler(self, mean, scale):
+        """
+        Copy of the ensemble that takes unscaled rows
+
+        For an ensemble trained on (x - mean) / scale, as StandardScaler
+        produces, each split threshold is replaced by the largest raw
+        float64 value whose scaled, float32-rounded value still goes left.
+        Raw rows then reach exactly the leaves the scaled rows did, so
+        predictions are bit-identical without transforming each row.
+        """
+        if not self.float32_inputs:
+            raise ValueError('Ensemble already takes raw inputs')
+        mean = np.broadcast_to(np.asarray(mean, dtype=np.float64), (self.n_features,))
+        scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), (self.n_features,))
+        if np.any(scale <= 0):
+            raise ValueError('Scale must be positive to fold it into split thresholds')
+
+        splits = np.flatnonzero(self.children[:, 0] != np.arange(len(self.feature)))
+        threshold = self.threshold.copy()
+        threshold[splits] = _raw_thresholds(
+            self.threshold[splits], mean[self.feature[splits]], scale[self.feature[splits]]
+        )
+        folded = CompiledEnsemble(
+            feature=self.feature,
+            threshold=threshold,
+            children=self.children,
+            value=self.value,
+            roots=self.roots,
+            max_depth=self.max_depth,
+            n_features=self.n_features,
+            base_score=self.base_score,
+            divisor=self.divisor,
+            model_type=self.model_type,
+            feature_importances=self.feature_importances,
+            float32_inputs=False,
+            cover=self.cover,
+            missing_left=self.missing_left,
+        )
+        folded.model_version = self.model_version
+        return folded
+
+    def to_state(self):
+        """Split the ensemble into JSON-serialisable params and a dict of arrays"""
+        params = {
+            'engine_format_version': ENGINE_FORMAT_VERSION,
+            'max_depth': self.max_depth,
+            'n_features': self.n_features,
+            'divisor': self.divisor,
+            'model_type': self.model_type,
+        }
+        arrays = {name: getattr(self, name) for name in ARRAY_FIELDS}
+        if self.feature_importances is not None:
+            arrays['feature_importances'] = self.feature_importances
+        if self.cover is not None:
+            arrays['cover'] = self.cover
+        if self.missing_left is not None:
+            arrays['missing_left'] = self.missing_left
+        return params, arrays
+
+    @classmethod
+    def from_state(cls, params, arrays):
+        """Rebuild an ensemble from the output of to_state"""
+        version = params['engine_format_version']
+        if version != ENGINE_FORMAT_VERSION:
+            raise ValueError(f'Unsupported engine format version {version}')
+        return cls(
+            max_depth=params['max_depth'],
+            n_features=params['n_features'],
+            divisor=params['divisor'],
+            model_type=params['model_type'],
+            feature_importances=arrays.get('feature_importances'),
+            cover=arrays.get('cover'),
+            missing_left=arrays.get('missing_left'),
+            **{name: arrays[name] for name in ARRAY_FIELDS},
+        )
+
+def check_finite(X, allow_nan):
+    """Reject the inputs sklearn's tree ensembles reject: infinity, and NaN unless allowed"""
+    if np.isfinite(X).all():
+        return
+    if np.isinf(X).any():
+        raise ValueError('Input X contains infinity or a value too large for float32')
+    if not allow_nan:
+        raise ValueError('Input X contains NaN, which this model cannot route; impute missing features first')
+
+def _raw_thresholds(threshold, mean, scale):
+    """
+    Largest float64 x with float32((x - mean) / scale) <= threshold, elementwise
+
+    That test is monotonic in x, so the answer is found by bisection
+    between a bracket around threshold * scale + mean. Infinite thresholds,
+    which sklearn uses to split missing from present values, stay as they
+    are: every finite x is on the same side before and after scaling.
+    """
+    raw = np.asarray(threshold, dtype=np.float64).copy()
+    finite = np.isfinite(raw)
+    if not finite.all():
+        raw[finite] = _raw_thresholds(raw[finite], mean[finite], scale[finite])
+        return raw
+
+    def goes_left(x, index=slice(None)):
+        with np.errstate(over='ignore', invalid='ignore'):
+            return ((x - mean[index]) / scale[index]).astype(np.float32) <= threshold[index]
+
+    estimate = threshold * scale + mean
+    step = np.abs(estimate) * 1e-6 + scale * 1e-6
+    lo = estimate - step
+    hi = estimate + step
+    # Widen the bracket until lo goes left and hi goes right
+    for _ in range(64):
+        low_right = ~goes_left(lo)
+        high_left = goes_left(hi)
+        if not (low_right.any() or high_left.any()):
+            break
+        step = step * 4
+        lo = np.where(low_right, lo - step, lo)
+        hi = np.where(high_left, hi + step, hi)
+
+    active = np.ones(len(lo), dtype=bool)
+    while active.any():
+        index = np.flatnonzero(active)
+        mid = lo[index] + (hi[index] - lo[index]) / 2
+        done = (mid <= lo[index]) | (mid >= hi[index])
+        left = goes_left(mid, index)
+        lo[index[left & ~done]] = mid[left & ~done]
+        hi[index[~left & ~done]] = mid[~left & ~done]
+        active[index[done]] = False
+    return lo
+
+def compile_model(model):
+    """Compile a fitted model, or return None if its type is not supported"""
+    try:
+        return CompiledEnsemble.from_sklearn(model)
+    except ValueError:
+        return None
@@ -0,0 +1,243 @@
+"""
+Per-prediction explanations for compiled tree ensembles
+Exact path-dependent TreeSHAP attributions from the node covers saved
+with the model, for batches of rows over node structure prepared once
+per model
+"""
+
+import math
+
+import numpy as np
+
+from compact_model import CompactEnsemble
+
+# Trees are explained in groups of about this many nodes, and rows in
+# chunks keeping each (rows, nodes, points) temporary near MAX_EXPLAIN_ELEMENTS
+GROUP_NODES = 8192
+MAX_EXPLAIN_ELEMENTS = 1 << 16
+
+class _TreeGroup:
+    """
+    Consecutive trees laid out for level-by-level passes
+
+    Nodes are ordered by depth, internal nodes before leaves within a
+    level, so every level and its internal nodes are contiguous ranges and
+    the roots come first. Arrays describe each node's incoming edge:
+    the feature and threshold its parent splits on, whether it is the
+    left child, and the feature's zero fraction, the product of
+    cover(child) / cover(parent) over every edge on that feature from the
+    root down to this node.
+    """
+
+    def __init__(self, ensemble, nodes, position, parent, depth, children, is_leaf, value, cover):
+        n = len(nodes)
+        self.n_roots = int(np.count_nonzero(depth[nodes] == 0))
+        self.level_bounds = np.searchsorted(depth[nodes], np.arange(depth[nodes].max() + 2)).tolist()
+
+        edges = nodes[self.n_roots:]
+        parent_nodes = parent[edges]
+        self.parent = np.concatenate([np.full(self.n_roots, -1), position[parent_nodes]]).astype(np.intp)
+        self.feature = np.concatenate([np.zeros(self.n_roots), ensemble.feature[parent_nodes]]).astype(np.intp)
+        self.threshold = np.concatenate([
+            np.zeros(self.n_roots, dtype=ensemble.threshold.dtype), ensemble.threshold[parent_nodes]
+        ])
+        self.is_left = np.concatenate([np.zeros(self.n_roots, dtype=bool), children[parent_nodes, 0] == edges])
+        # Where NaN goes at the parent's split, for ensembles that route it
+        self.missing_left = None
+        if ensemble.missing_left is not None:
+            missing_left = np.asarray(ensemble.missing_left, dtype=bool)
+            self.missing_left = np.concatenate([np.zeros(self.n_roots, dtype=bool), missing_left[parent_nodes]])
+        ratio = np.ones(n)
+        ratio[self.n_roots:] = cover[edges] / cover[parent_nodes]
+        self.leaf_value = np.where(is_leaf[nodes], value[nodes], 0.0)
+
+        # Previous edge on the same feature along the path from the root
+        self.prev = np.full(n, -1, dtype=np.intp)
+        self.zero_fraction = ratio.copy()
+        last = np.full((n, ensemble.n_features), -1, dtype=np.intp)
+        levels = list(zip(self.level_bounds[:-1], self.level_bounds[1:]))
+        for start, stop in levels[1:]:
+            level = np.arange(start, stop)
+            last[level] = last[self.parent[level]]
+            prev = last[level, self.feature[level]]
+            self.prev[level] = prev
+            repeated = prev >= 0
+            self.zero_fraction[level[repeated]] *= self.zero_fraction[prev[repeated]]
+            last[level, self.feature[level]] = level
+
+        # Work arrays carry a padding column at index n that stands in for
+        # "no previous edge", so looking the previous edge up is one np.take
+        self.prev_or_pad = np.where(self.prev >= 0, self.prev, n)
+        self.left = np.zeros(n, dtype=np.intp)
+        self.right = np.zeros(n, dtype=np.intp)
+        internal = np.flatnonzero(~is_leaf[nodes])
+        self.left[internal] = position[children[nodes[internal], 0]]
+        self.right[internal] = position[children[nodes[internal], 1]]
+        # Per level: (start, end of internal nodes, end)
+        self.levels = [
+            (start, start + int(np.count_nonzero(~is_leaf[nodes[start:stop]])), stop) for start, stop in levels
+        ]
+
+class TreeExplainer:
+    """
+    Exact path-dependent TreeSHAP values for a CompiledEnsemble or CompactEnsemble
+
+    For a leaf with value v whose path splits on the features D, each
+    feature j in D has a zero fraction z_j (the share of training samples
+    that followed the path's splits on j) and a one fraction o_j (1 when
+    the row satisfies all of them). Feature i then receives
+
+        v * (o_i - z_i) * integral_0^1 prod_{j in D, j != i} ((1 - t) z_j + t o_j) dt
+
+    which expands to the Shapley weights over subsets of D. The integrand
+    is a polynomial of degree below min(max_depth, n_features), so
+    Gauss-Legendre quadrature on that many / 2 points is exact. The
+    products are shared down the trees level by level and the leaf sums
+    gathered back up, so one row costs O(nodes * points) rather than
+    O(leaves * depth^2).
+
+    The node structure is prepared once; values are for output `output`
+    of a multi-output model and add up with `expected_value` to the
+    prediction.
+    """
+
+    def __init__(self, ensemble, output=0):
+        if getattr(ensemble, 'cover', None) is None:
+            raise ValueError('Model has no node covers to explain predictions with; re-save it with save_model()')
+        self.ensemble = ensemble
+        self.output = output
+        self.n_features = ensemble.n_features
+
+        if isinstance(ensemble, CompactEnsemble):
+            left = np.asarray(ensemble.left, dtype=np.intp)
+            children = np.column_stack([left, left + 1])
+            is_leaf = left == np.arange(len(left))
+            children[is_leaf, 1] = left[is_leaf]
+        else:
+            children = np.asarray(ensemble.children)
+            is_leaf = children[:, 0] == np.arange(len(children))
+        roots = np.asarray(ensemble.roots, dtype=np.intp)
+        value = np.asarray(ensemble.value, dtype=np.float64)[:, output]
+        cover = np.asarray(ensemble.cover, dtype=np.float64)
+
+        # Depth, tree and parent of every node, walking all trees a level at a time
+        n_nodes = len(children)
+        depth = np.zeros(n_nodes, dtype=np.intp)
+        tree = np.zeros(n_nodes, dtype=np.intp)
+        parent = np.full(n_nodes, -1, dtype=np.intp)
+        tree[roots] = np.arange(len(roots))
+        frontier = roots
+        while len(frontier):
+            frontier = frontier[~is_leaf[frontier]]
+            below = children[frontier].ravel()
+            parent[below] = np.repeat(frontier, 2)
+            depth[below] = np.repeat(depth[frontier] + 1, 2)
+            tree[below] = np.repeat(tree[frontier], 2)
+            frontier = below
+
+        leaves = np.flatnonzero(is_leaf)
+        self.expected_value = float(
+            (ensemble.base_score[output] + np.sum(value[leaves] * cover[leaves] / cover[roots[tree[leaves]]]))
+            / ensemble.divisor
+        )
+
+        points = max(1, math.ceil(min(ensemble.max_depth, ensemble.n_features) / 2))
+        t, weights = np.polynomial.legendre.leggauss(points)
+        self.t = (t + 1) / 2
+        self.weights = weights / 2
+
+        # Trees in order, cut into groups of about GROUP_NODES nodes
+        tree_ends = np.cumsum(np.bincount(tree, minlength=len(roots)))
+        position = np.zeros(n_nodes, dtype=np.intp)
+        self.groups = []
+        first = 0
+        while first < len(roots):
+            start = tree_ends[first - 1] if first else 0
+            last = max(first + 1, int(np.searchsorted(tree_ends, start + GROUP_NODES, side='right')))
+            nodes = np.flatnonzero((tree >= first) & (tree < last))
+            nodes = nodes[np.lexsort((tree[nodes], is_leaf[nodes], depth[nodes]))]
+            position[nodes] = np.arange(len(nodes))
+            self.groups.append(_TreeGroup(ensemble, nodes, position, parent, depth, children, is_leaf, value, cover))
+            first = last
+
+    def _prepare(self, X):
+        """Rows as the splits compare them"""
+        if isinstance(self.ensemble, CompactEnsemble):
+            return self.ensemble.prepare(X)
+        return self.ensemble._validate(X)
+
+    def _group_values(self, group, Xp, buffers, missing=False):
+        """
+        Attributions from one group of trees for a chunk of rows
+
+        Work arrays are (points, rows, nodes + 1) views of `buffers`,
+        reused across groups and chunks: allocating fresh arrays this size
+        on every call costs more than the arithmetic.
+        """
+        n_rows = len(Xp)
+        n = len(group.parent)
+        g, factor, path, step = (buffer[:, :n_rows, :n + 1] for buffer in buffers)
+        t = self.t[:, None, None]
+
+        # One fraction: the row follows every split on the edge's feature so far
+        one = np.ones((n_rows, n + 1), dtype=bool)
+        x = Xp[:, group.feature]
+        goes_left = x <= group.threshold
+        if missing:
+            goes_left = np.where(self.ensemble._is_missing(x), group.missing_left, goes_left)
+        one[:, :n] = goes_left == group.is_left
+        for start, _, stop in group.levels[1:]:
+            one[:, start:stop] &= one.take(group.prev_or_pad[start:stop], axis=1)
+        difference = one[:, :n] - group.zero_fraction
+
+        # g = (1 - t) z + t o per quadrature point, and (o - z) / g
+        np.multiply(t, difference, out=g[:, :, :n])
+        g[:, :, :n] += group.zero_fraction
+        g[:, :, n] = 1.0
+        np.divide(difference, g[:, :, :n], out=step[:, :, :n])
+        step[:, :, n] = 0.0
+
+        # Path products; an edge on a feature already on the path replaces its factor
+        np.divide(g[:, :, :n], g.take(group.prev_or_pad, axis=2), out=factor[:, :, :n])
+        path[:, :, :group.n_roots] = 1.0
+        for start, _, stop in group.levels[1:]:
+            np.multiply(path.take(group.parent[start:stop], axis=2), factor[:, :, start:stop], out=path[:, :, start:stop])
+
+        # Leaf-value weighted path products summed over each subtree
+        below = factor[:, :, :n]
+        np.multiply(path[:, :, :n], group.leaf_value, out=below)
+        for start, internal_stop, _ in reversed(group.levels[:-1]):
+            if internal_stop > start:
+                np.add(
+                    below.take(group.left[start:internal_stop], axis=2),
+                    below.take(group.right[start:internal_stop], axis=2),
+                    out=below[:, :, start:internal_stop]
+                )
+
+        # Each edge adds its feature's (o - z) / g over the leaves below it,
+        # less what the feature's previous edge already added for them
+        contribution = step[:, :, :n]
+        np.subtract(contribution, step.take(group.prev_or_pad, axis=2), out=contribution)
+        contribution *= below
+        contribution = np.tensordot(self.weights, contribution, axes=1)
+
+        edges = slice(group.n_roots, None)
+        index = np.arange(n_rows)[:, None] * self.n_features + group.feature[edges]
+        return np.bincount(
+            index.ravel(), weights=contribution[:, edges].ravel(), minlength=n_rows * self.n_features
+        ).reshape(n_rows, self.n_features)
+
+    def shap_values(self, X):
+        """(n_rows, n_features) attributions; each row sums to its prediction minus expected_value"""
+        Xp = self._prepare(X)
+        missing = self.ensemble._has_missing(Xp)
+        values = np.zeros((len(Xp), self.n_features))
+        max_nodes = max(len(group.parent) for group in self.groups)
+        step = max(1, MAX_EXPLAIN_ELEMENTS // (max_nodes * len(self.t)))
+        shape = (len(self.t), min(step, len(Xp)), max_nodes + 1)
+        buffers = [np.empty(shape) for _ in range(4)]
+        for start in range(0, len(Xp), step):
+            chunk = Xp[start:start + step]
+            for group in self.groups:
+                values[start:start + step] += self._group_values(group, chunk, buffers, missing)
+        return values / self.ensemble.divisor